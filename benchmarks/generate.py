@@ -0,0 +1,92 @@
+import argparse
+import random
+import sys
+from string import ascii_lowercase
+
+# 可复现的合成词库生成器：同样的参数和种子总是生成同样的文件。
+# 词由序号经可逆的乘法散列换算成三个汉字，保证不重复且不用在内存里记住已生成的词；
+# 新旧两个版本同时逐行写出，内存占用与词条数无关
+
+# GBK 能表示的基本汉字区
+CJK_START = 0x4E00
+CJK_COUNT = 0x9FA5 - 0x4E00 + 1
+WORD_SPACE = CJK_COUNT ** 3
+# 与 WORD_SPACE 互素的乘数，把连续的序号打散
+WORD_MULTIPLIER = 2654435761
+
+ENCODINGS = ('gbk', 'utf-8', 'utf-16')
+LAYOUTS = ('word-first', 'code-first')
+
+
+def make_word(index):
+    value = (index * WORD_MULTIPLIER + 12345) % WORD_SPACE
+    chars = []
+    for _ in range(3):
+        value, digit = divmod(value, CJK_COUNT)
+        chars.append(chr(CJK_START + digit))
+    return ''.join(chars)
+
+
+def make_code(rng):
+    return ''.join(rng.choice(ascii_lowercase) for _ in range(rng.randint(2, 6)))
+
+
+def _line(word, code, layout):
+    return f"{code}\t{word}\n" if layout == 'code-first' else f"{word}\t{code}\n"
+
+
+def generate_pair(old_path, new_path, entries, encoding='utf-8', layout='word-first', diff_ratio=0.01,
+                  multi_ratio=0.05, comment_ratio=0.001, seed=0):
+    # diff_ratio 的变化平均分给删除、修改编码和新增三种；multi_ratio 的词有第二个编码。
+    # 返回实际的 (删除, 修改, 新增) 条数
+    rng = random.Random(seed)
+    removed = changed = added = 0
+    with open(old_path, 'w', encoding=encoding, newline='\n') as old, \
+            open(new_path, 'w', encoding=encoding, newline='\n') as new:
+        for index in range(entries):
+            if rng.random() < comment_ratio:
+                comment = f"# 第 {index} 条附近的注释\n"
+                old.write(comment)
+                new.write(comment)
+            word = make_word(index)
+            codes = [make_code(rng)]
+            if rng.random() < multi_ratio:
+                codes.append(make_code(rng))
+            for code in codes:
+                old.write(_line(word, code, layout))
+
+            roll = rng.random()
+            if roll < diff_ratio / 3:
+                removed += 1
+                continue
+            if roll < 2 * diff_ratio / 3:
+                changed += 1
+                codes[0] = codes[0] + rng.choice(ascii_lowercase)
+            elif roll < diff_ratio:
+                added += 1
+                new.write(_line(make_word(entries + added), make_code(rng), layout))
+            for code in codes:
+                new.write(_line(word, code, layout))
+    return removed, changed, added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成一对可复现的合成词库，用于性能测试")
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--entries', type=int, default=100_000, help="旧词库的词条数")
+    parser.add_argument('--encoding', choices=ENCODINGS, default='utf-8')
+    parser.add_argument('--layout', choices=LAYOUTS, default='word-first')
+    parser.add_argument('--diff-ratio', type=float, default=0.01, help="发生变化的词条比例")
+    parser.add_argument('--multi-ratio', type=float, default=0.05, help="一词多码的比例")
+    parser.add_argument('--comment-ratio', type=float, default=0.001, help="注释行的比例")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    removed, changed, added = generate_pair(args.old, args.new, args.entries, args.encoding, args.layout,
+                                            args.diff_ratio, args.multi_ratio, args.comment_ratio, args.seed)
+    print(f"删除 {removed} 条，修改 {changed} 条，新增 {added} 条", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
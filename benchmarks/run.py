@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from generate import ENCODINGS, LAYOUTS, generate_pair
+from vocabdiff import pipeline, vectorized
+from vocabdiff.bidi import diff_axis
+from vocabdiff.formats import detect_format
+from vocabdiff.loader import detect_encoding
+from vocabdiff.search import SearchSession
+from vocabdiff.trace import peak_rss
+
+# 性能测试：对三个界面脚本背后的对比流程分别计时编码检测、解析、对比、生成结果和查找各阶段，记录内存峰值，
+# 结果存成 JSON；给出基线结果时逐项比较，变慢或变大超过阈值就以非零状态退出。
+# 各阶段直接调用脚本所用的 vocabdiff.pipeline 函数，不执行界面脚本；只测不涉及 Tk 的部分
+
+
+def _bidi_results(diffs, old_vocab, new_vocab):
+    return pipeline.result_items(diffs, old_vocab, new_vocab)
+
+
+def _word_results(diffs, old_vocab, new_vocab):
+    return pipeline.word_result_items(*diffs)
+
+
+# 每个脚本的 (解析, 对比, 生成结果)；claude3.5 和 github_copilot 用的是同一套双向索引流程
+BIDI = (pipeline.parse_index, pipeline.compare_indexes, _bidi_results)
+IMPLEMENTATIONS = {
+    'claude3.5': BIDI,
+    'github_copilot': BIDI,
+    'copilot': (pipeline.parse_vocab, pipeline.compare_vocab, _word_results),
+}
+STAGES = ('detect', 'parse', 'diff', 'results', 'search')
+# 按词对比两个紧凑词库的引擎本身：逐条对比和 numpy 向量化各测一次，没装 numpy 时没有后一项
+ENGINE_STAGES = ('engine_python', 'engine_numpy')
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+# 生成结果阶段每个标签页格式化的行数，相当于一屏
+SCREEN_ROWS = 50
+# 判定退化的阈值：相对变化超过 threshold，且绝对变化超过下面的值
+MIN_SECONDS = 0.05
+MIN_BYTES = 16 << 20
+
+
+def _search_terms(word):
+    # 模拟边输入边查找：逐字输入一个词，再换成一个编码
+    return [word[:size] for size in range(1, len(word) + 1)] + ['ab']
+
+
+def run_worker(name, old_path, new_path):
+    # 在独立进程里运行一个实现，进程的内存峰值只反映这一次运行
+    parse, compare, results = IMPLEMENTATIONS[name]
+    stages = {}
+    values = {}
+
+    def measure(stage, task):
+        start = time.perf_counter()
+        values[stage] = task()
+        stages[stage] = {'seconds': time.perf_counter() - start, 'peak_rss': peak_rss()}
+
+    def detect(path):
+        # 与界面脚本相同：只有普通文本需要检测编码，检测结果交给解析阶段
+        return detect_encoding(path) if detect_format(path).splittable else None
+
+    measure('detect', lambda: (detect(old_path), detect(new_path)))
+    old_encoding, new_encoding = values['detect']
+    measure('parse', lambda: (parse(old_path, old_encoding), parse(new_path, new_encoding)))
+    old_vocab, new_vocab = values['parse']
+    measure('diff', lambda: compare(old_vocab, new_vocab))
+
+    def build():
+        # 各标签页的行和查找索引，再按查找字段格式化每页的第一屏；不创建窗口，也不做 Tk 渲染
+        indexes = {}
+        for tab, (_, index) in results(values['diff'], old_vocab, new_vocab).items():
+            for row in range(min(SCREEN_ROWS, len(index))):
+                index.row_text(row)
+            indexes[tab] = index
+        return indexes
+
+    measure('results', build)
+    indexes = values['results']
+    words = iter(getattr(new_vocab, 'by_word', new_vocab))
+    term = next(words, '')
+
+    def search():
+        session = SearchSession(indexes)
+        for partial in _search_terms(term):
+            session.search(partial)
+
+    measure('search', search)
+
+    old_words = getattr(old_vocab, 'by_word', old_vocab)
+    new_words = getattr(new_vocab, 'by_word', new_vocab)
+
+    # 工作进程只跑这一次，直接切换开关即可
+    vectorized.enabled = False
+    measure('engine_python', lambda: diff_axis(old_words, new_words))
+    if vectorized.available():
+        vectorized.enabled = True
+        measure('engine_numpy', lambda: diff_axis(old_words, new_words))
+        if values['engine_numpy'] != values['engine_python']:
+            raise AssertionError("向量化引擎的对比结果与逐条对比不同")
+    return {'stages': stages}
+
+
+def _case_files(directory, size, encoding, layout, diff_ratio, seed):
+    base = os.path.join(directory, f"{size}-{encoding}-{layout}-{diff_ratio}-{seed}")
+    old_path, new_path = base + '-old.txt', base + '-new.txt'
+    if not (os.path.exists(old_path) and os.path.exists(new_path)):
+        # 先写临时名再改名，中断后不会留下半个文件被当成已生成
+        generate_pair(old_path + '.part', new_path + '.part', size, encoding, layout, diff_ratio, seed=seed)
+        os.replace(old_path + '.part', old_path)
+        os.replace(new_path + '.part', new_path)
+    return old_path, new_path
+
+
+def run_case(name, old_path, new_path, repeat):
+    # 每次都在新进程里运行，取各阶段的最短时间和最大内存峰值
+    best = None
+    with tempfile.TemporaryDirectory(prefix='vocabdiff-bench-') as cache:
+        env = dict(os.environ, VOCABDIFF_CACHE=cache)
+        outputs = [subprocess.run([sys.executable, os.path.abspath(__file__), 'worker', name, old_path, new_path],
+                                  check=True, capture_output=True, text=True, env=env).stdout
+                   for _ in range(repeat)]
+    for output in outputs:
+        stages = json.loads(output)['stages']
+        if best is None:
+            best = stages
+            continue
+        for stage, result in stages.items():
+            best[stage]['seconds'] = min(best[stage]['seconds'], result['seconds'])
+            if result['peak_rss'] is not None:
+                best[stage]['peak_rss'] = max(best[stage]['peak_rss'] or 0, result['peak_rss'])
+    return best
+
+
+def case_key(result):
+    return result['implementation'], result['entries'], result['encoding'], result['layout'], result['diff_ratio']
+
+
+def find_regressions(baseline, current, threshold):
+    # 按 (实现, 规模, 编码, 列顺序, 变化比例, 阶段) 对齐两次结果，返回退化的条目说明
+    previous = {case_key(result): result['stages'] for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        stages = previous.get(case_key(result))
+        if stages is None:
+            continue
+        for stage, now in result['stages'].items():
+            before = stages.get(stage)
+            if before is None:
+                continue
+            if now['seconds'] > before['seconds'] * (1 + threshold) and \
+                    now['seconds'] - before['seconds'] > MIN_SECONDS:
+                regressions.append(f"{'/'.join(map(str, case_key(result)))} {stage}: "
+                                   f"{before['seconds']:.3f}s -> {now['seconds']:.3f}s")
+            if now['peak_rss'] and before['peak_rss'] and \
+                    now['peak_rss'] > before['peak_rss'] * (1 + threshold) and \
+                    now['peak_rss'] - before['peak_rss'] > MIN_BYTES:
+                regressions.append(f"{'/'.join(map(str, case_key(result)))} {stage}: "
+                                   f"{before['peak_rss'] >> 20} MB -> {now['peak_rss'] >> 20} MB")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="词库对比工具的性能测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="旧词库的词条数")
+    parser.add_argument('--encodings', nargs='+', choices=ENCODINGS, default=['utf-8'])
+    parser.add_argument('--layouts', nargs='+', choices=LAYOUTS, default=['word-first'])
+    parser.add_argument('--implementations', nargs='+', choices=sorted(IMPLEMENTATIONS), default=sorted(IMPLEMENTATIONS))
+    parser.add_argument('--diff-ratio', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="每个用例运行的次数，取最好成绩")
+    parser.add_argument('--data', default=os.path.join(tempfile.gettempdir(), 'vocabdiff-bench'),
+                        help="生成的词库存放目录，已生成的文件会直接复用")
+    parser.add_argument('--output', default='bench-results.json', help="结果 JSON 文件")
+    parser.add_argument('--baseline', help="作为基线的旧结果 JSON 文件")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定退化的相对变化")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['worker']:
+        json.dump(run_worker(*argv[1:4]), sys.stdout)
+        return 0
+
+    args = build_parser().parse_args(argv)
+    os.makedirs(args.data, exist_ok=True)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': [],
+    }
+    for size in args.sizes:
+        for encoding in args.encodings:
+            for layout in args.layouts:
+                old_path, new_path = _case_files(args.data, size, encoding, layout, args.diff_ratio, args.seed)
+                for name in args.implementations:
+                    stages = run_case(name, old_path, new_path, args.repeat)
+                    report['results'].append({'implementation': name, 'entries': size, 'encoding': encoding,
+                                              'layout': layout, 'diff_ratio': args.diff_ratio, 'stages': stages})
+                    summary = ' '.join(f"{stage} {stages[stage]['seconds']:.3f}s"
+                                       for stage in STAGES + ENGINE_STAGES if stage in stages)
+                    print(f"{name} {size} {encoding} {layout}: {summary}", file=sys.stderr)
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = find_regressions(json.load(file), report, args.threshold)
+        for line in regressions:
+            print(f"退化: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
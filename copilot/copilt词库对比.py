@@ -1,175 +1,291 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import chardet  # 确保已安装chardet库
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vocabdiff import Job, run_concurrently
+from vocabdiff.search import SearchSession
+from vocabdiff.cache import VocabCache
+from vocabdiff.pipeline import compare_vocab, parse_vocab, word_result_items
+from vocabdiff.widgets import FormattedRows, VirtualList, watch_job
+from vocabdiff.formats import detect_format
+from vocabdiff.loader import detect_encoding
+from vocabdiff.trace import Tracer
 
 def load_file(label):
     file_path = filedialog.askopenfilename()
     label.config(text=file_path)
 
-def read_vocab(file_path):
-    with open(file_path, 'rb') as file:
-        raw_data = file.read()
-        encoding = chardet.detect(raw_data)['encoding']
-    
-    vocab = {}
-    with open(file_path, 'r', encoding=encoding) as file:
-        for line in file:
-            if line.startswith('#'):
-                continue
-            parts = line.strip().split()
-            if len(parts) == 2:
-                vocab[parts[0]] = parts[1]
-            elif len(parts) == 3:
-                vocab[parts[0]] = parts[1]
+# 已解析词库的磁盘缓存，只保留带编码的行，与其他脚本的缓存分开；解析规则变化时换用新的命名空间
+vocab_cache = VocabCache(namespace='copilot-v2')
+
+def read_vocab(file_path, tracer, progress=None):
+    # 命中缓存时直接映射已解析的结果，不再检测编码和解析；各步骤分别计时
+    name = os.path.basename(file_path)
+    with tracer.stage(f"读取缓存 {name}") as span:
+        cached = vocab_cache.load(file_path)
+        span.count = cached and len(cached)
+    if cached is not None:
+        return cached
+    stat = os.stat(file_path)
+    with tracer.stage(f"检测编码 {name}"):
+        encoding = detect_encoding(file_path) if detect_format(file_path).splittable else None
+    with tracer.stage(f"解析 {name}") as span:
+        vocab = parse_vocab(file_path, encoding, progress)
+        span.count = len(vocab)
+    with tracer.stage(f"写入缓存 {name}"):
+        try:
+            vocab_cache.store(file_path, vocab, stat)
+        except OSError:
+            pass
     return vocab
 
-def normalize_vocab(vocab):
-    normalized = {}
-    for k, v in vocab.items():
-        if k in normalized and v not in normalized[k]:
-            normalized[k].append(v)
-        else:
-            normalized[k] = [v]
-    return normalized
+def run_compare(job, old_file, new_file, tracer):
+    # 后台线程：同时解析两个文件，再对比并建立查找索引
+    total = os.path.getsize(old_file) + os.path.getsize(new_file)
+    done = [0, 0]
 
-def compare_vocab(old_vocab, new_vocab):
-    normalized_old = normalize_vocab(old_vocab)
-    normalized_new = normalize_vocab(new_vocab)
-    
-    added = {k: v for k, v in normalized_new.items() if k not in normalized_old}
-    removed = {k: v for k, v in normalized_old.items() if k not in normalized_new}
-    changed = {k: (normalized_old[k], v) for k, v in normalized_new.items() if k in normalized_old and sorted(normalized_old[k]) != sorted(v)}
-    return added, removed, changed
+    def read_progress(slot):
+        def report(position):
+            done[slot] = position
+            job.progress('read', sum(done), total)
+        return report
+
+    old_vocab, new_vocab = run_concurrently(
+        (read_vocab, old_file, tracer, read_progress(0)),
+        (read_vocab, new_file, tracer, read_progress(1)),
+    )
+    job.check()
+    with tracer.stage("对比", len(new_vocab)):
+        added, removed, changed = compare_vocab(old_vocab, new_vocab, lambda count: job.progress('diff', count, len(new_vocab)))
+    job.progress('index', 0)
+    with tracer.stage("生成结果", len(added) + len(removed) + len(changed)):
+        return prepare_results(added, removed, changed)
+
+def handle_compare_event(kind, *args):
+    if kind == 'progress':
+        stage, done, total = args
+        progress_bar.config(maximum=total or 1, value=done if total else 0)
+        if stage == 'read':
+            progress_label.config(text=f"读取 {done / 1048576:.1f} / {total / 1048576:.1f} MB")
+        elif stage == 'diff':
+            progress_label.config(text=f"对比 {done} / {total} 条")
+        else:
+            progress_label.config(text="生成结果...")
+        return
+    cancel_button.config(state='disabled')
+    progress_bar.config(value=0)
+    progress_label.config(text="已取消" if kind == 'cancelled' else "")
+    if kind == 'done':
+        progress_label.config(text=f"缓存命中 {vocab_cache.hits} 次，未命中 {vocab_cache.misses} 次")
+        with compare_tracer.stage("显示"):
+            display_results(*args[0])
+        stats_label.config(text=compare_tracer.summary())
+    elif kind == 'error':
+        messagebox.showerror("错误", f"读取或对比失败: {args[0]}")
 
 def compare_and_display():
+    global compare_job, compare_tracer
     old_file = old_vocab_label.cget("text")
     new_file = new_vocab_label.cget("text")
     
     if not old_file or not new_file:
         messagebox.showwarning("文件未选择", "请先选择旧词库和新词库文件。")
         return
+    if compare_job is not None and compare_job.is_alive():
+        return
     
-    old_vocab = read_vocab(old_file)
-    new_vocab = read_vocab(new_file)
-    added, removed, changed = compare_vocab(old_vocab, new_vocab)
-    
-    display_results(added, removed, changed)
-
-def display_results(added, removed, changed):
-    added_text_widget.config(state='normal')
-    removed_text_widget.config(state='normal')
-    changed_text_widget.config(state='normal')
-    new_vocab_text_widget.config(state='normal')
-    old_vocab_text_widget.config(state='normal')
-
-    added_text_widget.delete('1.0', tk.END)
-    removed_text_widget.delete('1.0', tk.END)
-    changed_text_widget.delete('1.0', tk.END)
-    new_vocab_text_widget.delete('1.0', tk.END)
-    old_vocab_text_widget.delete('1.0', tk.END)
-
-    for k, v in added.items():
-        added_text_widget.insert('end', f"{k}: {', '.join(v)}\n")
-        new_vocab_text_widget.insert('end', f"新增 {k}: {', '.join(v)}\n")
-    
-    for k, v in removed.items():
-        removed_text_widget.insert('end', f"{k}: {', '.join(v)}\n")
-        old_vocab_text_widget.insert('end', f"删除 {k}: {', '.join(v)}\n")
-    
-    for k, (old_val, new_val) in changed.items():
-        changed_text_widget.insert('end', f"{k}: {', '.join(old_val)} -> {', '.join(new_val)}\n")
-
-    added_text_widget.config(state='disabled')
-    removed_text_widget.config(state='disabled')
-    changed_text_widget.config(state='disabled')
-    new_vocab_text_widget.config(state='disabled')
-    old_vocab_text_widget.config(state='disabled')
-
-    notebook.tab(0, text=f"新增词汇 ({len(added)})")
-    notebook.tab(1, text=f"删除词汇 ({len(removed)})")
-    notebook.tab(2, text=f"修改词汇 ({len(changed)})")
+    compare_tracer = Tracer(profile=profile_var.get())
+    compare_job = Job(run_compare, old_file, new_file, compare_tracer).start()
+    cancel_button.config(state='normal')
+    progress_label.config(text="检测编码...")
+    watch_job(root, compare_job, handle_compare_event)
+
+def cancel_compare():
+    if compare_job is not None:
+        compare_job.cancel()
+
+def export_trace():
+    # 导出最近一次对比的 Chrome 跟踪文件，开启了性能分析时另存 cProfile 数据
+    if compare_tracer is None:
+        return
+    file_path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[("Chrome Trace", "*.json")])
+    if not file_path:
+        return
+    try:
+        compare_tracer.export_chrome(file_path)
+        compare_tracer.export_profile(os.path.splitext(file_path)[0] + '.prof')
+    except OSError as e:
+        messagebox.showerror("错误", f"导出失败: {e}")
+
+def format_entry(item):
+    k, v = item
+    return f"{k}: {', '.join(v)}"
+
+def format_change(item):
+    k, (old_val, new_val) = item
+    return f"{k}: {', '.join(old_val)} -> {', '.join(new_val)}"
+
+def prepare_results(added, removed, changed):
+    # 各标签页的行和查找索引由 word_result_items 生成，这里只配上显示格式；不涉及界面，可在后台线程执行
+    results = word_result_items(added, removed, changed)
+    added_items, added_index = results['added']
+    removed_items, removed_index = results['removed']
+    changed_items, changed_index = results['changed']
+    rows = [
+        FormattedRows(added_items, format_entry),
+        FormattedRows(removed_items, format_entry),
+        FormattedRows(changed_items, format_change),
+        FormattedRows(added_items, lambda item: f"新增 {format_entry(item)}"),
+        FormattedRows(removed_items, lambda item: f"删除 {format_entry(item)}"),
+    ]
+    indexes = [added_index, removed_index, changed_index, added_index, removed_index]
+    return rows, indexes
+
+def display_results(rows, indexes):
+    global search_session
+    views = [added_view, removed_view, changed_view, new_vocab_view, old_vocab_view]
+
+    # 行列表在标签页第一次打开时才交给视图
+    pending_rows.clear()
+    pending_rows.update(zip(views, rows))
+    for view in views:
+        view.set_rows(())
+
+    search_session = SearchSession(dict(zip(views, indexes)))
+    search_session.search(search_entry.get())
+
+    notebook.tab(0, text=f"新增词汇 ({len(rows[0])})")
+    notebook.tab(1, text=f"删除词汇 ({len(rows[1])})")
+    notebook.tab(2, text=f"修改词汇 ({len(rows[2])})")
     notebook.tab(3, text=f"新词库")
     notebook.tab(4, text=f"旧词库")
+    # 当前已选中的标签页不会再触发切换事件，直接显示它的行
+    show_pending_rows()
+
+def show_pending_rows(event=None):
+    view = result_views.get(notebook.select())
+    rows = pending_rows.pop(view, None)
+    if rows is not None:
+        view.set_rows(rows)
+        view.highlight(search_session.term)
+        view.set_matches(search_session.hits.get(view, []))
 
-def search_word():
+def search_word(event=None):
+    # 输入时增量查找，找出每个标签页的全部匹配
+    global search_job
+    search_job = None
     search_term = search_entry.get()
-    for text_widget in [added_text_widget, removed_text_widget, changed_text_widget, new_vocab_text_widget, old_vocab_text_widget]:
-        text_widget.tag_remove('highlight', '1.0', tk.END)
-        if search_term:
-            start_pos = text_widget.search(search_term, '1.0', tk.END)
-            if start_pos:
-                end_pos = f"{start_pos}+{len(search_term)}c"
-                text_widget.tag_add('highlight', start_pos, end_pos)
-                text_widget.tag_config('highlight', background='yellow')
-                text_widget.see(start_pos)
-
-root = tk.Tk()
-root.title("词库对比工具")
-
-main_frame = ttk.Frame(root, padding="10")
-main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-root.columnconfigure(0, weight=1)
-root.rowconfigure(0, weight=1)
-
-# 文件选择部分
-file_frame = ttk.Frame(main_frame)
-file_frame.grid(row=0, column=0, sticky=(tk.W, tk.E))
-
-# 旧词库文件选择
-ttk.Label(file_frame, text="选择旧词库文件:").grid(row=0, column=0, padx=10, pady=5)
-old_vocab_label = ttk.Label(file_frame, text="", width=40)
-old_vocab_label.grid(row=0, column=1, padx=10, pady=5)
-ttk.Button(file_frame, text="浏览", command=lambda: load_file(old_vocab_label)).grid(row=0, column=2, padx=10, pady=5)
-
-# 新词库文件选择
-ttk.Label(file_frame, text="选择新词库文件:").grid(row=1, column=0, padx=10, pady=5)
-new_vocab_label = ttk.Label(file_frame, text="", width=40)
-new_vocab_label.grid(row=1, column=1, padx=10, pady=5)
-ttk.Button(file_frame, text="浏览", command=lambda: load_file(new_vocab_label)).grid(row=1, column=2, padx=10, pady=5)
-
-# 结果显示部分
-notebook = ttk.Notebook(main_frame)
-notebook.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S))
-main_frame.rowconfigure(2, weight=1)
-
-# Scrollable frames for results
-def create_scrollable_text(parent):
-    frame = ttk.Frame(parent)
-    text_widget = tk.Text(frame, wrap='word')
-    text_widget.pack(side="left", fill="both", expand=True)
-    
-    scrollbar = ttk.Scrollbar(frame, orient="vertical", command=text_widget.yview)
-    scrollbar.pack(side="right", fill="y")
-    
-    text_widget.config(yscrollcommand=scrollbar.set)
-    return frame, text_widget
+    if search_session is None or search_term == search_session.term:
+        return
+    hits = search_session.search(search_term)
+    for view in result_views.values():
+        view.highlight(search_term)
+        view.set_matches(hits.get(view, []))
+
+def schedule_search(event=None):
+    global search_job
+    if search_job is not None:
+        root.after_cancel(search_job)
+    search_job = root.after(150, search_word)
+
+def find_next(event=None):
+    # 查找词未变时跳到当前标签页的下一个匹配
+    if search_session is None or search_entry.get() != search_session.term:
+        search_word()
+        return
+    view = result_views.get(notebook.select())
+    if view is not None:
+        view.next_match()
+
+# 多进程解析时子进程会重新导入本脚本，界面只在直接运行时创建
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("词库对比工具")
+
+    main_frame = ttk.Frame(root, padding="10")
+    main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+    root.columnconfigure(0, weight=1)
+    root.rowconfigure(0, weight=1)
+
+    # 文件选择部分
+    file_frame = ttk.Frame(main_frame)
+    file_frame.grid(row=0, column=0, sticky=(tk.W, tk.E))
+
+    # 旧词库文件选择
+    ttk.Label(file_frame, text="选择旧词库文件:").grid(row=0, column=0, padx=10, pady=5)
+    old_vocab_label = ttk.Label(file_frame, text="", width=40)
+    old_vocab_label.grid(row=0, column=1, padx=10, pady=5)
+    ttk.Button(file_frame, text="浏览", command=lambda: load_file(old_vocab_label)).grid(row=0, column=2, padx=10, pady=5)
+
+    # 新词库文件选择
+    ttk.Label(file_frame, text="选择新词库文件:").grid(row=1, column=0, padx=10, pady=5)
+    new_vocab_label = ttk.Label(file_frame, text="", width=40)
+    new_vocab_label.grid(row=1, column=1, padx=10, pady=5)
+    ttk.Button(file_frame, text="浏览", command=lambda: load_file(new_vocab_label)).grid(row=1, column=2, padx=10, pady=5)
+
+    # 结果显示部分
+    notebook = ttk.Notebook(main_frame)
+    notebook.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S))
+    main_frame.rowconfigure(2, weight=1)
+
+    # 结果列表只渲染可见的行
+    added_view = VirtualList(notebook)
+    notebook.add(added_view, text="新增词汇")
+
+    removed_view = VirtualList(notebook)
+    notebook.add(removed_view, text="删除词汇")
+
+    changed_view = VirtualList(notebook)
+    notebook.add(changed_view, text="修改词汇")
 
-added_frame, added_text_widget = create_scrollable_text(notebook)
-notebook.add(added_frame, text="新增词汇")
+    new_vocab_view = VirtualList(notebook)
+    notebook.add(new_vocab_view, text="新词库")
 
-removed_frame, removed_text_widget = create_scrollable_text(notebook)
-notebook.add(removed_frame, text="删除词汇")
+    old_vocab_view = VirtualList(notebook)
+    notebook.add(old_vocab_view, text="旧词库")
 
-changed_frame, changed_text_widget = create_scrollable_text(notebook)
-notebook.add(changed_frame, text="修改词汇")
+    result_views = {str(view): view for view in [added_view, removed_view, changed_view, new_vocab_view, old_vocab_view]}
+    pending_rows = {}
+    search_session = None
+    search_job = None
+    compare_job = None
+    compare_tracer = None
 
-new_vocab_frame, new_vocab_text_widget = create_scrollable_text(notebook)
-notebook.add(new_vocab_frame, text="新词库")
+    # 对比并显示结果标签放在最右边
+    compare_tab_frame = ttk.Frame(notebook)
+    notebook.add(compare_tab_frame, text="对比并显示结果")
+    notebook.bind("<<NotebookTabChanged>>", lambda e: compare_and_display() if notebook.tab(notebook.select(), "text") == "对比并显示结果" else None)
+    notebook.bind("<<NotebookTabChanged>>", show_pending_rows, add="+")
 
-old_vocab_frame, old_vocab_text_widget = create_scrollable_text(notebook)
-notebook.add(old_vocab_frame, text="旧词库")
+    # 查找功能
+    search_frame = ttk.Frame(main_frame)
+    search_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=5)
+    ttk.Label(search_frame, text="查找词汇:").pack(side="left")
+    search_entry = ttk.Entry(search_frame)
+    search_entry.pack(side="left", fill="x", expand=True, padx=5)
+    ttk.Button(search_frame, text="查找", command=find_next).pack(side="left")
+    search_entry.bind("<Return>", find_next)
+    search_entry.bind("<KeyRelease>", schedule_search)
 
-# 对比并显示结果标签放在最右边
-compare_tab_frame = ttk.Frame(notebook)
-notebook.add(compare_tab_frame, text="对比并显示结果")
-notebook.bind("<<NotebookTabChanged>>", lambda e: compare_and_display() if notebook.tab(notebook.select(), "text") == "对比并显示结果" else None)
+    # 进度显示
+    progress_frame = ttk.Frame(main_frame)
+    progress_frame.grid(row=4, column=0, sticky=(tk.W, tk.E), pady=5)
+    progress_bar = ttk.Progressbar(progress_frame, mode='determinate')
+    progress_bar.pack(side="left", fill="x", expand=True)
+    progress_label = ttk.Label(progress_frame, text="", width=30)
+    progress_label.pack(side="left", padx=5)
+    cancel_button = ttk.Button(progress_frame, text="取消", command=cancel_compare, state='disabled')
+    cancel_button.pack(side="left")
 
-# 查找功能
-search_frame = ttk.Frame(main_frame)
-search_frame.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=5)
-ttk.Label(search_frame, text="查找词汇:").pack(side="left")
-search_entry = ttk.Entry(search_frame)
-search_entry.pack(side="left", fill="x", expand=True, padx=5)
-ttk.Button(search_frame, text="查找", command=search_word).pack(side="left")
+    # 各阶段耗时和内存峰值
+    stats_frame = ttk.Frame(main_frame)
+    stats_frame.grid(row=5, column=0, sticky=(tk.W, tk.E))
+    stats_label = ttk.Label(stats_frame, text="", relief="sunken")
+    stats_label.pack(side="left", fill="x", expand=True)
+    profile_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(stats_frame, text="性能分析", variable=profile_var).pack(side="left", padx=5)
+    ttk.Button(stats_frame, text="导出跟踪", command=export_trace).pack(side="left")
 
-root.mainloop()
+    root.mainloop()
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from vocabdiff.cli import EXIT_DIFFERENT, main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('module', ['vocabdiff.patch', 'vocabdiff.history', 'vocabdiff.collisions'])
+def test_module_runs_without_warning(module):
+    # 包导入时不能先载入这些模块，否则 runpy 会警告
+    result = subprocess.run([sys.executable, '-W', 'error', '-m', module, '--help'],
+                            cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert 'RuntimeWarning' not in result.stderr
+
+
+def run_cli(capsys, argv):
+    code = main(argv)
+    return code, sorted(capsys.readouterr().out.splitlines())
+
+
+def write_pair(tmp_path, code_first):
+    # 一词多码、一码多词、重复行和单列的行，编码在前时两列对调
+    old = [('世界', 'shijie'), ('世界', 'sj'), ('你好', 'nihao'), ('你好', 'nh'), ('拟好', 'nihao'),
+           ('重复', 'cf'), ('重复', 'cf'), ('删除', 'sc'), ('顺序', 'sx'), ('顺序', 'shunxu')]
+    new = [('世界', 'sj'), ('你好', 'nh'), ('你好', 'nihao'), ('新增', 'xz'), ('拟好', 'nh'),
+           ('重复', 'cf'), ('顺序', 'shunxu'), ('顺序', 'sx'), ('顺序', 'sx')]
+    paths = []
+    for name, rows in (('old.txt', old), ('new.txt', new)):
+        lines = [f"{code}\t{word}" if code_first else f"{word}\t{code}" for word, code in rows]
+        path = tmp_path / name
+        path.write_text('\n'.join(lines + ['单列']) + '\n', encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('code_first', [False, True])
+@pytest.mark.parametrize('axis', ['word', 'code'])
+@pytest.mark.parametrize('output', ['tsv', 'jsonl'])
+def test_external_matches_default(tmp_path, capsys, code_first, axis, output):
+    old_path, new_path = write_pair(tmp_path, code_first)
+    argv = [old_path, new_path, '--axis', axis, '--format', output]
+    default = run_cli(capsys, argv)
+    external = run_cli(capsys, argv + ['--external', '--memory', '0'])
+    assert default[0] == EXIT_DIFFERENT
+    assert external == default
+
+
+def test_external_keeps_all_codes(tmp_path, capsys):
+    old_path, new_path = write_pair(tmp_path, True)
+    _, lines = run_cli(capsys, [old_path, new_path, '--format', 'tsv', '--external'])
+    assert lines == ['added\t新增\t\txz', 'changed\t世界\tshijie sj\tsj',
+                     'changed\t拟好\tnihao\tnh', 'removed\t删除\tsc\t']
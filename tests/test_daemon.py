@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+
+from vocabdiff.daemon import VocabServer, _local_host
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def start(server):
+    listener = await asyncio.start_server(server.serve_client, '127.0.0.1', 0)
+    return listener, listener.sockets[0].getsockname()[1]
+
+
+async def json_request(port, request):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(json.dumps(request).encode('utf-8') + b'\n')
+    await writer.drain()
+    reply = json.loads(await reader.readline())
+    writer.close()
+    return reply
+
+
+async def http_request(port, headers):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    lines = ['GET /stats HTTP/1.1', *headers, '', '']
+    writer.write('\r\n'.join(lines).encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response.split(b' ', 2)[1].decode(), json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+def test_json_requests_need_token():
+    async def main():
+        listener, port = await start(VocabServer(token='secret'))
+        async with listener:
+            assert not (await json_request(port, {'op': 'stats'}))['ok']
+            assert not (await json_request(port, {'op': 'stats', 'token': 'wrong'}))['ok']
+            assert not (await json_request(port, {'op': 'stats', 'token': 1}))['ok']
+            assert (await json_request(port, {'op': 'stats', 'token': 'secret'}))['ok']
+
+    run(main())
+
+
+@pytest.mark.parametrize('headers, status', [
+    (['Host: 127.0.0.1', 'Authorization: Bearer secret'], '200'),
+    (['Host: localhost:8765', 'Authorization: Bearer secret'], '200'),
+    (['Host: [::1]:8765', 'Authorization: Bearer secret'], '200'),
+    (['Host: 127.0.0.1'], '403'),
+    (['Host: 127.0.0.1', 'Authorization: Bearer wrong'], '403'),
+    # DNS 重绑定的网页带着自己的域名
+    (['Host: attacker.example:8765', 'Authorization: Bearer secret'], '403'),
+    (['Authorization: Bearer secret'], '403'),
+])
+def test_http_checks_host_and_token(headers, status):
+    async def main():
+        listener, port = await start(VocabServer(token='secret'))
+        async with listener:
+            return await http_request(port, headers)
+
+    code, reply = run(main())
+    assert code == status
+    assert reply['ok'] == (status == '200')
+
+
+def test_without_token_server_accepts_requests():
+    async def main():
+        listener, port = await start(VocabServer())
+        async with listener:
+            return await json_request(port, {'op': 'stats'})
+
+    assert run(main())['ok']
+
+
+def test_local_host():
+    assert _local_host('LOCALHOST')
+    assert _local_host('127.0.0.1:80')
+    assert not _local_host('127.0.0.1.attacker.example')
+    assert not _local_host('')
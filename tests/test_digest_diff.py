@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from vocabdiff import vectorized
+from vocabdiff.bidi import BiIndex, collect_records, diff_axis, diff_digested
+
+
+def make_index(records):
+    return BiIndex.pack(*collect_records(((word, code, ()) for word, code in records), False))
+
+
+def sample_pair(size, changes, seed):
+    # 旧词库的一部分词条删除、改码或追加第二个编码，再加一些新词
+    rng = random.Random(seed)
+    old = [(f"词{index}", f"c{rng.randrange(size // 4 + 1)}") for index in range(size)]
+    new = list(old)
+    for _ in range(changes):
+        index = rng.randrange(len(new))
+        word = new[index][0]
+        roll = rng.random()
+        if roll < 0.3:
+            del new[index]
+        elif roll < 0.6:
+            new[index] = (word, f"c{rng.randrange(size)}")
+        elif roll < 0.8:
+            new.append((word, f"x{rng.randrange(10)}"))
+        else:
+            new.append((f"新词{rng.randrange(size)}", f"c{rng.randrange(size // 4 + 1)}"))
+    return make_index(old), make_index(new)
+
+
+def both_axes(old, new):
+    return [(old.by_word, old.word_digest(), new.by_word, new.word_digest()),
+            (old.by_code, old.code_digest(), new.by_code, new.code_digest())]
+
+
+# 少量变化时只深入摘要不同的桶，大量变化时退回整体对比，两条路径都要与 diff_axis 一致
+@pytest.mark.parametrize('size, changes', [(5000, 0), (5000, 3), (5000, 40), (5000, 2000), (300, 50)])
+def test_matches_diff_axis(size, changes):
+    old, new = sample_pair(size, changes, size + changes)
+    for old_map, old_digest, new_map, new_digest in both_axes(old, new):
+        assert diff_digested(old_map, old_digest, new_map, new_digest) == diff_axis(old_map, new_map)
+
+
+def test_identical_content_in_other_order():
+    old, _ = sample_pair(3000, 0, 7)
+    records = list(zip(old.by_word, (codes[0] for codes in old.by_word.values())))
+    new = make_index(records[::-1])
+    for old_map, old_digest, new_map, new_digest in both_axes(old, new):
+        assert diff_digested(old_map, old_digest, new_map, new_digest) == diff_axis(old_map, new_map)
+
+
+def test_without_numpy(monkeypatch):
+    # 摘要在没有 numpy 时逐条计算，结果仍要与对比一致
+    monkeypatch.setattr(vectorized, 'np', None)
+    old, new = sample_pair(5000, 25, 11)
+    for old_map, old_digest, new_map, new_digest in both_axes(old, new):
+        assert diff_digested(old_map, old_digest, new_map, new_digest) == diff_axis(old_map, new_map)
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from vocabdiff.formats import detect_format, iter_records
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SCEL_RECORDS = [('你好', "ni'hao", ('120',)), ('拟好', "ni'hao", ('3',)), ('世界', "shi'jie", ('80',))]
+
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+def test_scel():
+    assert detect_format(fixture('sample.scel')).name == 'scel'
+    assert list(iter_records(fixture('sample.scel'))) == SCEL_RECORDS
+
+
+def test_truncated_scel(tmp_path):
+    # 截断在任何位置都只能读出完整的词条，或者报告不支持的文件，不能读出半截的词
+    data = open(fixture('sample.scel'), 'rb').read()
+    path = tmp_path / 'cut.scel'
+    errors = 0
+    for size in range(0x1540, len(data)):
+        path.write_bytes(data[:size])
+        try:
+            records = list(iter_records(str(path)))
+        except ValueError:
+            errors += 1
+            continue
+        assert records == SCEL_RECORDS[:len(records)]
+    assert errors
+
+
+def test_rime():
+    assert detect_format(fixture('sample.dict.yaml')).name == 'rime'
+    # 词和编码里的空格按制表符分列保留，编码的音节用 ' 连接
+    assert list(iter_records(fixture('sample.dict.yaml'))) == [
+        ('你好', "ni'hao", ('120',)),
+        ('世界', "shi'jie", ('80',)),
+        ('hello world', "hello'world", ('5',)),
+        ('单字', '', ()),
+    ]
+
+
+def test_rime_columns():
+    assert list(iter_records(fixture('columns.dict.yaml'))) == [
+        ('你好', "ni'hao", ('nh',)),
+        ('世界', "shi'jie", ()),
+    ]
+
+
+@pytest.mark.parametrize('name', ['weight_first.txt', 'weight_middle.txt'])
+def test_weight_column_moved_last(name):
+    assert detect_format(fixture(name)).name == 'text'
+    assert list(iter_records(fixture(name))) == [
+        ('你好', 'nihao', ('120',)),
+        ('世界', 'shijie', ('80',)),
+        ('拟好', 'nihao', ('3',)),
+    ]
@@ -0,0 +1,31 @@
+import pytest
+
+from vocabdiff.loader import SAMPLE_SIZE, detect_encoding, iter_vocab, parse_line
+
+
+def test_parse_line():
+    assert parse_line('你好 nihao 12\n') == ('你好', 'nihao', ('12',))
+    assert parse_line('12 你好 nihao', (1, 2, 0)) == ('你好', 'nihao', ('12',))
+    assert parse_line('你好\n') == ('你好', '', ())
+    assert parse_line('# 注释') is None
+    assert parse_line('  \n') is None
+
+
+@pytest.mark.parametrize('encoding', ['gbk', 'utf-8', 'big5'])
+def test_non_ascii_after_sample(tmp_path, encoding):
+    # 开头超过一个样本的纯 ASCII 行之后才出现中文
+    lines = [f"word{index}\tw{index}" for index in range(SAMPLE_SIZE // 10)]
+    words = ['詞庫對比', '測試編碼', '繁體中文'] * 200
+    lines += [f"{word}\tc{index}" for index, word in enumerate(words)]
+    path = tmp_path / 'late.txt'
+    path.write_bytes(''.join(line + '\n' for line in lines).encode(encoding))
+
+    records = list(iter_vocab(str(path), detect_encoding(str(path))))
+    assert len(records) == len(lines)
+    assert records[-1] == (words[-1], f"c{len(words) - 1}", ())
+
+
+def test_plain_ascii(tmp_path):
+    path = tmp_path / 'ascii.txt'
+    path.write_bytes(b'hello\th\nworld\tw\n')
+    assert detect_encoding(str(path)) == 'utf-8'
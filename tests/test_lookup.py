@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from vocabdiff.compact import CompactVocab
+from vocabdiff.lookup import DiffLookup, KeyIndex
+
+
+def levenshtein(a, b):
+    # 逐格填满的编辑距离矩阵，作为参照
+    row = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j, other in enumerate(b, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (char != other))
+    return row[-1]
+
+
+def random_key(rng, alphabet):
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 6)))
+
+
+@pytest.mark.parametrize('alphabet', ['abc', 'zhongwen', '中文词库'])
+def test_fuzzy_matches_brute_force(alphabet):
+    rng = random.Random(alphabet)
+    for _ in range(100):
+        keys = {random_key(rng, alphabet) for _ in range(rng.randint(0, 80))}
+        index = KeyIndex(keys)
+        term = random_key(rng, alphabet + 'x')
+        distance = rng.randint(0, 3)
+        expected = sorted((levenshtein(term, key), key) for key in keys
+                          if levenshtein(term, key) <= distance)
+        assert index.fuzzy(term, distance) == expected
+        assert index.fuzzy(term, distance, 3) == expected[:3]
+
+
+def test_prefix_matches_brute_force():
+    rng = random.Random(1)
+    keys = {random_key(rng, 'abc') for _ in range(300)}
+    index = KeyIndex(keys)
+    for prefix in ['', 'a', 'ab', 'cab', 'x']:
+        assert index.prefix(prefix) == sorted(key for key in keys if key.startswith(prefix))
+    assert index.prefix('a', 2) == sorted(key for key in keys if key.startswith('a'))[:2]
+
+
+def test_diff_lookup_labels():
+    old = CompactVocab({'zhong': ['中'], 'zhon': ['钟'], 'guo': ['国']}, multi=True)
+    new = CompactVocab({'zhong': ['中', '重'], 'zhon': ['钟'], 'zhou': ['周']}, multi=True)
+    lookup = DiffLookup(old, new)
+    assert lookup.prefix('zho') == [
+        ('zhon', 'unchanged', ('钟',), ('钟',), None),
+        ('zhong', 'changed', ('中',), ('中', '重'), None),
+        ('zhou', 'added', (), ('周',), None),
+    ]
+    assert [(key, status, found) for key, status, _, _, found in lookup.fuzzy('gu', 1)] == [
+        ('guo', 'removed', 1)]
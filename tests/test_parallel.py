@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from vocabdiff.bidi import read_bi_index
+from vocabdiff.parallel import file_layout, read_bi_index_parallel, read_vocab_parallel, split_ranges
+
+ENCODINGS = ['utf-8', 'utf-8-sig', 'utf-16', 'utf-16-le', 'utf-16-be', 'gb18030']
+
+
+def write_vocab(path, encoding, seed=0):
+    # 多字节的词、一词多码、注释和空行，词数足够切出很多区间
+    rng = random.Random(seed)
+    lines = ['# 注释']
+    for index in range(3000):
+        word = ''.join(rng.choice('词库对比测试编码𠀀') for _ in range(rng.randint(1, 4)))
+        lines.append(f"{word}{index % 700}\tc{rng.randrange(900)}\t{rng.randrange(100)}")
+        if index % 50 == 0:
+            lines.append('')
+    path.write_bytes(''.join(line + '\n' for line in lines).encode(encoding))
+    return str(path)
+
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+def test_ranges_start_on_lines(tmp_path, encoding):
+    file_path = write_vocab(tmp_path / 'vocab.txt', encoding)
+    codec, start, width = file_layout(file_path, encoding)
+    newline = '\n'.encode(codec)
+    data = open(file_path, 'rb').read()
+    # 区间数很多，切分点几乎都先落在多字节字符中间
+    ranges = split_ranges(file_path, codec, start, width, 97)
+    assert len(ranges) > 50
+    assert ranges[0][0] == start and ranges[-1][1] == len(data)
+    for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start
+        assert (end - start) % width == 0
+        assert data[end - len(newline):end] == newline
+    text = ''.join(data[lo:hi].decode(codec) for lo, hi in ranges)
+    assert text == data[start:].decode(codec)
+
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+@pytest.mark.parametrize('multi', [False, True])
+def test_parallel_matches_serial(tmp_path, encoding, multi):
+    file_path = write_vocab(tmp_path / 'vocab.txt', encoding)
+    serial = read_vocab_parallel(file_path, encoding, workers=1, multi=multi)
+    parallel = read_vocab_parallel(file_path, encoding, workers=5, multi=multi)
+    assert len(serial) > 2000
+    assert list(parallel.iter_items()) == list(serial.iter_items())
+
+
+@pytest.mark.parametrize('encoding', ['utf-16', 'gb18030'])
+def test_parallel_bi_index_matches_serial(tmp_path, encoding):
+    file_path = write_vocab(tmp_path / 'vocab.txt', encoding)
+    serial = read_bi_index(file_path, encoding)
+    parallel = read_bi_index_parallel(file_path, encoding, workers=5)
+    assert parallel.code_first == serial.code_first
+    assert list(parallel.by_word.iter_items()) == list(serial.by_word.iter_items())
+    assert list(parallel.by_code.iter_items()) == list(serial.by_code.iter_items())
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from vocabdiff.formats import iter_records
+from vocabdiff.patch import apply_patch, canonical_line, make_patch
+
+
+def write_vocab(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+
+
+def canonical(path):
+    return sorted({canonical_line(record) for record in iter_records(str(path))})
+
+
+def sample_pair(seed):
+    # 旧词库删掉一些行、改掉一些编码、再加一些新词并打乱顺序，作为新词库
+    rng = random.Random(seed)
+    old = [f"词{index}\tc{rng.randrange(500)}" for index in range(2000)]
+    new = [line for line in old if rng.random() > 0.05]
+    for index in range(0, len(new), 7):
+        new[index] = f"{new[index].split()[0]}\tc{rng.randrange(500)}"
+    new += [f"新词{index}\tc{rng.randrange(500)}" for index in range(100)]
+    rng.shuffle(new)
+    return old, new
+
+
+@pytest.mark.parametrize('name', ['update.vdp', 'update.vdp.gz'])
+def test_round_trip(tmp_path, name):
+    old, new = tmp_path / 'old.txt', tmp_path / 'new.txt'
+    patch, out = tmp_path / name, tmp_path / 'out.txt'
+    write_vocab(old, sample_pair(0)[0])
+    write_vocab(new, sample_pair(0)[1])
+    removed, added = make_patch(str(old), str(new), str(patch))
+    assert removed and added
+    apply_patch(str(old), str(patch), str(out))
+    # 输出是规范形式：去重后排好序的规范行
+    assert out.read_text(encoding='utf-8').splitlines() == canonical(new)
+
+
+def test_identical_files(tmp_path):
+    old, new, patch, out = (tmp_path / name for name in ('old.txt', 'new.txt', 'update.vdp', 'out.txt'))
+    lines = sample_pair(1)[0]
+    write_vocab(old, lines)
+    write_vocab(new, lines[::-1])
+    assert make_patch(str(old), str(new), str(patch)) == (0, 0)
+    apply_patch(str(old), str(patch), str(out))
+    assert out.read_text(encoding='utf-8').splitlines() == canonical(old)
+
+
+def test_refuses_other_base(tmp_path):
+    old, new, other = tmp_path / 'old.txt', tmp_path / 'new.txt', tmp_path / 'other.txt'
+    patch, out = tmp_path / 'update.vdp', tmp_path / 'out.txt'
+    old_lines, new_lines = sample_pair(2)
+    write_vocab(old, old_lines)
+    write_vocab(new, new_lines)
+    write_vocab(other, old_lines[1:])
+    make_patch(str(old), str(new), str(patch))
+    with pytest.raises(ValueError):
+        apply_patch(str(other), str(patch), str(out))
+    assert not out.exists()
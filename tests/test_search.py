@@ -0,0 +1,32 @@
+from vocabdiff.search import SearchIndex, SearchSession, change_fields
+
+
+ITEMS = [('你好', ('nihao', 'nh')), ('世界', ('shijie',)), ('好的', ('haode',))]
+
+
+def test_search_finds_rows():
+    index = SearchIndex(ITEMS)
+    assert index.search('好') == [0, 2]
+    assert index.search('shi') == [1]
+    assert index.search('xyz') == []
+
+
+def test_search_does_not_cross_fields():
+    index = SearchIndex(ITEMS)
+    assert index.search('你好\tnihao') == []
+    assert index.search('nh\n世界') == []
+    assert index.search('nihao\tnh', [0]) == []
+
+
+def test_change_rows():
+    index = SearchIndex([('你好', (('nihao',), ('nh',)))], change_fields)
+    assert index.search('nh') == [0]
+    assert index.row_text(0) == '你好\tnihao\t\tnh'
+
+
+def test_session_refines_previous_hits():
+    session = SearchSession({'a': SearchIndex(ITEMS)})
+    assert session.search('h') == {'a': [0, 1, 2]}
+    assert session.search('ha') == {'a': [0, 2]}
+    assert session.search('hao') == {'a': [0, 2]}
+    assert session.search('s') == {'a': [1]}
@@ -0,0 +1,54 @@
+import json
+import threading
+
+from vocabdiff.trace import Tracer
+
+
+def busy(count):
+    return sum(index * index for index in range(count))
+
+
+def test_stages_and_summary(tmp_path):
+    tracer = Tracer()
+    with tracer.stage("解析", 1000):
+        busy(1000)
+    with tracer.stage("对比") as span:
+        span.count = 10
+    assert [span.name for span in tracer.spans] == ["解析", "对比"]
+    assert "解析" in tracer.summary() and "10 条" in tracer.summary()
+    assert not tracer.export_profile(str(tmp_path / 'run.prof'))
+
+    path = tmp_path / 'trace.json'
+    tracer.export_chrome(str(path))
+    events = json.loads(path.read_text(encoding='utf-8'))['traceEvents']
+    assert [event['name'] for event in events] == ["解析", "对比"]
+
+
+def test_concurrent_profiled_stages(tmp_path):
+    # 两个线程同时进入分析中的阶段：Python 3.12 起第二个分析器无法启用，该阶段只计时，不能报错
+    tracer = Tracer(profile=True)
+    both_started = threading.Barrier(2)
+    errors = []
+
+    def read(name):
+        try:
+            with tracer.stage(name):
+                both_started.wait(5)
+                busy(20000)
+                both_started.wait(5)
+            # 阶段结束后本线程可以再次启用分析器
+            with tracer.stage(name + " 写入缓存"):
+                busy(1000)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read, args=(name,)) for name in ("旧", "新")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(tracer.spans) == 4
+    with tracer.stage("对比"):
+        busy(1000)
+    assert tracer.export_profile(str(tmp_path / 'run.prof'))
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from vocabdiff import vectorized
+from vocabdiff.bidi import diff_axis
+from vocabdiff.compact import CompactVocab
+
+pytest.importorskip('numpy')
+
+
+def python_diff(monkeypatch, old, new):
+    # 没有 numpy 时 diff_axis 逐条对比，作为参照
+    with monkeypatch.context() as patch:
+        patch.setattr(vectorized, 'np', None)
+        return diff_axis(old, new)
+
+
+def random_text(rng):
+    # 包括空串、多字节字符和超过 8 字节的长串
+    return ''.join(rng.choice('ab你好') for _ in range(rng.randint(0, 20)))
+
+
+def random_table(rng, keys, multi):
+    table = {}
+    for key in keys:
+        if rng.random() < 0.2:
+            continue
+        if multi:
+            codes = [random_text(rng) for _ in range(rng.randint(1, 3))]
+            # 同一组编码换个顺序不算修改
+            table[key] = codes[::-1] if rng.random() < 0.2 else codes
+        else:
+            table[key] = random_text(rng)
+    for _ in range(3):
+        table[random_text(rng)] = [random_text(rng)] if multi else random_text(rng)
+    return table
+
+
+@pytest.mark.parametrize('multi', [False, True])
+def test_matches_python_diff(monkeypatch, multi):
+    rng = random.Random(multi)
+    for _ in range(200):
+        keys = [random_text(rng) for _ in range(rng.randint(0, 40))]
+        old = CompactVocab.pack(random_table(rng, keys, multi), multi)
+        new = CompactVocab.pack(random_table(rng, keys, multi), multi)
+        assert vectorized.diff_arrays(old, new) == python_diff(monkeypatch, old, new)
+
+
+@pytest.mark.parametrize('multi', [False, True])
+def test_large_input_uses_vectors(monkeypatch, multi):
+    monkeypatch.setattr(vectorized, 'enabled', True)
+    rng = random.Random(2)
+    size = vectorized.MIN_VECTOR_SIZE
+    old_table = {f"词{index}": [f"c{rng.randrange(size)}"] for index in range(size)}
+    new_table = {word: list(codes) for word, codes in old_table.items() if rng.random() > 0.01}
+    for word in rng.sample(sorted(new_table), 200):
+        new_table[word].append(f"x{rng.randrange(10)}")
+    for index in range(100):
+        new_table[f"新词{index}"] = [f"c{index}"]
+    if not multi:
+        old_table = {word: codes[0] for word, codes in old_table.items()}
+        new_table = {word: codes[-1] for word, codes in new_table.items()}
+    old, new = CompactVocab.pack(old_table, multi), CompactVocab.pack(new_table, multi)
+    assert vectorized.usable(old, new)
+    monkeypatch.setattr(vectorized, 'enabled', False)
+    assert not vectorized.usable(old, new)
+    monkeypatch.setattr(vectorized, 'enabled', True)
+    assert diff_axis(old, new) == python_diff(monkeypatch, old, new)
@@ -0,0 +1,185 @@
+import os
+import random
+
+import pytest
+
+from vocabdiff.bidi import read_bi_index
+from vocabdiff.search import SearchIndex, entry_fields
+from vocabdiff.watch import PatchedIndex, PatchedRows, RankedRows, WatchedVocab
+
+
+def write_lines(path, lines, stamp):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+    # 同一秒内多次写入时修改时间可能不变，手动拉开
+    os.utime(path, ns=(stamp, stamp))
+
+
+def edit(rng, lines, make_line):
+    for _ in range(rng.randint(1, 30)):
+        index = rng.randrange(len(lines) + 1)
+        op = rng.random()
+        if op < 0.3 and index < len(lines):
+            del lines[index]
+        elif op < 0.6:
+            lines.insert(index, make_line(rng))
+        elif index < len(lines):
+            lines[index] = make_line(rng)
+
+
+def assert_matches(watched, fresh):
+    for axis in ('word', 'code'):
+        view = watched.view(axis)
+        expected = getattr(fresh, f'by_{axis}')
+        assert sorted(view) == sorted(expected)
+        for key in expected:
+            assert view.codes(key) == tuple(expected.codes(key))
+
+
+def word_line(rng):
+    return f"词{rng.randrange(300)}\tc{rng.randrange(200)}"
+
+
+def code_line(rng):
+    return f"c{rng.randrange(200)}\t词{rng.randrange(300)}"
+
+
+@pytest.mark.parametrize('make_line', [word_line, code_line])
+def test_refresh_matches_full_parse(tmp_path, make_line):
+    rng = random.Random(make_line.__name__)
+    path = tmp_path / 'new.txt'
+    # 重复的行、单列的行和注释都要与完整解析一致
+    lines = [make_line(rng) for _ in range(3000)] + ['单列', '# 注释', make_line(rng)] * 3
+    write_lines(path, lines, 10 ** 18)
+    previous = read_bi_index(str(path))
+    watched = WatchedVocab(str(path), previous)
+    assert not watched.changed()
+    for round_ in range(1, 15):
+        edit(rng, lines, make_line)
+        write_lines(path, lines, 10 ** 18 + round_)
+        assert watched.changed()
+        words, codes = watched.refresh()
+        fresh = read_bi_index(str(path))
+        assert_matches(watched, fresh)
+        # 值变了的键都要报告出来
+        for axis, reported in (('word', words), ('code', codes)):
+            before, after = getattr(previous, f'by_{axis}'), getattr(fresh, f'by_{axis}')
+            for key in set(before) | set(after):
+                if sorted(before.codes(key)) != sorted(after.codes(key)):
+                    assert key in reported
+        previous = fresh
+
+
+def test_refresh_many_keys(tmp_path):
+    # 受影响的键很多时不按子串过滤，逐块重新收集
+    rng = random.Random(5)
+    path = tmp_path / 'new.txt'
+    lines = [word_line(rng) for _ in range(2000)]
+    write_lines(path, lines, 10 ** 18)
+    watched = WatchedVocab(str(path), read_bi_index(str(path)))
+    lines = [word_line(rng) for _ in range(2000)]
+    write_lines(path, lines, 10 ** 18 + 1)
+    words, _ = watched.refresh()
+    assert len(words) > 64
+    assert_matches(watched, read_bi_index(str(path)))
+
+
+def test_rime_keeps_spaces(tmp_path):
+    path = tmp_path / 'new.dict.yaml'
+    header = ['---', 'name: new', '...']
+    write_lines(path, header + ['hello world\thello world', '你好\tni hao'], 10 ** 18)
+    watched = WatchedVocab(str(path), read_bi_index(str(path)))
+    assert watched.word_codes('hello world') == ("hello'world",)
+    write_lines(path, header + ['hello world\thello world\t5', '你好\tni hao', '世界\tshi jie'], 10 ** 18 + 1)
+    # 受影响的以块为单位，同一块里没变的词也会报告
+    words, codes = watched.refresh()
+    assert {'世界'} <= words and "hello" not in words
+    assert {"shi'jie"} <= codes
+    assert watched.word_codes('hello world') == ("hello'world",)
+    assert watched.word_codes('hello') == ()
+    assert_matches(watched, read_bi_index(str(path)))
+
+
+def expected_rows(base_keys, values, extra_keys):
+    return [(key, values[key]) for key in base_keys if key in values] + [(key, values[key]) for key in extra_keys]
+
+
+def test_patched_rows():
+    rng = random.Random(1)
+    base = [(f"k{index}", f"v{index}") for index in range(200)]
+    rows = PatchedRows(base)
+    index = PatchedIndex(rows, SearchIndex(base), entry_fields)
+    base_keys = [key for key, _ in base]
+    values = dict(base)
+    extra_keys = []
+    for _ in range(300):
+        before = list(rows)
+        updates = {}
+        for _ in range(rng.randint(0, 5)):
+            key = f"k{rng.randrange(260)}"
+            updates[key] = None if rng.random() < 0.4 else f"v{rng.randrange(50)}"
+        for key, value in updates.items():
+            if value is None:
+                values.pop(key, None)
+                if key in extra_keys:
+                    extra_keys.remove(key)
+            else:
+                values[key] = value
+                if key not in base_keys and key not in extra_keys:
+                    extra_keys.append(key)
+        first = rows.patch(updates)
+        after = expected_rows(base_keys, values, extra_keys)
+        assert list(rows) == after
+        if first is None:
+            assert after == before
+        else:
+            assert after[:first] == before[:first] and after[first:] != before[first:]
+        for term in ('k1', 'v4', 'k25\tv1'):
+            assert index.search(term) == SearchIndex(after).search(term)
+
+
+def test_patched_rows_find():
+    # 原序列提供 find 时按它找行，不另建表
+    class Rows(list):
+        def find(self, key):
+            return next((row for row, item in enumerate(self) if item[0] == key), -1)
+
+    rows = PatchedRows(Rows([('a', 1), ('b', 2), ('c', 3)]))
+    assert rows.patch({'b': None, 'd': 4}) == 1
+    assert rows._positions is None
+    assert list(rows) == [('a', 1), ('c', 3), ('d', 4)]
+    assert rows.patch({'b': 5}) == 1
+    assert list(rows) == [('a', 1), ('b', 5), ('c', 3), ('d', 4)]
+
+
+def test_ranked_rows():
+    rng = random.Random(2)
+
+    def rank(item):
+        return -item[1][0], item[1][1], item[0]
+
+    def axis(item):
+        return item[1][1]
+
+    current = {}
+    for index in range(100):
+        key, kind = f"k{index % 60}", rng.choice(('word', 'code'))
+        current[kind, key] = (key, (rng.randrange(10), kind))
+    rows = RankedRows(sorted(current.values(), key=rank), rank, axis)
+    for _ in range(300):
+        before = list(rows)
+        updates = {}
+        for _ in range(rng.randint(0, 4)):
+            kind, key = rng.choice(('word', 'code')), f"k{rng.randrange(80)}"
+            updates[kind, key] = None if rng.random() < 0.3 else (rng.randrange(10), kind)
+        for (kind, key), record in updates.items():
+            if record is None:
+                current.pop((kind, key), None)
+            else:
+                current[kind, key] = (key, record)
+        first = rows.patch(updates)
+        after = sorted(current.values(), key=rank)
+        assert list(rows) == after
+        if first is None:
+            assert after == before
+        else:
+            assert after[:first] == before[:first]
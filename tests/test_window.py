@@ -0,0 +1,77 @@
+import os
+import random
+
+import pytest
+
+pytest.importorskip('tkinter')
+
+from vocabdiff import window
+from vocabdiff.bidi import BiIndex
+from vocabdiff.cache import VocabCache
+from vocabdiff.search import SearchSession
+from vocabdiff.trace import Tracer
+
+
+class StubJob:
+    def progress(self, *args):
+        pass
+
+    def check(self):
+        pass
+
+
+class StubWidget:
+    def tab(self, *args, **kwargs):
+        pass
+
+    def config(self, *args, **kwargs):
+        pass
+
+
+def write_lines(path, lines, stamp):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+    os.utime(path, ns=(stamp, stamp))
+
+
+def vocab_line(rng):
+    return f"词{rng.randrange(300)}\tc{rng.randrange(100)}"
+
+
+def table(rows):
+    return sorted(repr(rows[index]) for index in range(len(rows)))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_patched_window_matches_fresh_compare(tmp_path, monkeypatch, seed):
+    # 界面只负责布局，监视时打补丁后的各标签页和查找结果应与重新对比一致
+    monkeypatch.setattr(window, 'vocab_cache', VocabCache(str(tmp_path / 'cache'), namespace='test', kind=BiIndex))
+    rng = random.Random(seed)
+    old_path, new_path = tmp_path / 'old.txt', tmp_path / 'new.txt'
+    write_lines(old_path, [vocab_line(rng) for _ in range(400)], 10 ** 9)
+    lines = [vocab_line(rng) for _ in range(400)]
+    write_lines(new_path, lines, 10 ** 9)
+
+    tabs, indexes, _, source, _ = window.run_compare(StubJob(), str(old_path), str(new_path), Tracer())
+    app = window.CompareWindow(None)
+    app.notebook = app.progress_label = app.search_status = StubWidget()
+    app.search_entry = type('Entry', (), {'get': lambda self: '词1'})()
+    app.result_tabs = type('Tabs', (), {'clear': lambda self: None, 'add': lambda self, title, build: title,
+                                        'build_selected': lambda self: None})()
+    app.display_results(tabs, indexes)
+    watched, old_vocab = window.start_watching(StubJob(), *source)
+
+    for round_ in range(3):
+        for _ in range(20):
+            lines[rng.randrange(len(lines))] = vocab_line(rng)
+        lines.append(vocab_line(rng))
+        write_lines(new_path, lines, 10 ** 9 + round_ + 1)
+        app.apply_patches(window.run_refresh(StubJob(), watched, old_vocab))
+
+        fresh, fresh_indexes, _, _, _ = window.run_compare(StubJob(), str(old_path), str(new_path), Tracer())
+        session = SearchSession(fresh_indexes)
+        session.search('词1')
+        for name, _, rows in fresh:
+            patched = app.result_rows[name]
+            assert table(patched) == table(rows), name
+            assert (sorted(patched[index] for index in app.search_session.hits[name])
+                    == sorted(rows[index] for index in session.hits[name])), name
@@ -0,0 +1,26 @@
+# 词库对比引擎，不依赖 Tkinter，可供各个界面脚本和命令行共用
+from .loader import detect_encoding, iter_vocab, parse_line
+from .formats import detect_format, iter_records
+from .compact import CompactVocab
+from .bidi import BiIndex, diff_axis, diff_digested, iter_diff, read_bi_index
+from .digest import BucketDigest
+from .cache import VocabCache
+from .extsort import diff_sorted, external_diff
+from .worker import Cancelled, Job, run_concurrently
+from .cli import diff_files
+from .lookup import DiffLookup, KeyIndex
+
+# 这些模块也能用 python -m 直接运行，包导入时先载入会让 runpy 发出警告，用到时再导入
+_LAZY = {
+    'apply_patch': 'patch',
+    'make_patch': 'patch',
+    'version_history': 'history',
+    'collision_report': 'collisions',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(f".{_LAZY[name]}", __name__), name)
@@ -0,0 +1,225 @@
+import mmap
+import struct
+from itertools import chain, islice
+
+from .compact import CompactVocab, collect
+from .digest import DESCEND_LIMIT, BucketDigest
+from .formats import iter_records
+from . import vectorized
+from .worker import PROGRESS_STEP
+
+# 文件头：魔数、是否编码在前，之后依次是“词→编码”和“编码→词”两个紧凑词库镜像及各自的分桶摘要
+MAGIC = b'VDB2'
+HEADER = struct.Struct('<4sI')
+HEADER_SIZE = 8
+# 判断列顺序时抽样的行数
+ORDER_SAMPLE = 1000
+
+
+def _is_code(text):
+    # 输入法编码一般是 ASCII 字母、数字和标点
+    return text.isascii()
+
+
+def detect_code_first(records):
+    # records 是 (第一列, 第二列, 其余列) 的样本；第一列像编码、第二列像词的行多时判为编码在前
+    votes = 0
+    for first, second, _ in records:
+        if not second:
+            continue
+        first_code, second_code = _is_code(first), _is_code(second)
+        if first_code and not second_code:
+            votes += 1
+        elif second_code and not first_code:
+            votes -= 1
+    return votes > 0
+
+
+def collect_records(records, code_first):
+    # 按文件的列顺序把 (第一列, 第二列, 其余列) 收集成 {词: [编码]} 和 {编码: [词]}，解析完再一次性打包
+    words = {}
+    codes = {}
+    for first, second, _ in records:
+        if code_first and second:
+            first, second = second, first
+        collect(words, first, second)
+        if second:
+            collect(codes, second, first)
+    return words, codes
+
+
+class BiIndex:
+    # 双向索引：同一遍解析里同时建立 词→编码 和 编码→词，两个方向都支持一词多码、一码多词
+    __slots__ = ('by_word', 'by_code', 'code_first', '_word_digest', '_code_digest')
+
+    def __init__(self, by_word=None, by_code=None, code_first=False):
+        self.by_word = by_word if by_word is not None else CompactVocab(multi=True)
+        self.by_code = by_code if by_code is not None else CompactVocab(multi=True)
+        self.code_first = code_first
+        self._word_digest = self._code_digest = None
+
+    @classmethod
+    def pack(cls, words, codes, code_first=False):
+        # 由 collect_records 收集的两个字典建立
+        return cls(CompactVocab.pack(words, True), CompactVocab.pack(codes, True), code_first)
+
+    def __len__(self):
+        return len(self.by_word)
+
+    def word_digest(self):
+        # 分桶摘要在第一次使用或保存时计算，随缓存一起保存
+        if self._word_digest is None:
+            self._word_digest = BucketDigest.build(self.by_word)
+        return self._word_digest
+
+    def code_digest(self):
+        if self._code_digest is None:
+            self._code_digest = BucketDigest.build(self.by_code)
+        return self._code_digest
+
+    def same_as(self, other):
+        # 编码→词由词→编码唯一确定，比较一个方向的根就够了
+        return self.word_digest().same_as(other.word_digest())
+
+    def nbytes(self):
+        return self.by_word.nbytes() + self.by_code.nbytes()
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, int(self.code_first)))
+            self.by_word.write_to(file)
+            self.by_code.write_to(file)
+            self.word_digest().write_to(file)
+            self.code_digest().write_to(file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(data)
+        magic, code_first = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("不支持的词库文件")
+        index = cls.__new__(cls)
+        index.code_first = bool(code_first)
+        pos = HEADER_SIZE
+        for name, kind in (('by_word', CompactVocab), ('by_code', CompactVocab),
+                           ('_word_digest', BucketDigest), ('_code_digest', BucketDigest)):
+            part, size = kind.from_buffer(data, view[pos:])
+            setattr(index, name, part)
+            pos += size
+        return index
+
+
+def read_bi_index(file_path, encoding=None, progress=None):
+    # 先缓存开头的样本判断列顺序，再继续同一个流，整个文件只读一遍
+    records = iter_records(file_path, encoding, progress)
+    sample = list(islice(records, ORDER_SAMPLE))
+    code_first = detect_code_first(sample)
+    return BiIndex.pack(*collect_records(chain(sample, records), code_first), code_first)
+
+
+def _compact_pair(old_map, new_map):
+    return (isinstance(old_map, CompactVocab) and isinstance(new_map, CompactVocab)
+            and old_map.multi == new_map.multi)
+
+
+def _iter_compact(old_map, new_map, progress=None):
+    # 两个紧凑词库逐条按键查找要先编码、散列再解码，很慢；改为键整体解码，
+    # 值先整体比较以制表符连接的编码，不同时才逐条解码。产出与 iter_diff 相同
+    old_rows = dict(zip(old_map, range(len(old_map))))
+    old_texts = old_map.value_texts()
+    for index, (key, text) in enumerate(zip(new_map, new_map.value_texts()), 1):
+        row = old_rows.pop(key, None)
+        if row is None:
+            yield 'added', key, None, new_map.entry(index - 1)[1]
+        elif text != old_texts[row]:
+            old_values, values = old_map.entry(row)[1], new_map.entry(index - 1)[1]
+            if _differs(old_values, values):
+                yield 'changed', key, old_values, values
+        if progress is not None and index % PROGRESS_STEP == 0:
+            progress(index)
+    for key, row in old_rows.items():
+        yield 'removed', key, old_map.entry(row)[1], None
+
+
+def iter_diff(old_map, new_map):
+    # 边对比边产出 (状态, 键, 旧值, 新值)，先是新增和修改，最后是删除
+    if _compact_pair(old_map, new_map):
+        yield from _iter_compact(old_map, new_map)
+        return
+    for key, values in new_map.items():
+        if key not in old_map:
+            yield 'added', key, None, values
+        else:
+            old_values = old_map[key]
+            if _differs(old_values, values):
+                yield 'changed', key, old_values, values
+    for key, values in old_map.items():
+        if key not in new_map:
+            yield 'removed', key, values, None
+
+
+def _differs(old_values, new_values):
+    if isinstance(new_values, str):
+        return old_values != new_values
+    return old_values != new_values and sorted(old_values) != sorted(new_values)
+
+
+def diff_axis(old_map, new_map, progress=None):
+    # 沿任意一个方向对比：键可以是词也可以是编码，值按集合比较，与出现顺序无关；
+    # 装有 numpy 并启用了向量化引擎时，大词库走向量化引擎
+    if vectorized.usable(old_map, new_map):
+        return vectorized.diff_arrays(old_map, new_map)
+    if _compact_pair(old_map, new_map):
+        results = {'added': {}, 'removed': {}, 'changed': {}}
+        for status, key, old_values, values in _iter_compact(old_map, new_map, progress):
+            if status == 'added':
+                results[status][key] = values
+            elif status == 'removed':
+                results[status][key] = old_values
+            else:
+                results[status][key] = (old_values, values)
+        return results['added'], results['removed'], results['changed']
+    added = {}
+    changed = {}
+    for count, (key, values) in enumerate(new_map.items(), 1):
+        if key not in old_map:
+            added[key] = values
+        elif _differs(old_map[key], values):
+            changed[key] = (old_map[key], values)
+        if progress is not None and count % PROGRESS_STEP == 0:
+            progress(count)
+    removed = {key: values for key, values in old_map.items() if key not in new_map}
+    return added, removed, changed
+
+
+def diff_digested(old_map, old_digest, new_map, new_digest, progress=None):
+    # 根相同时直接判定相同；否则只对比摘要不同的桶，结果按词条在文件中的顺序排列
+    if old_digest.same_as(new_digest):
+        return {}, {}, {}
+    buckets, bits = old_digest.differing(new_digest)
+    if buckets is None or len(buckets) > DESCEND_LIMIT * (1 << bits):
+        return diff_axis(old_map, new_map, progress)
+
+    added, removed, changed = [], [], []
+    count = 0
+    for bucket in buckets:
+        old_rows = {}
+        for index in old_digest.members(bucket, bits):
+            key, values = old_map.entry(index)
+            old_rows[key] = (index, values)
+        for index in new_digest.members(bucket, bits):
+            key, values = new_map.entry(index)
+            old = old_rows.pop(key, None)
+            if old is None:
+                added.append((index, key, values))
+            elif _differs(old[1], values):
+                changed.append((index, key, (old[1], values)))
+            count += 1
+        removed.extend((index, key, values) for key, (index, values) in old_rows.items())
+        if progress is not None:
+            progress(count)
+    return ({key: values for _, key, values in sorted(added)},
+            {key: values for _, key, values in sorted(removed)},
+            {key: values for _, key, values in sorted(changed)})
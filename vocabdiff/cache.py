@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .compact import CompactVocab
+
+# 缓存目录和总大小上限
+CACHE_DIR = os.environ.get('VOCABDIFF_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'vocabdiff'))
+CACHE_BUDGET = 2 << 30
+# 计算内容指纹时每次读取的字节数
+HASH_BLOCK = 1 << 20
+
+
+def content_hash(file_path, size):
+    # 文件大小加全部内容的摘要；只抽样首尾时，中间改了一个编码而大小不变的文件会误用旧缓存
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class VocabCache:
+    # 已解析词库的磁盘缓存，按路径、大小、修改时间和内容指纹查找，超出上限时淘汰最久未用的条目；
+    # kind 是缓存的结构类型，需提供 save(path) 和 load(path)
+    def __init__(self, directory=CACHE_DIR, budget=CACHE_BUDGET, namespace='vocab', kind=CompactVocab):
+        self.directory = directory
+        self.kind = kind
+        self.budget = budget
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(directory, 'index.json')
+
+    def _key(self, file_path, stat):
+        source = f"{self.namespace}\0{os.path.realpath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def _read_index(self):
+        try:
+            with open(self._index_path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {'entries': {}, 'hits': 0, 'misses': 0}
+
+    def _write_index(self, index):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.json')
+        with open(fd, 'w', encoding='utf-8') as file:
+            json.dump(index, file, ensure_ascii=False)
+        os.replace(temp_path, self._index_path)
+
+    def load(self, file_path):
+        # 命中时返回内存映射的只读结构，未命中返回 None
+        stat = os.stat(file_path)
+        key = self._key(file_path, stat)
+        with self._lock:
+            index = self._read_index()
+            entries = index['entries']
+            entry = entries.get(key)
+            if entry is None:
+                # 路径或时间变了但内容相同（例如复制来的基线），按全文指纹复用已有缓存；
+                # 路径、大小和修改时间都相同时直接命中，不再读文件
+                candidates = [e for e in entries.values()
+                              if e['namespace'] == self.namespace and e['size'] == stat.st_size]
+                if candidates:
+                    fingerprint = content_hash(file_path, stat.st_size)
+                    entry = next((e for e in candidates if e['hash'] == fingerprint), None)
+                if entry is not None:
+                    entry = entries[key] = dict(entry, path=file_path, mtime_ns=stat.st_mtime_ns)
+
+            vocab = None
+            if entry is not None:
+                try:
+                    vocab = self.kind.load(os.path.join(self.directory, entry['file']))
+                except (OSError, ValueError):
+                    entries.pop(key, None)
+            if vocab is None:
+                self.misses += 1
+                index['misses'] += 1
+            else:
+                self.hits += 1
+                index['hits'] += 1
+                entry['used'] = time.time()
+            os.makedirs(self.directory, exist_ok=True)
+            self._write_index(index)
+            return vocab
+
+    def store(self, file_path, vocab, stat=None):
+        # stat 应在解析前取得，解析期间文件若被修改，下次查找自然不会命中
+        if stat is None:
+            stat = os.stat(file_path)
+        key = self._key(file_path, stat)
+        os.makedirs(self.directory, exist_ok=True)
+        fingerprint = content_hash(file_path, stat.st_size)
+        fd, data_path = tempfile.mkstemp(dir=self.directory, suffix='.vdc')
+        os.close(fd)
+        if not isinstance(vocab, self.kind):
+            vocab = self.kind(vocab)
+        vocab.save(data_path)
+
+        with self._lock:
+            index = self._read_index()
+            entries = index['entries']
+            entries[key] = {
+                'namespace': self.namespace,
+                'path': file_path,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'hash': fingerprint,
+                'file': os.path.basename(data_path),
+                'bytes': os.path.getsize(data_path),
+                'used': time.time(),
+            }
+            self._evict(entries)
+            self._write_index(index)
+
+    def _evict(self, entries):
+        # 多个键可能指向同一个数据文件，按文件统计大小
+        files = {}
+        for key, entry in entries.items():
+            last = files.get(entry['file'])
+            if last is None or entry['used'] > last[0]:
+                files[entry['file']] = (entry['used'], entry['bytes'])
+        total = sum(size for _, size in files.values())
+        for name, (_, size) in sorted(files.items(), key=lambda item: item[1][0]):
+            if total <= self.budget:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # 仍被映射的文件在部分系统上不能删除，留到下次再淘汰
+                continue
+            total -= size
+            for key in [key for key, entry in entries.items() if entry['file'] == name]:
+                del entries[key]
+
+    def stats(self):
+        index = self._read_index()
+        files = {entry['file']: entry['bytes'] for entry in index['entries'].values()}
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'total_hits': index['hits'],
+            'total_misses': index['misses'],
+            'entries': len(files),
+            'bytes': sum(files.values()),
+        }
@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import sys
+
+from .bidi import BiIndex, iter_diff, read_bi_index
+from .cache import VocabCache
+from .extsort import MEMORY_LIMIT, external_diff
+from .parallel import MIN_PARALLEL_SIZE, read_bi_index_parallel
+
+# 退出码与 diff 相同：0 无差异，1 有差异，2 出错
+EXIT_SAME = 0
+EXIT_DIFFERENT = 1
+EXIT_ERROR = 2
+
+
+def read_index(file_path, encoding=None, cache=None):
+    # 读取双向索引；给出 cache 时先查缓存，与界面脚本共用同一份缓存
+    if cache is not None:
+        cached = cache.load(file_path)
+        if cached is not None:
+            return cached
+    stat = os.stat(file_path)
+    if os.path.getsize(file_path) >= MIN_PARALLEL_SIZE:
+        index = read_bi_index_parallel(file_path, encoding)
+    else:
+        index = read_bi_index(file_path, encoding)
+    if cache is not None:
+        try:
+            cache.store(file_path, index, stat)
+        except OSError:
+            pass
+    return index
+
+
+def diff_files(old_path, new_path, axis='word', encoding=None, cache=None):
+    # 库接口：逐条产出 (状态, 键, 旧值, 新值)；axis 为 'code' 时按编码对比对应的词
+    old_index = read_index(old_path, encoding, cache)
+    new_index = read_index(new_path, encoding, cache)
+    if old_index.same_as(new_index):
+        return iter(())
+    if axis == 'code':
+        return iter_diff(old_index.by_code, new_index.by_code)
+    return iter_diff(old_index.by_word, new_index.by_word)
+
+
+def _values(values):
+    if values is None:
+        return []
+    if isinstance(values, str):
+        return [values]
+    return list(values)
+
+
+def write_jsonl(records, out):
+    for status, key, old, new in records:
+        out.write(json.dumps({'status': status, 'key': key, 'old': _values(old), 'new': _values(new)},
+                             ensure_ascii=False))
+        out.write('\n')
+        yield status
+
+
+def write_tsv(records, out):
+    # 一个键的多个值用空格分隔，解析时空白本来就是列分隔符，不会出现在值里
+    for status, key, old, new in records:
+        out.write(f"{status}\t{key}\t{' '.join(_values(old))}\t{' '.join(_values(new))}\n")
+        yield status
+
+
+WRITERS = {'jsonl': write_jsonl, 'tsv': write_tsv}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='vocabdiff', description="对比两个词库，把差异逐条输出到标准输出")
+    parser.add_argument('old', help="旧词库文件")
+    parser.add_argument('new', help="新词库文件")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='jsonl', help="输出格式")
+    parser.add_argument('--axis', choices=('word', 'code'), default='word', help="按词还是按编码对比")
+    parser.add_argument('--encoding', help="文件编码，默认自动检测")
+    parser.add_argument('--cache', action='store_true', help="使用已解析词库的磁盘缓存")
+    parser.add_argument('--external', action='store_true',
+                        help="外部排序对比，内存占用有上限；结果与默认相同，只是按键排序")
+    parser.add_argument('--memory', type=int, default=MEMORY_LIMIT >> 20, help="外部排序的内存上限 (MB)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    out = sys.stdout
+    try:
+        if args.external:
+            records = external_diff(args.old, args.new, args.memory << 20, encoding=args.encoding, axis=args.axis)
+        else:
+            cache = VocabCache(namespace='bidi-v2', kind=BiIndex) if args.cache else None
+            records = diff_files(args.old, args.new, args.axis, args.encoding, cache)
+        different = False
+        for _ in WRITERS[args.format](records, out):
+            different = True
+        out.flush()
+    except BrokenPipeError:
+        # 下游提前退出（例如 head），不算错误
+        sys.stderr.close()
+        return EXIT_DIFFERENT
+    except (OSError, ValueError, UnicodeError) as e:
+        print(f"vocabdiff: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    return EXIT_DIFFERENT if different else EXIT_SAME
@@ -0,0 +1,151 @@
+import argparse
+import json
+import sys
+from collections import Counter
+
+from .bidi import diff_digested
+from .cli import read_index
+
+# 重码分析：在对比结果上逐条统计，不再扫描整个词库。编码方向的差异给出每个编码前后的候选数，
+# 词方向的差异给出失去全部编码的词；只保留涉及重码（前后任一边有两个以上候选）的编码
+
+# 排名先按类别，同一类别里候选多、增加多的在前
+KINDS = ('new', 'grown', 'lost', 'reshuffled', 'shrunk', 'resolved')
+_RANK = {kind: rank for rank, kind in enumerate(KINDS)}
+
+
+def _present(values):
+    # 值里的空串表示这一行没有编码
+    return tuple(value for value in values if value)
+
+
+def classify(before, after):
+    if before < 2 <= after:
+        return 'new'
+    if before < 2 and after < 2:
+        return None
+    if after < 2:
+        return 'resolved'
+    if after > before:
+        return 'grown'
+    return 'shrunk' if after < before else 'reshuffled'
+
+
+def code_record(old_words, new_words):
+    # 一个编码的 (类别, 前候选数, 后候选数, 新加入的词, 离开的词)；不涉及重码时返回 None
+    old_words, new_words = _present(old_words), _present(new_words)
+    kind = classify(len(old_words), len(new_words))
+    if kind is None:
+        return None
+    old_set = set(old_words)
+    new_set = set(new_words)
+    return (kind, len(old_words), len(new_words), tuple(word for word in new_words if word not in old_set),
+            tuple(word for word in old_words if word not in new_set))
+
+
+def word_record(old_codes, new_codes):
+    # 原来有编码、现在一个也没有的词，离开的值是它原来的编码
+    old_codes = _present(old_codes)
+    if old_codes and not _present(new_codes):
+        return 'lost', len(old_codes), 0, (), old_codes
+    return None
+
+
+def record_axis(item):
+    # 一条 (键, 记录) 来自哪个方向：只有词方向的记录是失去全部编码
+    return 'word' if item[1][0] == 'lost' else 'code'
+
+
+def rank_key(item):
+    kind, before, after, _, _ = item[1]
+    return _RANK[kind], -after, before - after
+
+
+class CollisionCounter:
+    # 逐条接收差异记录，记下 (键, 记录) 并按类别计数
+    def __init__(self):
+        self.items = []
+        self.counts = Counter()
+
+    def _add(self, key, record):
+        if record is not None:
+            self.items.append((key, record))
+            self.counts[record[0]] += 1
+
+    def add_code(self, code, old_words, new_words):
+        self._add(code, code_record(old_words, new_words))
+
+    def add_word(self, word, old_codes, new_codes):
+        self._add(word, word_record(old_codes, new_codes))
+
+    def add_diffs(self, code_diffs, word_diffs):
+        # 两个方向的 (新增, 删除, 修改) 字典，与 diff_digested 的返回值相同
+        added, removed, changed = code_diffs
+        for code, words in added.items():
+            self.add_code(code, (), words)
+        for code, words in removed.items():
+            self.add_code(code, words, ())
+        for code, (old_words, new_words) in changed.items():
+            self.add_code(code, old_words, new_words)
+        _, removed, changed = word_diffs
+        for word, codes in removed.items():
+            self.add_word(word, codes, ())
+        for word, (old_codes, new_codes) in changed.items():
+            self.add_word(word, old_codes, new_codes)
+
+    def ranked(self):
+        return sorted(self.items, key=rank_key)
+
+    def summary(self):
+        return {kind: self.counts[kind] for kind in KINDS}
+
+
+def collision_report(old_index, new_index):
+    # 库接口：对比两个双向索引，返回排好名的 [(键, 记录)] 和各类别的条数
+    counter = CollisionCounter()
+    if not old_index.same_as(new_index):
+        counter.add_diffs(
+            diff_digested(old_index.by_code, old_index.code_digest(), new_index.by_code, new_index.code_digest()),
+            diff_digested(old_index.by_word, old_index.word_digest(), new_index.by_word, new_index.word_digest()))
+    return counter.ranked(), counter.summary()
+
+
+def write_jsonl(items, out):
+    for key, (kind, before, after, joined, left) in items:
+        out.write(json.dumps({'key': key, 'kind': kind, 'before': before, 'after': after,
+                              'joined': list(joined), 'left': list(left)}, ensure_ascii=False))
+        out.write('\n')
+
+
+def write_tsv(items, out):
+    # 每条一行：键、类别、前候选数、后候选数、新加入的值、离开的值，多个值用空格分隔
+    for key, (kind, before, after, joined, left) in items:
+        out.write('\t'.join([key, kind, str(before), str(after), ' '.join(joined), ' '.join(left)]) + '\n')
+
+
+WRITERS = {'jsonl': write_jsonl, 'tsv': write_tsv}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='vocabdiff.collisions',
+                                     description="分析新旧词库之间新增的重码和失去全部编码的词")
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='tsv', help="输出格式")
+    parser.add_argument('--encoding', help="文件编码，默认自动检测")
+    args = parser.parse_args(argv)
+    try:
+        items, summary = collision_report(read_index(args.old, args.encoding), read_index(args.new, args.encoding))
+        WRITERS[args.format](items, sys.stdout)
+        sys.stdout.flush()
+        print(' '.join(f"{kind} {count}" for kind, count in summary.items()), file=sys.stderr)
+    except BrokenPipeError:
+        sys.stderr.close()
+    except (OSError, ValueError, UnicodeError) as e:
+        print(f"vocabdiff.collisions: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,348 @@
+import mmap
+import re
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_right
+from collections.abc import ItemsView, Mapping, Sequence
+from itertools import accumulate, chain, repeat
+
+# 文件头：魔数、版本、是否一词多码、词数、编码条目数、哈希表槽数、字符串区字节数
+MAGIC = b'VDC3'
+VERSION = 3
+HEADER = struct.Struct('<4sIIIIIQ')
+HEADER_SIZE = 32
+# 顺序遍历时每次整体解码的词条数
+DECODE_BLOCK = 1 << 16
+
+# 保存到文件的数组，顺序即文件中的顺序。字符串区的偏移用 64 位，超过 4 GiB 也不会溢出；
+# 第 i 个词的编码是 _code_start[_word_codes[i]:_word_codes[i + 1]] 这一段
+_OFFSETS = ('_word_start', '_word_len', '_word_codes', '_code_start', '_code_len')
+_ARRAYS = _OFFSETS + ('_table',)
+_TYPECODES = {'_word_start': 'Q', '_word_len': 'I', '_word_codes': 'I',
+              '_code_start': 'Q', '_code_len': 'I', '_table': 'i'}
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def _as_list(codes):
+    return [codes] if isinstance(codes, str) else codes
+
+
+def collect(table, word, code):
+    # 解析时先收集成 {词: 编码或编码列表}，解析完再用 CompactVocab.pack 一次性打包。
+    # 大多数词只有一个编码，不为它单独建列表；重复的编码打包时才去掉，短编码可能对应几百个词，每次追加都查重是平方级的
+    codes = table.get(word)
+    if codes is None:
+        table[word] = code
+    elif isinstance(codes, str):
+        table[word] = [codes, code]
+    else:
+        codes.append(code)
+
+
+def merge_collected(table, part):
+    # 按文件顺序把后一段的收集结果并入前一段：两边都有的词把新编码接在后面，词的顺序按第一次出现
+    for word in part.keys() & table.keys():
+        table[word] = _as_list(table[word]) + _as_list(part.pop(word))
+    table.update(part)
+
+
+def _encode(text, count):
+    # text 是 count 个字符串拼成的文本，词之间用换行符分隔，同一个词的几个编码之间用制表符分隔。
+    # 返回每个字符串的 UTF-8 字节长度和整段文本的字节，末尾补一个换行符，让每个字符串后面正好跟一个分隔符。
+    # 顺序遍历时整段解码再切开，不用逐个解码；全是 ASCII 时字节长度就是字符数
+    if not count:
+        return array('I'), b''
+    strings = text.replace('\n', '\t').split('\t')
+    if len(strings) != count:
+        raise ValueError("词和编码不能包含换行符或制表符")
+    lengths = array('I', map(len, strings if text.isascii() else map(str.encode, strings)))
+    return lengths, (text + '\n').encode('utf-8')
+
+
+def _starts(lengths, start):
+    return array('Q', accumulate((length + 1 for length in lengths), initial=start))
+
+
+class _CompactItems(ItemsView):
+    def __iter__(self):
+        return self._mapping.iter_items()
+
+
+class _CompactEntries(Sequence):
+    # 按插入顺序的 (词, 值) 序列，取到哪一行才解码哪一行
+    __slots__ = ('_vocab',)
+
+    def __init__(self, vocab):
+        self._vocab = vocab
+
+    def __len__(self):
+        return len(self._vocab)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self._vocab):
+            raise IndexError(index)
+        return self._vocab.entry(index)
+
+    def find(self, word):
+        # 词所在的行号，不存在时为 -1
+        return self._vocab._find(word.encode('utf-8'))
+
+
+class CompactVocab(Mapping):
+    # 紧凑词库：所有词、之后所有编码依次以分隔符隔开，按 UTF-8 存在同一个缓冲区里，只用偏移数组寻址；
+    # 每个词的编码连续存放，天然支持一词多码。multi=False 时后出现的编码覆盖先出现的，
+    # 取值返回字符串，可直接替代 {词: 编码} 字典；multi=True 时取值返回编码元组。
+    # 建立后只读，词的哈希表在第一次按词查找或保存时才建立
+    __slots__ = ('multi', '_blob', '_mmap') + _ARRAYS
+
+    def __init__(self, items=(), multi=False):
+        if isinstance(items, Mapping):
+            items = items.items()
+        table = {}
+        for word, value in items:
+            for code in ((value,) if isinstance(value, str) else value):
+                if multi:
+                    collect(table, word, code)
+                else:
+                    table[word] = code
+        self._build(table, multi)
+
+    @classmethod
+    def pack(cls, table, multi=False):
+        # 由收集好的字典一次性建立：multi=False 时是 {词: 编码}，multi=True 时是 collect 收集的 {词: 编码或编码列表}，
+        # 重复的编码只保留第一个
+        vocab = cls.__new__(cls)
+        vocab._build(table, multi)
+        return vocab
+
+    def _build(self, table, multi):
+        self.multi = multi
+        self._mmap = None
+        self._table = None
+        if multi:
+            groups = []
+            self._word_codes = array('I', [0])
+            total = 0
+            for values in table.values():
+                if isinstance(values, str):
+                    groups.append(values)
+                    total += 1
+                else:
+                    values = dict.fromkeys(values)
+                    groups.append('\t'.join(values))
+                    total += len(values)
+                self._word_codes.append(total)
+        else:
+            groups = table.values()
+            self._word_codes = array('I', range(len(table) + 1))
+        self._word_len, words = _encode('\n'.join(table), len(table))
+        self._code_len, codes = _encode('\n'.join(groups), self._word_codes[-1])
+        self._word_start = _starts(self._word_len, 0)
+        self._code_start = _starts(self._code_len, self._word_start.pop())
+        self._code_start.pop()
+        self._blob = words + codes
+
+    def __len__(self):
+        return len(self._word_start)
+
+    def __iter__(self):
+        return chain.from_iterable(map(self._words_from, range(0, len(self), DECODE_BLOCK)))
+
+    def __contains__(self, word):
+        return self._find(word.encode('utf-8')) >= 0
+
+    def __getitem__(self, word):
+        index = self._find(word.encode('utf-8'))
+        if index < 0:
+            raise KeyError(word)
+        if self.multi:
+            return self._codes(index)
+        return self._code(self._word_codes[index])
+
+    def codes(self, word):
+        index = self._find(word.encode('utf-8'))
+        return self._codes(index) if index >= 0 else ()
+
+    def items(self):
+        return _CompactItems(self)
+
+    def iter_items(self):
+        # 按块整体解码，比逐条取 entry 快得多，多占的内存只有一块
+        return chain.from_iterable(map(self._items_from, range(0, len(self), DECODE_BLOCK)))
+
+    def entries(self):
+        return _CompactEntries(self)
+
+    def entry(self, index):
+        # 按插入顺序取第 index 个词条
+        if self.multi:
+            return self._word(index), self._codes(index)
+        return self._word(index), self._code(self._word_codes[index])
+
+    def _words_from(self, start):
+        return self._split(self._word_start, self._word_len, start, min(start + DECODE_BLOCK, len(self)))
+
+    def _items_from(self, start):
+        # 从第 start 个词条起的一块 (词, 值)
+        end = min(start + DECODE_BLOCK, len(self))
+        words = self._split(self._word_start, self._word_len, start, end)
+        lo, hi = self._word_codes[start], self._word_codes[end]
+        groups = self._split(self._code_start, self._code_len, lo, hi)
+        if not self.multi:
+            return zip(words, groups)
+        if hi - lo == end - start:
+            # 这一块的词都只有一个编码
+            return zip(words, zip(groups))
+        return zip(words, map(tuple, map(str.split, groups, repeat('\t'))))
+
+    def _split(self, starts, lengths, lo, hi):
+        # 第 lo 到 hi 个字符串连续存放，整段解码后按换行符切开；编码区按词的边界切开，得到每个词以制表符连接的编码
+        if lo == hi:
+            return []
+        return str(self._blob[starts[lo]:starts[hi - 1] + lengths[hi - 1]], 'utf-8').split('\n')
+
+    def _word(self, index):
+        start = self._word_start[index]
+        return str(self._blob[start:start + self._word_len[index]], 'utf-8')
+
+    def _code(self, code_index):
+        start = self._code_start[code_index]
+        return str(self._blob[start:start + self._code_len[code_index]], 'utf-8')
+
+    def _codes(self, index):
+        return tuple(self._code(code_index)
+                     for code_index in range(self._word_codes[index], self._word_codes[index + 1]))
+
+    def _index(self):
+        # 开放寻址的哈希表，装载率不超过 2/3；并发时重复建立也只是多算一遍
+        table = self._table
+        if table is None:
+            size = 8
+            while 3 * len(self) > 2 * size:
+                size *= 2
+            table = array('i', [-1]) * size
+            mask = size - 1
+            blob = memoryview(self._blob)
+            for index, (start, length) in enumerate(zip(self._word_start, self._word_len)):
+                slot = zlib.crc32(blob[start:start + length]) & mask
+                while table[slot] >= 0:
+                    slot = (slot + 1) & mask
+                table[slot] = index
+            self._table = table
+        return table
+
+    def _find(self, key):
+        # 线性探测，返回词序号，找不到时返回 -1
+        blob, starts, lengths, table = self._blob, self._word_start, self._word_len, self._index()
+        mask = len(table) - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            index = table[slot]
+            if index < 0:
+                return -1
+            start = starts[index]
+            if lengths[index] == len(key) and blob[start:start + len(key)] == key:
+                return index
+            slot = (slot + 1) & mask
+
+    def search(self, term):
+        # 直接在缓冲区里查找子串，返回词或任一编码包含 term 的行号（升序）；
+        # 命中位置用偏移数组二分映射回所在的字符串，跨越两个字符串的命中丢弃，同一行只记一次
+        key = term.encode('utf-8')
+        pattern = re.compile(re.escape(key))
+        blob = self._blob
+        words_end = self._code_start[0] if len(self._code_start) else len(blob)
+
+        rows = []
+        starts, lengths = self._word_start, self._word_len
+        found = pattern.search(blob, 0, words_end)
+        while found is not None:
+            row = bisect_right(starts, found.start()) - 1
+            end = starts[row] + lengths[row]
+            if found.end() <= end:
+                rows.append(row)
+                pos = end
+            else:
+                pos = found.start() + 1
+            found = pattern.search(blob, pos, words_end)
+
+        code_rows = []
+        starts, lengths, first = self._code_start, self._code_len, self._word_codes
+        found = pattern.search(blob, words_end)
+        while found is not None:
+            code = bisect_right(starts, found.start()) - 1
+            if found.end() <= starts[code] + lengths[code]:
+                row = bisect_right(first, code) - 1
+                code_rows.append(row)
+                # 这一行的其他编码不用再看，跳到下一行的第一个编码
+                code = first[row + 1]
+                pos = starts[code] if code < len(starts) else len(blob)
+            else:
+                pos = found.start() + 1
+            found = pattern.search(blob, pos)
+        return sorted(set(rows).union(code_rows))
+
+    def value_texts(self):
+        # 每个词的全部编码以制表符连接成的字符串，按存放顺序；相同即编码序列相同，对比时先比这个，不同才解码
+        return self._split(self._code_start, self._code_len, 0, len(self._code_start))
+
+    def buffers(self):
+        # 字符串区和各偏移数组，供向量化引擎零拷贝读取
+        return self._blob, {name: getattr(self, name) for name in _OFFSETS}
+
+    def nbytes(self):
+        arrays = [getattr(self, name) for name in _ARRAYS if getattr(self, name) is not None]
+        return len(self._blob) + sum(len(data) * data.itemsize for data in arrays)
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            self.write_to(file)
+
+    def write_to(self, file):
+        # 写出的镜像长度按 8 字节对齐，多个镜像可以首尾相接存进同一个文件
+        self._index()
+        arrays = [getattr(self, name) for name in _ARRAYS]
+        if sys.byteorder != 'little':
+            arrays = [array(data.typecode, data) for data in arrays]
+            for data in arrays:
+                data.byteswap()
+        file.write(HEADER.pack(MAGIC, VERSION, int(self.multi), len(self._word_start),
+                               len(self._code_start), len(self._table), len(self._blob)).ljust(HEADER_SIZE, b'\0'))
+        for data in arrays:
+            raw = memoryview(data).cast('B')
+            file.write(raw)
+            file.write(b'\0' * (_align(len(raw)) - len(raw)))
+        file.write(self._blob)
+        file.write(b'\0' * (_align(len(self._blob)) - len(self._blob)))
+
+    @classmethod
+    def load(cls, path):
+        # 以只读方式内存映射保存的词库，打开时不解码任何字符串
+        with open(path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_buffer(data, memoryview(data))[0]
+
+    @classmethod
+    def from_buffer(cls, data, view):
+        # 从 write_to 写出的镜像构造只读词库，返回 (词库, 镜像长度)
+        magic, version, multi, words, codes, table_size, blob_size = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION or sys.byteorder != 'little':
+            raise ValueError("不支持的词库文件")
+
+        vocab = cls.__new__(cls)
+        vocab.multi = bool(multi)
+        vocab._mmap = data
+        lengths = {'_word_start': words, '_word_len': words, '_word_codes': words + 1,
+                   '_code_start': codes, '_code_len': codes, '_table': table_size}
+        pos = HEADER_SIZE
+        for name in _ARRAYS:
+            size = lengths[name] * array(_TYPECODES[name]).itemsize
+            setattr(vocab, name, view[pos:pos + size].cast(_TYPECODES[name]))
+            pos += _align(size)
+        vocab._blob = view[pos:pos + blob_size]
+        return vocab, pos + _align(blob_size)
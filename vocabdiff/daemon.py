@@ -0,0 +1,523 @@
+import argparse
+import asyncio
+import errno
+import hmac
+import json
+import os
+import secrets
+import socket
+import stat
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from .bidi import BiIndex, diff_digested
+from .cache import VocabCache
+from .cli import read_index
+from .lookup import DiffLookup, KeyIndex
+from .search import CompactIndex
+
+# 本机守护进程：常驻内存的已解析词库按最近使用淘汰，通过 Unix 套接字或本机 TCP 提供查询。
+# 协议是每行一个 JSON 请求、每行一个 JSON 回复；同一端口也接受 HTTP 的 GET/POST，
+# 例如 GET /lookup?file=a.txt&file=b.txt&key=你好。解析、对比和建索引放到线程池，事件循环只做查表。
+# 请求可以读取用户能读的任何文件：Unix 套接字只有本用户能连接；TCP 上任何本机进程都能连接，
+# 每个请求都要带上令牌，令牌只写在本用户可读的文件里。HTTP 请求的 Host 必须是本机，挡住 DNS 重绑定的网页
+DEFAULT_CAPACITY = 8
+DIFF_CAPACITY = 16
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 100
+# 客户端按页取行，本地缓存的页数
+PAGE_SIZE = 256
+PAGE_CACHE = 64
+AXES = ('word', 'code')
+# TCP 模式的令牌：环境变量优先，否则守护进程启动时生成并写入令牌文件，客户端从同一个文件读取
+TOKEN_ENV = 'VOCABDIFF_DAEMON_TOKEN'
+TOKEN_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'vocabdiff', 'daemon-token')
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+
+def default_address():
+    # 环境变量 VOCABDIFF_DAEMON 优先；支持 Unix 套接字的平台默认用临时目录下的套接字，否则用本机端口
+    address = os.environ.get('VOCABDIFF_DAEMON')
+    if address:
+        return parse_address(address)
+    if hasattr(socket, 'AF_UNIX') and sys.platform != 'win32':
+        return os.path.join(tempfile.gettempdir(), f'vocabdiff-{os.getuid()}.sock')
+    return ('127.0.0.1', DEFAULT_PORT)
+
+
+def parse_address(text):
+    # “主机:端口” 是 TCP 地址，其余当作 Unix 套接字路径
+    host, _, port = text.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return text
+
+
+def write_token(path=TOKEN_PATH):
+    # 生成新令牌，写入只有本用户可读写的文件
+    token = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.chmod(temp_path, 0o600)
+    with os.fdopen(fd, 'w', encoding='ascii') as file:
+        file.write(token)
+    os.replace(temp_path, path)
+    return token
+
+
+def read_token(path=TOKEN_PATH):
+    token = os.environ.get(TOKEN_ENV)
+    if token:
+        return token
+    with open(path, encoding='ascii') as file:
+        return file.read().strip()
+
+
+def _local_host(host):
+    # Host 头去掉端口后必须是本机名或回环地址
+    host = host.strip().lower()
+    if host.startswith('['):
+        host = host[1:host.find(']')]
+    elif host.count(':') == 1:
+        host = host.partition(':')[0]
+    return host in LOCAL_HOSTS
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _axis_map(index, axis):
+    if axis not in AXES:
+        raise ValueError(f"未知的方向: {axis}")
+    return index.by_code if axis == 'code' else index.by_word
+
+
+def _diff_records(old_index, new_index, axis):
+    # 在线程池里运行；结果按 新增、删除、修改 排列，值统一成列表便于直接序列化
+    if old_index.same_as(new_index):
+        return []
+    if axis == 'code':
+        added, removed, changed = diff_digested(old_index.by_code, old_index.code_digest(),
+                                                new_index.by_code, new_index.code_digest())
+    else:
+        added, removed, changed = diff_digested(old_index.by_word, old_index.word_digest(),
+                                                new_index.by_word, new_index.word_digest())
+    records = [('added', key, [], list(values)) for key, values in added.items()]
+    records += [('removed', key, list(values), []) for key, values in removed.items()]
+    records += [('changed', key, list(old), list(new)) for key, (old, new) in changed.items()]
+    return records
+
+
+class Resident:
+    # 一个常驻的词库；前缀索引在第一次用到时才建立。以它为新版本的键查询也挂在这里，
+    # 键是 (旧文件, 旧文件状态, 方向)，随它一起被移出
+    __slots__ = ('index', 'stamp', 'key_indexes', 'lookups')
+
+    def __init__(self, index, stamp):
+        self.index = index
+        self.stamp = stamp
+        self.key_indexes = {}
+        self.lookups = {}
+
+
+class VocabServer:
+    # token 不为 None 时每个请求都必须带上相同的令牌
+    def __init__(self, capacity=DEFAULT_CAPACITY, cache=None, token=None):
+        self.capacity = capacity
+        self.cache = cache
+        self.token = token
+        self.resident = OrderedDict()
+        self.diffs = OrderedDict()
+        self.loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.ops = {
+            'load': self.load, 'lookup': self.lookup, 'prefix': self.prefix, 'diff': self.diff,
+            'items': self.items, 'search': self.search, 'match': self.match, 'stats': self.stats,
+        }
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def get(self, file_path):
+        # 文件大小或修改时间变了就重新加载；同一个文件同时被多个请求用到时只加载一次
+        path = os.path.realpath(file_path)
+        stamp = _stamp(path)
+        entry = self.resident.get(path)
+        if entry is not None and entry.stamp == stamp:
+            self.resident.move_to_end(path)
+            self.hits += 1
+            return entry
+        key = (path, stamp)
+        task = self.loading.get(key)
+        if task is None:
+            self.misses += 1
+            task = self.loading[key] = asyncio.ensure_future(self._load(path, stamp))
+            task.add_done_callback(lambda _: self.loading.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, path, stamp):
+        index = await self._run(read_index, path, None, self.cache)
+        entry = Resident(index, stamp)
+        self._forget(path)
+        self.resident[path] = entry
+        self.resident.move_to_end(path)
+        while len(self.resident) > self.capacity:
+            self._forget(self.resident.popitem(last=False)[0])
+        return entry
+
+    def _forget(self, path):
+        # 词库被替换或移出时，别的词库上以它为旧版本的键查询也一起丢掉，不再引用它
+        for entry in self.resident.values():
+            for key in [key for key in entry.lookups if key[0] == path]:
+                del entry.lookups[key]
+
+    async def load(self, request):
+        entry = await self.get(request['file'])
+        return {'words': len(entry.index.by_word), 'codes': len(entry.index.by_code),
+                'code_first': entry.index.code_first}
+
+    async def lookup(self, request):
+        # file 可以是一个文件，也可以是多个版本（files），回复每个版本里这个键的值
+        paths = request.get('files') or [request['file']]
+        axis = request.get('axis', 'word')
+        results = {}
+        for path in paths:
+            entry = await self.get(path)
+            results[path] = list(_axis_map(entry.index, axis).codes(request['key']))
+        return {'results': results}
+
+    async def prefix(self, request):
+        entry = await self.get(request['file'])
+        axis = request.get('axis', 'word')
+        vocab = _axis_map(entry.index, axis)
+        index = entry.key_indexes.get(axis)
+        if index is None:
+            index = entry.key_indexes[axis] = await self._run(KeyIndex, vocab)
+        keys = index.prefix(request['prefix'], request.get('limit', DEFAULT_LIMIT))
+        return {'matches': [[key, list(vocab.codes(key))] for key in keys]}
+
+    async def diff(self, request):
+        # 对比结果按 (两个文件及其状态, 方向) 缓存，翻页时不再重新对比
+        axis = request.get('axis', 'word')
+        if axis not in AXES:
+            raise ValueError(f"未知的方向: {axis}")
+        old = await self.get(request['old'])
+        new = await self.get(request['new'])
+        key = (os.path.realpath(request['old']), old.stamp, os.path.realpath(request['new']), new.stamp, axis)
+        records = self.diffs.get(key)
+        if records is None:
+            records = await self._run(_diff_records, old.index, new.index, axis)
+            self.diffs[key] = records
+            while len(self.diffs) > DIFF_CAPACITY:
+                self.diffs.popitem(last=False)
+        self.diffs.move_to_end(key)
+        offset = request.get('offset', 0)
+        limit = request.get('limit')
+        end = len(records) if limit is None else offset + limit
+        return {'identical': old.index.same_as(new.index), 'total': len(records), 'records': records[offset:end]}
+
+    async def match(self, request):
+        # 在新旧两个词库里按前缀（mode 为 prefix）或编辑距离（fuzzy）查找键，命中标上状态
+        axis = request.get('axis', 'word')
+        old = await self.get(request['old'])
+        new = await self.get(request['new'])
+        key = (os.path.realpath(request['old']), old.stamp, axis)
+        lookup = new.lookups.get(key)
+        if lookup is None:
+            lookup = DiffLookup(_axis_map(old.index, axis), _axis_map(new.index, axis))
+            await self._run(lookup.index)
+            new.lookups[key] = lookup
+        limit = request.get('limit')
+        if request.get('mode', 'prefix') == 'fuzzy':
+            hits = await self._run(lookup.fuzzy, request['term'], request.get('distance', 1), limit)
+        else:
+            hits = lookup.prefix(request['term'], limit)
+        return {'hits': hits}
+
+    async def items(self, request):
+        # 按文件中的顺序分页取词条
+        entry = await self.get(request['file'])
+        vocab = _axis_map(entry.index, request.get('axis', 'word'))
+        offset = request.get('offset', 0)
+        end = min(len(vocab), offset + request.get('limit', DEFAULT_LIMIT))
+        items = [[key, list(values)] for key, values in map(vocab.entry, range(offset, end))]
+        return {'total': len(vocab), 'items': items}
+
+    async def search(self, request):
+        # 子串查找，返回命中的行号，与 items 的顺序一致；直接在紧凑词库的缓冲区里查找
+        entry = await self.get(request['file'])
+        index = CompactIndex(_axis_map(entry.index, request.get('axis', 'word')))
+        return {'rows': await self._run(index.search, request['term'])}
+
+    async def stats(self, request):
+        return {'resident': list(self.resident), 'capacity': self.capacity, 'hits': self.hits,
+                'misses': self.misses}
+
+    def authorized(self, token):
+        if self.token is None:
+            return True
+        return isinstance(token, str) and hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    async def respond(self, request):
+        try:
+            handler = self.ops.get(request.get('op'))
+            if handler is None:
+                raise ValueError(f"未知的请求: {request.get('op')}")
+            reply = await handler(request)
+            reply['ok'] = True
+        except KeyError as e:
+            reply = {'ok': False, 'error': f"缺少参数: {e.args[0]}"}
+        except (OSError, ValueError, TypeError, UnicodeError) as e:
+            reply = {'ok': False, 'error': str(e)}
+        except Exception as e:
+            # 处理请求时的其他错误也回复给客户端，不让连接直接断开
+            reply = {'ok': False, 'error': f"内部错误: {e!r}"}
+        return reply
+
+    async def serve_client(self, reader, writer):
+        try:
+            line = await reader.readline()
+            if line.startswith((b'GET ', b'POST ')):
+                await self._serve_http(line, reader, writer)
+                return
+            while line:
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        reply = {'ok': False, 'error': "请求必须是 JSON 对象"}
+                    elif not self.authorized(request.pop('token', None)):
+                        reply = {'ok': False, 'error': "令牌无效"}
+                    else:
+                        reply = await self.respond(request)
+                except ValueError as e:
+                    reply = {'ok': False, 'error': f"无效的 JSON: {e}"}
+                writer.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+                line = await reader.readline()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_http(self, request_line, reader, writer):
+        # 最简单的 HTTP/1.1：路径是请求名，GET 的参数在查询串里（file 可以重复），POST 的请求体是 JSON；
+        # 令牌放在 Authorization: Bearer 头里
+        method, target = request_line.decode('latin-1').split()[:2]
+        headers = {}
+        while True:
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = header.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if not _local_host(headers.get('host', '')):
+            await self._reply_http(writer, '403 Forbidden', {'ok': False, 'error': "只接受发往本机的请求"})
+            return
+        if not self.authorized(token if scheme.lower() == 'bearer' else None):
+            await self._reply_http(writer, '403 Forbidden', {'ok': False, 'error': "令牌无效"})
+            return
+        try:
+            length = int(headers.get('content-length', '0'))
+            if length < 0:
+                raise ValueError(f"无效的 Content-Length: {length}")
+            if method == 'POST':
+                request = json.loads(await reader.readexactly(length)) if length else {}
+            else:
+                request = {}
+                for name, values in parse_qs(url.query).items():
+                    if name in ('limit', 'offset', 'distance'):
+                        request[name] = int(values[0])
+                    elif name == 'file' and len(values) > 1:
+                        request['files'] = values
+                    else:
+                        request[name] = values[0]
+            request.setdefault('op', url.path.strip('/'))
+            reply = await self.respond(request)
+        except ValueError as e:
+            reply = {'ok': False, 'error': str(e)}
+        await self._reply_http(writer, '200 OK' if reply['ok'] else '400 Bad Request', reply)
+
+    async def _reply_http(self, writer, status, reply):
+        body = json.dumps(reply, ensure_ascii=False).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+
+
+def _remove_stale_socket(path):
+    # 只删除上次没有清理掉、已经没有进程在监听的套接字文件；别的文件或还在使用的套接字都报错
+    if not stat.S_ISSOCK(os.lstat(path).st_mode):
+        raise FileExistsError(errno.EEXIST, "已存在且不是套接字", path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.remove(path)
+            return
+    raise OSError(errno.EADDRINUSE, "已有守护进程在监听", path)
+
+
+async def serve(address, capacity=DEFAULT_CAPACITY, preload=(), cache=None, token=None):
+    # Unix 套接字只允许本用户连接，不需要令牌；TCP 没有给出令牌时生成一个写入令牌文件
+    if isinstance(address, str):
+        server = VocabServer(capacity, cache)
+        if os.path.lexists(address):
+            _remove_stale_socket(address)
+        listener = await asyncio.start_unix_server(server.serve_client, address)
+        os.chmod(address, 0o600)
+    else:
+        server = VocabServer(capacity, cache, token or os.environ.get(TOKEN_ENV) or write_token())
+        listener = await asyncio.start_server(server.serve_client, *address)
+    for path in preload:
+        await server.get(path)
+    async with listener:
+        await listener.serve_forever()
+
+
+class DaemonClient:
+    # 同步客户端：一个连接上依次发送请求，可在多个线程里共用；连接断开后下次请求自动重连。
+    # 连接 TCP 地址时没有给出 token 就从环境变量或令牌文件读取
+    def __init__(self, address=None, timeout=None, token=None):
+        self.address = address or default_address()
+        self.timeout = timeout
+        self.token = token
+        self._lock = threading.Lock()
+        self._socket = None
+        self._file = None
+
+    def _connect(self):
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+        else:
+            if self.token is None:
+                self.token = read_token()
+            sock = socket.create_connection(self.address, self.timeout)
+        self._socket = sock
+        self._file = sock.makefile('rwb')
+
+    def request(self, request):
+        # 服务端报告的错误以 ValueError 抛出，连接问题以 OSError 抛出
+        with self._lock:
+            if self._file is None:
+                self._connect()
+            if self.token is not None:
+                request = dict(request, token=self.token)
+            try:
+                self._file.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+                self._file.flush()
+                line = self._file.readline()
+            except OSError:
+                self.close()
+                raise
+            if not line:
+                self.close()
+                raise ConnectionError("守护进程已断开连接")
+        reply = json.loads(line)
+        if not reply.pop('ok', False):
+            raise ValueError(reply.get('error', "守护进程返回了错误"))
+        return reply
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = self._file = None
+
+
+class RemoteItems:
+    # 守护进程里某个词库的 (键, 值) 序列，按页取回并缓存最近用到的页，可直接交给 FormattedRows
+    def __init__(self, client, file_path, axis='word'):
+        self.client = client
+        self.file_path = file_path
+        self.axis = axis
+        self.pages = OrderedDict()
+        reply = client.request({'op': 'items', 'file': file_path, 'axis': axis, 'limit': 0})
+        self.total = reply['total']
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        page, offset = divmod(index, PAGE_SIZE)
+        items = self.pages.get(page)
+        if items is None:
+            reply = self.client.request({'op': 'items', 'file': self.file_path, 'axis': self.axis,
+                                         'offset': page * PAGE_SIZE, 'limit': PAGE_SIZE})
+            items = self.pages[page] = [(key, tuple(values)) for key, values in reply['items']]
+            while len(self.pages) > PAGE_CACHE:
+                self.pages.popitem(last=False)
+        self.pages.move_to_end(page)
+        return items[offset]
+
+
+class RemoteIndex:
+    # 与 SearchIndex 相同的查找接口，查找在守护进程里完成
+    def __init__(self, client, file_path, axis='word'):
+        self.client = client
+        self.file_path = file_path
+        self.axis = axis
+
+    def search(self, term, within=None):
+        if not term or '\n' in term:
+            return []
+        return self.client.request({'op': 'search', 'file': self.file_path, 'axis': self.axis,
+                                    'term': term})['rows']
+
+
+class RemoteLookup:
+    # 与 DiffLookup 相同的前缀、模糊查询接口，查询在守护进程里完成
+    def __init__(self, client, old_path, new_path, axis='word'):
+        self.client = client
+        self.request = {'op': 'match', 'old': old_path, 'new': new_path, 'axis': axis}
+
+    def _match(self, **request):
+        hits = self.client.request(dict(self.request, **request))['hits']
+        return [(key, status, tuple(old), tuple(new), distance) for key, status, old, new, distance in hits]
+
+    def prefix(self, prefix, limit=None):
+        return self._match(mode='prefix', term=prefix, limit=limit)
+
+    def fuzzy(self, term, distance=1, limit=None):
+        return self._match(mode='fuzzy', term=term, distance=distance, limit=limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='vocabdiff.daemon', description="常驻内存的词库查询守护进程")
+    parser.add_argument('--socket', help="Unix 套接字路径")
+    parser.add_argument('--port', type=int,
+                        help=f"改为监听本机 TCP 端口（例如 {DEFAULT_PORT}），请求需带上令牌文件 {TOKEN_PATH} 里的令牌")
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help="最多常驻的词库数")
+    parser.add_argument('--cache', action='store_true', help="加载时使用已解析词库的磁盘缓存")
+    parser.add_argument('preload', nargs='*', help="启动时预先加载的词库")
+    args = parser.parse_args(argv)
+    if args.port is not None:
+        address = ('127.0.0.1', args.port)
+    else:
+        address = args.socket or default_address()
+    cache = VocabCache(namespace='bidi-v2', kind=BiIndex) if args.cache else None
+    print(f"vocabdiff.daemon: 监听 {address}", file=sys.stderr)
+    if not isinstance(address, str) and not os.environ.get(TOKEN_ENV):
+        print(f"vocabdiff.daemon: 令牌写入 {TOKEN_PATH}", file=sys.stderr)
+    try:
+        asyncio.run(serve(address, args.capacity, args.preload, cache))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"vocabdiff.daemon: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
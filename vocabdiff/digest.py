@@ -0,0 +1,148 @@
+import hashlib
+import struct
+import sys
+from array import array
+
+from . import vectorized
+
+# 文件头：魔数、散列方式、桶位数、词条数、Merkle 根（16 字节）
+MAGIC = b'VDD1'
+HEADER = struct.Struct('<4sIIQ16s')
+HEADER_SIZE = 40
+# 平均每个桶的词条数，桶数取 2 的幂且不少于 MIN_BUCKET_BITS 位
+BUCKET_SIZE = 16
+MIN_BUCKET_BITS = 8
+# 不同的桶超过这个比例时直接整体对比更快
+DESCEND_LIMIT = 0.25
+
+# 词条哈希的两种算法，结果不能互相比较
+KIND_BLAKE2 = 0
+KIND_VECTOR = 1
+
+_MASK64 = (1 << 64) - 1
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _entry_hashes(vocab):
+    # 没有 numpy 时逐条计算；多值按编码哈希之和，与顺序无关
+    keys = []
+    entries = []
+    for word, values in vocab.items():
+        key = _hash64(word.encode('utf-8'))
+        if isinstance(values, str):
+            value = _hash64(values.encode('utf-8'))
+        else:
+            value = sum(_hash64(code.encode('utf-8')) for code in values) & _MASK64
+        keys.append(key)
+        entries.append(_hash64(key.to_bytes(8, 'little') + value.to_bytes(8, 'little')))
+    return keys, entries
+
+
+class BucketDigest:
+    # 按词的哈希把词条分到 2^bits 个桶，每个桶的摘要是桶内词条哈希之和（与顺序无关，也可以直接合并成更粗的桶），
+    # 所有桶摘要再汇总成 Merkle 根。order 按桶存放词条序号，offsets[b]:offsets[b + 1] 是第 b 个桶的范围
+    __slots__ = ('kind', 'bits', 'count', 'root', 'leaves', 'offsets', 'order', '_mmap')
+
+    @classmethod
+    def build(cls, vocab):
+        digest = cls.__new__(cls)
+        digest._mmap = None
+        digest.count = len(vocab)
+        bits = MIN_BUCKET_BITS
+        while (BUCKET_SIZE << bits) < digest.count:
+            bits += 1
+        digest.bits = bits
+        mask = (1 << bits) - 1
+        if vectorized.available():
+            np = vectorized.np
+            digest.kind = KIND_VECTOR
+            keys, entries = vectorized.entry_hashes(vocab)
+            buckets = (keys & np.uint64(mask)).astype(np.int64)
+            leaves = np.zeros(mask + 1, dtype=np.uint64)
+            np.add.at(leaves, buckets, entries)
+            digest.leaves = array('Q', leaves.tobytes())
+            digest.order = array('I', np.argsort(buckets, kind='stable').astype(np.uint32).tobytes())
+            counts = np.bincount(buckets, minlength=mask + 1)
+            digest.offsets = array('I', np.concatenate(([0], np.cumsum(counts))).astype(np.uint32).tobytes())
+        else:
+            digest.kind = KIND_BLAKE2
+            keys, entries = _entry_hashes(vocab)
+            leaves = [0] * (mask + 1)
+            members = [[] for _ in range(mask + 1)]
+            for index, (key, entry) in enumerate(zip(keys, entries)):
+                leaves[key & mask] = (leaves[key & mask] + entry) & _MASK64
+                members[key & mask].append(index)
+            digest.leaves = array('Q', leaves)
+            digest.order = array('I')
+            digest.offsets = array('I', [0])
+            for bucket in members:
+                digest.order.extend(bucket)
+                digest.offsets.append(len(digest.order))
+        digest.root = digest._root()
+        return digest
+
+    def _root(self):
+        digest = hashlib.blake2b(struct.pack('<IIQ', self.kind, self.bits, self.count), digest_size=16)
+        digest.update(memoryview(self.leaves).cast('B'))
+        return digest.digest()
+
+    def same_as(self, other):
+        return self.kind == other.kind and self.root == other.root
+
+    def folded(self, bits):
+        # 合并成 2^bits 个桶：编号低位相同的细桶属于同一个粗桶
+        width = 1 << bits
+        leaves = [0] * width
+        for bucket, value in enumerate(self.leaves):
+            leaves[bucket & (width - 1)] = (leaves[bucket & (width - 1)] + value) & _MASK64
+        return leaves
+
+    def members(self, bucket, bits):
+        # 粗桶 bucket 内的全部词条序号
+        step = 1 << bits
+        for fine in range(bucket, len(self.leaves), step):
+            yield from self.order[self.offsets[fine]:self.offsets[fine + 1]]
+
+    def differing(self, other):
+        # 摘要不同的桶（按两边较粗的分桶），散列方式不同时无法比较，返回 None
+        if self.kind != other.kind:
+            return None, None
+        bits = min(self.bits, other.bits)
+        ours, theirs = self.folded(bits), other.folded(bits)
+        return [bucket for bucket in range(1 << bits) if ours[bucket] != theirs[bucket]], bits
+
+    def write_to(self, file):
+        arrays = [self.leaves, self.offsets, self.order]
+        if sys.byteorder != 'little':
+            arrays = [array(data.typecode, data) for data in arrays]
+            for data in arrays:
+                data.byteswap()
+        file.write(HEADER.pack(MAGIC, self.kind, self.bits, self.count, self.root).ljust(HEADER_SIZE, b'\0'))
+        for data in arrays:
+            raw = memoryview(data).cast('B')
+            file.write(raw)
+            file.write(b'\0' * (_align(len(raw)) - len(raw)))
+
+    @classmethod
+    def from_buffer(cls, data, view):
+        magic, kind, bits, count, root = HEADER.unpack_from(view)
+        if magic != MAGIC or sys.byteorder != 'little':
+            raise ValueError("不支持的摘要格式")
+        digest = cls.__new__(cls)
+        digest._mmap = data
+        digest.kind, digest.bits, digest.count, digest.root = kind, bits, count, root
+        pos = HEADER_SIZE
+        for name, typecode, length in (('leaves', 'Q', 1 << bits), ('offsets', 'I', (1 << bits) + 1),
+                                       ('order', 'I', count)):
+            size = length * array(typecode).itemsize
+            setattr(digest, name, view[pos:pos + size].cast(typecode))
+            pos += _align(size)
+        return digest, pos
+
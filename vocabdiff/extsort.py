@@ -0,0 +1,125 @@
+import heapq
+import os
+import tempfile
+from contextlib import ExitStack
+from itertools import chain, groupby, islice
+
+from .bidi import ORDER_SAMPLE, _differs, detect_code_first
+from .formats import iter_records
+
+# 默认内存上限，排序时每个有序段不超过这么大
+MEMORY_LIMIT = 256 << 20
+# 估算内存时每条记录的固定开销（字典槽位和两个字符串对象）
+ENTRY_OVERHEAD = 200
+# 一次最多同时归并的有序段数，超过时先分批归并
+MAX_FAN_IN = 64
+
+
+def _write_lines(lines, directory):
+    # lines 必须已经有序
+    fd, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with open(fd, 'w', encoding='utf-8', newline='\n') as file:
+        for line in lines:
+            file.write(line + '\n')
+    return path
+
+
+def merge_lines(runs):
+    # 归并多个有序的行文件，相同的行只产出一次
+    with ExitStack() as stack:
+        streams = [(line[:-1] for line in stack.enter_context(open(path, encoding='utf-8', newline='\n')))
+                   for path in runs]
+        for line, _ in groupby(heapq.merge(*streams)):
+            yield line
+
+
+def sort_lines(lines, directory, memory_limit=MEMORY_LIMIT):
+    # 以有限内存把任意多行排序去重，返回不超过 MAX_FAN_IN 个有序段
+    runs = []
+    buffer = set()
+    used = 0
+    for line in lines:
+        if line not in buffer:
+            buffer.add(line)
+            used += ENTRY_OVERHEAD + 2 * len(line)
+            if used >= memory_limit:
+                runs.append(_write_lines(sorted(buffer), directory))
+                buffer.clear()
+                used = 0
+    if buffer or not runs:
+        runs.append(_write_lines(sorted(buffer), directory))
+    while len(runs) > MAX_FAN_IN:
+        merged = []
+        for start in range(0, len(runs), MAX_FAN_IN):
+            batch = runs[start:start + MAX_FAN_IN]
+            merged.append(_write_lines(merge_lines(batch), directory))
+            for run in batch:
+                os.remove(run)
+        runs = merged
+    return runs
+
+
+def _keyed_lines(file_path, encoding=None, axis='word', progress=None):
+    # 列顺序按开头的样本判断，与默认流程相同；每行是 “键\t序号\t值”，序号让同一个键的值保持文件中的顺序。
+    # 按编码对比时跳过没有编码的行
+    records = iter_records(file_path, encoding, progress)
+    sample = list(islice(records, ORDER_SAMPLE))
+    code_first = detect_code_first(sample)
+    for number, (first, second, _) in enumerate(chain(sample, records)):
+        if code_first and second:
+            first, second = second, first
+        if axis == 'code':
+            if not second:
+                continue
+            first, second = second, first
+        yield f"{first}\t{number:012d}\t{second}"
+
+
+def sort_entries(file_path, directory, memory_limit=MEMORY_LIMIT, encoding=None, axis='word', progress=None):
+    # 以有限内存把整个词库排成不超过 MAX_FAN_IN 个有序段
+    return sort_lines(_keyed_lines(file_path, encoding, axis, progress), directory, memory_limit)
+
+
+def iter_sorted_entries(runs):
+    # 有序行按键分组，产出 (排序键, 值元组)；排序键是 “键\t”，与行的顺序一致，重复的值只保留第一次出现
+    for key, group in groupby(merge_lines(runs), key=lambda line: line[:line.index('\t') + 1]):
+        yield key, tuple(dict.fromkeys(line[line.index('\t', len(key)) + 1:] for line in group))
+
+
+def diff_sorted(old_entries, new_entries):
+    # 两个按键排序的 (键, 值) 流做归并连接，产出 (状态, 键, 旧值, 新值)；值按集合比较，与顺序无关
+    missing = object()
+    old_iter = iter(old_entries)
+    new_iter = iter(new_entries)
+    old = next(old_iter, missing)
+    new = next(new_iter, missing)
+    while old is not missing and new is not missing:
+        if old[0] < new[0]:
+            yield 'removed', old[0], old[1], None
+            old = next(old_iter, missing)
+        elif old[0] > new[0]:
+            yield 'added', new[0], None, new[1]
+            new = next(new_iter, missing)
+        else:
+            if _differs(old[1], new[1]):
+                yield 'changed', old[0], old[1], new[1]
+            old = next(old_iter, missing)
+            new = next(new_iter, missing)
+    while old is not missing:
+        yield 'removed', old[0], old[1], None
+        old = next(old_iter, missing)
+    while new is not missing:
+        yield 'added', new[0], None, new[1]
+        new = next(new_iter, missing)
+
+
+def external_diff(old_path, new_path, memory_limit=MEMORY_LIMIT, temp_dir=None, encoding=None, axis='word'):
+    # 超出内存的词库对比：先分别外部排序，再流式产出与 iter_diff 相同的记录，只是按键排序；
+    # 临时文件在迭代结束后删除
+    with tempfile.TemporaryDirectory(prefix='vocabdiff-', dir=temp_dir) as directory:
+        old_runs = sort_entries(old_path, directory, memory_limit, encoding, axis)
+        new_runs = sort_entries(new_path, directory, memory_limit, encoding, axis)
+        for status, key, old_values, new_values in diff_sorted(iter_sorted_entries(old_runs),
+                                                               iter_sorted_entries(new_runs)):
+            # 去掉排序键末尾的制表符
+            yield status, key[:-1], old_values, new_values
@@ -0,0 +1,198 @@
+import mmap
+import re
+import struct
+from collections import Counter
+from itertools import islice
+
+from .loader import PROGRESS_LINES, detect_encoding, iter_vocab
+
+# 词库格式插件：detect(文件路径, 开头字节) 判断是否是本格式，read(文件路径, 编码, 进度) 流式产出
+# 与 iter_vocab 相同的 (词, 编码, 其余列)，所有格式都交给同一个对比引擎。
+# splittable 表示可以按行切成字节区间并行解析（只有普通文本可以）
+HEAD_SIZE = 4096
+# 判断词频列位置时抽样的行数
+WEIGHT_SAMPLE = 1000
+# 拼音音节之间统一用 ' 分隔，编码里不出现空白，不同格式的词库可以直接互相对比
+SYLLABLE_SEPARATOR = "'"
+
+
+class Format:
+    __slots__ = ('name', 'detect', 'read', 'splittable')
+
+    def __init__(self, name, detect, read, splittable=False):
+        self.name = name
+        self.detect = detect
+        self.read = read
+        self.splittable = splittable
+
+
+def weight_order(records):
+    # 三列及以上的行里纯数字的一列是词频；词频不在第三列时返回把它挪到第三列的列顺序
+    votes = Counter()
+    rows = 0
+    for first, second, extra in records:
+        if not extra:
+            continue
+        rows += 1
+        for column, text in enumerate((first, second, extra[0])):
+            if text.isdigit():
+                votes[column] += 1
+    if not rows or 2 * votes[2] > rows:
+        return None
+    if 2 * votes[1] > rows:
+        return (0, 2, 1)
+    if 2 * votes[0] > rows:
+        return (1, 2, 0)
+    return None
+
+
+def text_order(file_path, encoding):
+    return weight_order(islice(iter_vocab(file_path, encoding), WEIGHT_SAMPLE))
+
+
+def _read_text(file_path, encoding=None, progress=None):
+    if encoding is None:
+        encoding = detect_encoding(file_path)
+    return iter_vocab(file_path, encoding, progress, text_order(file_path, encoding))
+
+
+# 搜狗细胞词库：文件头魔数的第 5 字节区分两种版本，词表起始位置不同
+SCEL_MAGIC = re.compile(rb'\x40\x15\x00\x00[\x44\x45]\x43\x53\x01\x01\x00\x00\x00')
+SCEL_PINYIN_START = 0x1540
+SCEL_WORDS_START = {0x44: 0x2628, 0x45: 0x26c4}
+SCEL_DELETED = 'DELTBL'.encode('utf-16-le')
+_U16 = struct.Struct('<H')
+
+
+def _detect_scel(file_path, head):
+    return SCEL_MAGIC.match(head) is not None
+
+
+def _utf16(view, start, length):
+    # 切片越过文件末尾时 memoryview 只会返回短一截的内容，要自己检查
+    if start + length > len(view):
+        raise ValueError("不支持的词库文件")
+    return str(view[start:start + length], 'utf-16-le')
+
+
+def _read_scel(file_path, encoding=None, progress=None):
+    # 整个文件映射进内存，按偏移直接解析，不读出中间副本；拼音表的下标换成音节后用 ' 连接。
+    # 文件被截断或损坏时偏移会越界，统一报告为不支持的词库文件
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        view = memoryview(data)
+        try:
+            words_start = SCEL_WORDS_START[data[4]]
+            syllables = {}
+            pos = SCEL_PINYIN_START + 4
+            while pos + 4 <= words_start:
+                index, length = struct.unpack_from('<HH', data, pos)
+                if not length:
+                    break
+                syllables[index] = _utf16(view, pos + 4, length)
+                pos += 4 + length
+
+            pos = words_start
+            end = len(data)
+            groups = 0
+            while pos + 4 <= end and view[pos:pos + len(SCEL_DELETED)] != SCEL_DELETED:
+                count, length = struct.unpack_from('<HH', data, pos)
+                if not count:
+                    break
+                pos += 4
+                indexes = struct.unpack_from(f'<{length // 2}H', data, pos)
+                code = SYLLABLE_SEPARATOR.join(syllables.get(index, '') for index in indexes)
+                pos += length
+                for _ in range(count):
+                    length, = _U16.unpack_from(data, pos)
+                    word = _utf16(view, pos + 2, length)
+                    pos += 2 + length
+                    length, = _U16.unpack_from(data, pos)
+                    # 扩展信息的前两个字节是词频
+                    weight, = _U16.unpack_from(data, pos + 2)
+                    pos += 2 + length
+                    if pos > end:
+                        raise ValueError("不支持的词库文件")
+                    yield word, code, (str(weight),)
+                groups += 1
+                if progress is not None and groups % PROGRESS_LINES == 0:
+                    progress(pos)
+            if progress is not None:
+                progress(end)
+        except (struct.error, IndexError, KeyError) as e:
+            raise ValueError("不支持的词库文件") from e
+        finally:
+            view.release()
+
+
+# Rime 码表：YAML 文件头以 ... 结束，正文每行按 columns 声明的列用制表符分隔
+RIME_COLUMNS = ('text', 'code', 'weight')
+_RIME_HEADER = re.compile(rb'^---[ \t]*\r?$.*^name:', re.M | re.S)
+
+
+def _detect_rime(file_path, head):
+    return file_path.endswith('.dict.yaml') or _RIME_HEADER.search(head) is not None
+
+
+def _rime_columns(file):
+    # 只取文件头里的 columns，其余设置与对比无关；读到 ... 为止，文件停在正文开头
+    columns = list(RIME_COLUMNS)
+    listing = False
+    for line in file:
+        stripped = line.strip()
+        if stripped == '...':
+            break
+        if listing and stripped.startswith('- '):
+            columns.append(stripped[2:].strip())
+            continue
+        listing = False
+        if stripped.startswith('columns:'):
+            value = stripped[len('columns:'):].strip()
+            if value.startswith('['):
+                columns = [name.strip() for name in value.strip('[]').split(',')]
+            else:
+                columns = []
+                listing = True
+    return columns
+
+
+def _read_rime(file_path, encoding=None, progress=None):
+    with open(file_path, 'r', encoding=encoding or 'utf-8-sig') as file:
+        columns = _rime_columns(file)
+        others = [index for index, name in enumerate(columns) if name not in ('text', 'code')]
+        text = columns.index('text') if 'text' in columns else 0
+        code = columns.index('code') if 'code' in columns else None
+        for lineno, line in enumerate(file, 1):
+            if line.startswith('#'):
+                continue
+            values = line.rstrip('\r\n').split('\t')
+            if len(values) > text and values[text]:
+                syllables = values[code].split() if code is not None and len(values) > code else ()
+                yield (values[text], SYLLABLE_SEPARATOR.join(syllables),
+                       tuple(values[index] for index in others if index < len(values)))
+            if progress is not None and lineno % PROGRESS_LINES == 0:
+                progress(file.buffer.tell())
+        if progress is not None:
+            progress(file.buffer.tell())
+
+
+TEXT = Format('text', lambda file_path, head: True, _read_text, splittable=True)
+# 按顺序尝试，普通文本放在最后兜底
+FORMATS = [
+    Format('scel', _detect_scel, _read_scel),
+    Format('rime', _detect_rime, _read_rime),
+    TEXT,
+]
+
+
+def detect_format(file_path):
+    with open(file_path, 'rb') as file:
+        head = file.read(HEAD_SIZE)
+    for candidate in FORMATS:
+        if candidate.detect(file_path, head):
+            return candidate
+    return TEXT
+
+
+def iter_records(file_path, encoding=None, progress=None):
+    # 自动识别格式，产出 (词, 编码, 其余列)
+    return detect_format(file_path).read(file_path, encoding, progress)
@@ -0,0 +1,121 @@
+import argparse
+import heapq
+import json
+import os
+import sys
+import tempfile
+from itertools import chain, groupby, islice
+from operator import itemgetter
+
+from .bidi import ORDER_SAMPLE, detect_code_first
+from .extsort import MEMORY_LIMIT, _write_lines, merge_lines, sort_lines
+from .formats import iter_records
+
+# 多个版本的词库各自外部排序后做一次 k 路归并，逐词产出它在各版本间的变化；
+# 归并时每个版本只有一条记录和一个打开的文件在内存里，内存与版本数成正比，与词库大小无关
+
+
+def _sorted_run(file_path, directory, memory_limit, encoding):
+    # 把一个版本排成单个有序的 “词\t编码” 文件，列顺序按样本自动判断
+    records = iter_records(file_path, encoding)
+    sample = list(islice(records, ORDER_SAMPLE))
+    code_first = detect_code_first(sample)
+
+    def lines():
+        for first, second, _ in chain(sample, records):
+            if code_first and second:
+                first, second = second, first
+            yield f"{first}\t{second}"
+
+    runs = sort_lines(lines(), directory, memory_limit)
+    if len(runs) > 1:
+        # 合并成一个文件，归并时每个版本只占一个文件句柄
+        merged = _write_lines(merge_lines(runs), directory)
+        for run in runs:
+            os.remove(run)
+        runs = [merged]
+    return runs
+
+
+def _entries(runs, version):
+    # 有序行按词分组，产出 (排序键, 版本序号, 编码元组)；排序键是 “词\t”，与行的顺序一致
+    for key, group in groupby(merge_lines(runs), key=lambda line: line[:line.index('\t') + 1]):
+        yield key, version, tuple(code for code in (line[len(key):] for line in group) if code)
+
+
+def merge_timelines(streams, count, unchanged=False):
+    # streams 是各版本按排序键有序的 (排序键, 版本序号, 编码元组) 流；
+    # 逐词产出 (词, [(版本序号, 状态, 编码元组), ...])，状态为 added/changed/removed，
+    # 删除事件的编码是删除前的编码。unchanged 为假时跳过在第一个版本就有且之后从未变化的词
+    for key, group in groupby(heapq.merge(*streams), key=itemgetter(0)):
+        present = {version: codes for _, version, codes in group}
+        events = []
+        previous = None
+        for version in range(count):
+            codes = present.get(version)
+            if codes is None:
+                if previous is not None:
+                    events.append((version, 'removed', previous))
+            elif previous is None:
+                events.append((version, 'added', codes))
+            elif codes != previous:
+                events.append((version, 'changed', codes))
+            previous = codes
+        if unchanged or len(events) > 1 or events[0][0] > 0:
+            yield key[:-1], events
+
+
+def version_history(paths, memory_limit=MEMORY_LIMIT, encoding=None, temp_dir=None, unchanged=False,
+                    progress=None):
+    # 库接口：paths 按时间先后排列；排序阶段逐个版本进行，内存上限对每个版本都成立。
+    # progress(已排序版本数) 在每个版本排好后调用；临时文件在迭代结束后删除
+    with tempfile.TemporaryDirectory(prefix='vocabdiff-', dir=temp_dir) as directory:
+        streams = []
+        for version, path in enumerate(paths):
+            streams.append(_entries(_sorted_run(path, directory, memory_limit, encoding), version))
+            if progress is not None:
+                progress(version + 1)
+        yield from merge_timelines(streams, len(paths), unchanged)
+
+
+def write_jsonl(timelines, paths, out):
+    for key, events in timelines:
+        out.write(json.dumps({'key': key, 'timeline': [
+            {'version': paths[version], 'status': status, 'values': list(codes)}
+            for version, status, codes in events]}, ensure_ascii=False))
+        out.write('\n')
+
+
+def write_tsv(timelines, paths, out):
+    # 每个词一行：词，然后每个事件一列 “版本:状态:编码”，多个编码用空格分隔
+    for key, events in timelines:
+        columns = [f"{paths[version]}:{status}:{' '.join(codes)}" for version, status, codes in events]
+        out.write('\t'.join([key, *columns]) + '\n')
+
+
+WRITERS = {'jsonl': write_jsonl, 'tsv': write_tsv}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='vocabdiff.history',
+                                     description="按时间顺序对比多个版本的词库，输出每个词的变化时间线")
+    parser.add_argument('versions', nargs='+', help="各版本的词库文件，按从旧到新排列")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='jsonl', help="输出格式")
+    parser.add_argument('--all', action='store_true', help="也输出第一个版本就有且之后从未变化的词")
+    parser.add_argument('--encoding', help="文件编码，默认自动检测")
+    parser.add_argument('--memory', type=int, default=MEMORY_LIMIT >> 20, help="外部排序的内存上限 (MB)")
+    args = parser.parse_args(argv)
+    try:
+        timelines = version_history(args.versions, args.memory << 20, args.encoding, unchanged=args.all)
+        WRITERS[args.format](timelines, args.versions, sys.stdout)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        sys.stderr.close()
+    except (OSError, ValueError, UnicodeError) as e:
+        print(f"vocabdiff.history: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import codecs
+
+from chardet import UniversalDetector  # 增量检测，置信度足够即停止
+
+# 编码检测只读取文件开头的有限样本
+SAMPLE_SIZE = 1 << 20
+CHUNK_SIZE = 1 << 16
+
+# 每读这么多行报告一次已读字节数
+PROGRESS_LINES = 1 << 16
+
+# UTF-32 的 BOM 以 UTF-16 LE 的 BOM 开头，必须先判断
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# 样本里没出现的字符可能出现在文件后部，放宽到兼容的超集编码
+_WIDEN = {
+    'ascii': 'utf-8',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'big5': 'big5hkscs',
+}
+
+
+def _sample(file, first, sample_size):
+    # 从 first 开始向后取样，交给 chardet 判断
+    detector = UniversalDetector()
+    detector.feed(first)
+    remaining = sample_size - len(first)
+    while remaining > 0 and not detector.done:
+        chunk = file.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        detector.feed(chunk)
+        remaining -= len(chunk)
+    detector.close()
+    return (detector.result['encoding'] or 'utf-8').lower()
+
+
+def detect_encoding(file_path, sample_size=SAMPLE_SIZE):
+    with open(file_path, 'rb') as file:
+        head = file.read(4)
+        for bom, encoding in _BOMS:
+            if head.startswith(bom):
+                return encoding
+
+        encoding = _sample(file, head, sample_size)
+        if encoding == 'ascii':
+            # 样本全是 ASCII 时无从判断后面的编码：跳到第一个含非 ASCII 字节的块重新取样，
+            # 否则文件后部的 GBK 等字节会在读到一半时解码失败
+            while True:
+                chunk = file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if not chunk.isascii():
+                    encoding = _sample(file, chunk, sample_size)
+                    break
+
+    return _WIDEN.get(encoding, encoding)
+
+
+def parse_line(line, order=None):
+    # order 是前三列的新顺序，用于词频不在最后一列的文件
+    if line.startswith('#'):
+        return None
+    parts = line.split()
+    if not parts:
+        return None
+    if order is not None and len(parts) >= 3:
+        parts[:3] = [parts[i] for i in order]
+    if len(parts) == 1:
+        return parts[0], '', ()
+    return parts[0], parts[1], tuple(parts[2:])
+
+
+def iter_vocab(file_path, encoding=None, progress=None, order=None):
+    # 逐行解码解析，内存占用与文件大小无关
+    if encoding is None:
+        encoding = detect_encoding(file_path)
+    with open(file_path, 'r', encoding=encoding) as file:
+        for lineno, line in enumerate(file, 1):
+            record = parse_line(line, order)
+            if record is not None:
+                yield record
+            if progress is not None and lineno % PROGRESS_LINES == 0:
+                progress(file.buffer.tell())
+        if progress is not None:
+            progress(file.buffer.tell())
@@ -0,0 +1,114 @@
+from bisect import bisect_left
+
+from .bidi import _differs
+
+# 按键的前缀和编辑距离查找。键排序后，以同一前缀开头的键连成一段，排序表本身就是一棵隐式的字典树：
+# 前缀查询是两次二分，代价 O(log n + 命中数)，不用为每个字符建一个节点。
+# 模糊查询沿这棵树深度优先走，每个节点只算一行编辑距离，一行的最小值超过允许的距离时整棵子树跳过；
+# 再多一个字符错误就超出距离的节点只沿 term 里出现的字符往下走（即 Levenshtein 自动机）。
+# 相同长度的随机词彼此距离几乎都一样，BK 树在这种数据上会退化成一条链，按前缀剪枝不受影响
+
+# 比任何字符都大的码位，prefix + _LAST 是以 prefix 开头的键的上界
+_LAST = '\U0010ffff'
+
+
+def _next_row(row, char, term):
+    # 编辑距离矩阵的下一行：row 是 term 与当前前缀的距离，加上一个字符 char
+    next_row = [row[0] + 1]
+    for position, term_char in enumerate(term):
+        next_row.append(min(row[position + 1] + 1, next_row[position] + 1, row[position] + (term_char != char)))
+    return next_row
+
+
+class KeyIndex:
+    # 一组不重复的键，回答前缀查询和编辑距离查询
+    def __init__(self, keys):
+        self.keys = sorted(set(keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def prefix(self, prefix, limit=None):
+        keys = self.keys
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + _LAST, start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return keys[start:end]
+
+    def fuzzy(self, term, distance=1, limit=None):
+        # 返回 [(距离, 键)]，按距离再按键排序。栈里的每一项是隐式字典树的一个节点：
+        # 共享前缀的键所在的区间 [lo, hi)、前缀长度和 term 与该前缀的距离行
+        keys = self.keys
+        if not keys:
+            return []
+        term_chars = set(term)
+        chars = sorted(term_chars)
+        hits = []
+        stack = [(0, len(keys), 0, list(range(len(term) + 1)))]
+        while stack:
+            lo, hi, depth, row = stack.pop()
+            # 区间里最小的键可能正好就是前缀本身
+            if len(keys[lo]) == depth:
+                if row[-1] <= distance:
+                    hits.append((row[-1], keys[lo]))
+                lo += 1
+                if lo == hi:
+                    continue
+            path = keys[lo][:depth]
+            # 所有不在 term 里的字符得到同一行，只算一次
+            other_row = _next_row(row, None, term)
+            if min(other_row) > distance:
+                # 不在 term 里的字符都会超出距离，只用二分找以 term 中的字符开头的子节点
+                children = []
+                for char in chars:
+                    start = bisect_left(keys, path + char, lo, hi)
+                    if start < hi and keys[start].startswith(path + char):
+                        children.append((start, char))
+            else:
+                children = []
+                start = lo
+                while start < hi:
+                    children.append((start, keys[start][depth]))
+                    start = bisect_left(keys, path + keys[start][depth] + _LAST, start, hi)
+            for start, char in children:
+                next_row = _next_row(row, char, term) if char in term_chars else other_row
+                if min(next_row) <= distance:
+                    end = bisect_left(keys, path + char + _LAST, start, hi)
+                    stack.append((start, end, depth + 1, next_row))
+        hits.sort()
+        return hits if limit is None else hits[:limit]
+
+
+def diff_status(old_values, new_values):
+    if not old_values:
+        return 'added'
+    if not new_values:
+        return 'removed'
+    return 'changed' if _differs(old_values, new_values) else 'unchanged'
+
+
+class DiffLookup:
+    # 新旧两个词库同一方向的键合在一起查找，每个命中标上新增、删除、修改或未变。
+    # 两边只需要支持迭代键和 codes(键)，CompactVocab 和监视模式的视图都可以；索引在第一次查询时建立
+    def __init__(self, old_map, new_map):
+        self.old_map = old_map
+        self.new_map = new_map
+        self._index = None
+
+    def index(self):
+        if self._index is None:
+            self._index = KeyIndex(list(self.old_map) + list(self.new_map))
+        return self._index
+
+    def label(self, key, distance=None):
+        # 一个命中：(键, 状态, 旧值, 新值, 距离)，前缀查询的距离为 None
+        old_values = tuple(self.old_map.codes(key))
+        new_values = tuple(self.new_map.codes(key))
+        return key, diff_status(old_values, new_values), old_values, new_values, distance
+
+    def prefix(self, prefix, limit=None):
+        return [self.label(key) for key in self.index().prefix(prefix, limit)]
+
+    def fuzzy(self, term, distance=1, limit=None):
+        return [self.label(key, found) for found, key in self.index().fuzzy(term, distance, limit)]
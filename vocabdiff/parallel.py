@@ -0,0 +1,173 @@
+import codecs
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .bidi import ORDER_SAMPLE, BiIndex, collect_records, detect_code_first, read_bi_index
+from .compact import CompactVocab, collect, merge_collected
+from .formats import detect_format, iter_records, text_order
+from .loader import detect_encoding, iter_vocab, parse_line
+
+# 小于这个大小的文件单进程解析更快
+MIN_PARALLEL_SIZE = 64 << 20
+# 每个区间的目标大小，限制单个进程一次解码的数据量
+RANGE_SIZE = 32 << 20
+# 寻找换行符时每次读取的字节数
+SCAN_SIZE = 1 << 16
+
+# 带 BOM 的编码按 BOM 换成固定字节序，才能从文件中间开始解码
+_BOM_CODECS = {
+    'utf-8-sig': ((codecs.BOM_UTF8, 'utf-8'),),
+    'utf-16': ((codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be')),
+    'utf-32': ((codecs.BOM_UTF32_LE, 'utf-32-le'), (codecs.BOM_UTF32_BE, 'utf-32-be')),
+}
+_NO_BOM = {'utf-8-sig': 'utf-8', 'utf-16': 'utf-16-le', 'utf-32': 'utf-32-le'}
+_WIDTH = {'utf-16-le': 2, 'utf-16-be': 2, 'utf-32-le': 4, 'utf-32-be': 4}
+
+
+def file_layout(file_path, encoding):
+    # 返回 (固定字节序的编码, 正文起始偏移, 字符宽度)
+    name = codecs.lookup(encoding).name
+    if name in _BOM_CODECS:
+        with open(file_path, 'rb') as file:
+            head = file.read(4)
+        for bom, codec in _BOM_CODECS[name]:
+            if head.startswith(bom):
+                return codec, len(bom), _WIDTH.get(codec, 1)
+        name = _NO_BOM[name]
+    return name, 0, _WIDTH.get(name, 1)
+
+
+def _next_line_start(file, pos, start, width, newline):
+    # 从 pos 向后找到与字符宽度对齐的换行符，返回下一行的起始偏移
+    offset = pos
+    while True:
+        file.seek(offset)
+        chunk = file.read(SCAN_SIZE)
+        index = chunk.find(newline)
+        while index != -1 and (offset + index - start) % width:
+            index = chunk.find(newline, index + 1)
+        if index != -1:
+            return offset + index + len(newline)
+        if len(chunk) < SCAN_SIZE:
+            return offset + len(chunk)
+        offset += len(chunk) - len(newline) + 1
+
+
+def split_ranges(file_path, codec, start, width, parts):
+    # 把正文切成按行对齐的字节区间
+    newline = '\n'.encode(codec)
+    size = os.path.getsize(file_path)
+    step = max(width, (size - start) // parts)
+    bounds = [start]
+    with open(file_path, 'rb') as file:
+        for i in range(1, parts):
+            target = start + i * step
+            target -= (target - start) % width
+            if target <= bounds[-1]:
+                continue
+            boundary = _next_line_start(file, target, start, width, newline)
+            if boundary >= size:
+                break
+            bounds.append(boundary)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _accepts(code, extra, min_columns, max_columns):
+    columns = 2 + len(extra) if code else 1
+    return columns >= min_columns and (max_columns is None or columns <= max_columns)
+
+
+def _read_range(file_path, codec, start, end, order):
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    for line in data.decode(codec).split('\n'):
+        record = parse_line(line, order)
+        if record is not None:
+            yield record
+
+
+def _parse_range(file_path, codec, start, end, min_columns, max_columns, multi, order):
+    # 各进程只收集成普通字典，合并在 C 层完成，主进程最后一次性打包成紧凑结构
+    table = {}
+    for word, code, extra in _read_range(file_path, codec, start, end, order):
+        if not _accepts(code, extra, min_columns, max_columns):
+            continue
+        if multi:
+            collect(table, word, code)
+        else:
+            table[word] = code
+    return table
+
+
+def _parse_bi_range(file_path, codec, start, end, code_first, order):
+    return collect_records(_read_range(file_path, codec, start, end, order), code_first)
+
+
+def _merge_pairs(result, part):
+    merge_collected(result[0], part[0])
+    merge_collected(result[1], part[1])
+
+
+def _run_ranges(file_path, codec, start, width, workers, task, args, merge, progress):
+    # 各区间在独立进程中解析，再按文件顺序合并，保持“后出现的覆盖先出现的”
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(file_path)
+    parts = max(workers, -(-(size - start) // RANGE_SIZE))
+    ranges = split_ranges(file_path, codec, start, width, parts)
+
+    result = None
+    done = start
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            pool.submit(task, file_path, codec, range_start, range_end, *args)
+            for range_start, range_end in ranges
+        ]
+        for (range_start, range_end), future in zip(ranges, futures):
+            part = future.result()
+            if result is None:
+                result = part
+            else:
+                merge(result, part)
+            done += range_end - range_start
+            if progress is not None:
+                progress(done)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return result
+
+
+def _serial(file_path, workers):
+    # 二进制和带文件头的格式不能按行切分；只有一个核时多进程只会多出序列化和合并的开销
+    return (workers or os.cpu_count() or 1) == 1 or not detect_format(file_path).splittable
+
+
+def read_vocab_parallel(file_path, encoding=None, workers=None, min_columns=1, max_columns=None, multi=False, progress=None):
+    if _serial(file_path, workers):
+        return CompactVocab(((word, code) for word, code, extra in iter_records(file_path, encoding, progress)
+                             if _accepts(code, extra, min_columns, max_columns)), multi)
+    if encoding is None:
+        encoding = detect_encoding(file_path)
+    codec, start, width = file_layout(file_path, encoding)
+    table = _run_ranges(file_path, codec, start, width, workers,
+                        _parse_range, (min_columns, max_columns, multi, text_order(file_path, encoding)),
+                        merge_collected if multi else dict.update, progress)
+    return CompactVocab.pack(table, multi)
+
+
+def read_bi_index_parallel(file_path, encoding=None, workers=None, progress=None):
+    # 列顺序在主进程里按文件开头的样本判断一次，各区间沿用同一个结论
+    if _serial(file_path, workers):
+        return read_bi_index(file_path, encoding, progress)
+    if encoding is None:
+        encoding = detect_encoding(file_path)
+    codec, start, width = file_layout(file_path, encoding)
+    order = text_order(file_path, encoding)
+    sample = list(islice(iter_vocab(file_path, encoding, order=order), ORDER_SAMPLE))
+    code_first = detect_code_first(sample)
+    words, codes = _run_ranges(file_path, codec, start, width, workers,
+                               _parse_bi_range, (code_first, order), _merge_pairs, progress)
+    return BiIndex.pack(words, codes, code_first)
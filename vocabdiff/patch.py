@@ -0,0 +1,256 @@
+import argparse
+import gzip
+import hashlib
+import os
+import sys
+import tempfile
+
+from .extsort import MEMORY_LIMIT, merge_lines, sort_lines
+from .formats import iter_records
+
+# 补丁是按行排序的文本：首行是格式标记，每条操作是 “+/-前缀长度\t后缀”，
+# 前缀长度是与上一条操作共有的字符数；末行以 = 开头，记录基线和结果的校验和与行数。
+# 文件名以 .gz 结尾时整体 gzip 压缩，排序加前缀压缩后的文本压缩率很高
+MAGIC = 'VOCABPATCH 1'
+
+
+class _Unsorted(Exception):
+    def __init__(self, path):
+        super().__init__(path)
+        self.path = path
+
+
+def canonical_line(record):
+    # 词库的规范行：各列用制表符连接；规范形式是去重后按行排序的全部规范行
+    word, code, extra = record
+    return '\t'.join([word, code, *extra]) if code else word
+
+
+def _presorted_lines(file_path, encoding):
+    # 已是规范形式的文件（例如 apply 的输出）直接流式读取，发现乱序时中止
+    last = None
+    for record in iter_records(file_path, encoding):
+        line = canonical_line(record)
+        if last is not None and line <= last:
+            if line == last:
+                continue
+            raise _Unsorted(file_path)
+        last = line
+        yield line
+
+
+def canonical_lines(file_path, directory, presorted=True, memory_limit=MEMORY_LIMIT, encoding=None):
+    if presorted:
+        return _presorted_lines(file_path, encoding)
+    records = (canonical_line(record) for record in iter_records(file_path, encoding))
+    return merge_lines(sort_lines(records, directory, memory_limit))
+
+
+class _Digest:
+    # 迭代时顺便累计校验和与行数
+    def __init__(self, lines):
+        self.lines = lines
+        self.sha = hashlib.sha256()
+        self.count = 0
+
+    def __iter__(self):
+        for line in self.lines:
+            self.sha.update(line.encode('utf-8') + b'\n')
+            self.count += 1
+            yield line
+
+    def value(self):
+        return f"{self.sha.hexdigest()} {self.count}"
+
+
+def _open_text(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='\n')
+    return open(path, mode, encoding='utf-8', newline='\n')
+
+
+def _replace_atomically(path, write):
+    # 先写临时文件，全部成功后再替换，校验失败时不留下半个文件
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        result = write(temp_path)
+        # mkstemp 建的文件只有属主可读，改成普通新文件的权限
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, path)
+        return result
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _retry_unsorted(task, paths):
+    # 先假设输入已是规范形式流式处理；某个文件乱序时改为外部排序重来
+    presorted = dict.fromkeys(paths, True)
+    while True:
+        try:
+            return task(presorted)
+        except _Unsorted as e:
+            presorted[e.path] = False
+
+
+def _diff_lines(old_lines, new_lines):
+    missing = object()
+    old_iter, new_iter = iter(old_lines), iter(new_lines)
+    old = next(old_iter, missing)
+    new = next(new_iter, missing)
+    while old is not missing or new is not missing:
+        if new is missing or (old is not missing and old < new):
+            yield '-', old
+            old = next(old_iter, missing)
+        elif old is missing or new < old:
+            yield '+', new
+            new = next(new_iter, missing)
+        else:
+            old = next(old_iter, missing)
+            new = next(new_iter, missing)
+
+
+def _shared_prefix(a, b):
+    size = min(len(a), len(b))
+    index = 0
+    while index < size and a[index] == b[index]:
+        index += 1
+    return index
+
+
+def make_patch(old_path, new_path, patch_path, memory_limit=MEMORY_LIMIT, encoding=None, temp_dir=None):
+    # 两个词库的规范形式做归并连接，只写出增删的行；返回 (删除行数, 新增行数)
+    def task(presorted):
+        with tempfile.TemporaryDirectory(prefix='vocabdiff-', dir=temp_dir) as directory:
+            old = _Digest(canonical_lines(old_path, directory, presorted[old_path], memory_limit, encoding))
+            new = _Digest(canonical_lines(new_path, directory, presorted[new_path], memory_limit, encoding))
+
+            def write(temp_path):
+                counts = {'-': 0, '+': 0}
+                previous = ''
+                with _open_text(temp_path, 'w') as file:
+                    file.write(MAGIC + '\n')
+                    for op, line in _diff_lines(old, new):
+                        shared = _shared_prefix(previous, line)
+                        file.write(f"{op}{shared}\t{line[shared:]}\n")
+                        previous = line
+                        counts[op] += 1
+                    file.write(f"={old.value()} {new.value()}\n")
+                return counts['-'], counts['+']
+
+            return _replace_atomically(patch_path, write)
+
+    return _retry_unsorted(task, (old_path, new_path))
+
+
+def iter_patch(patch_path):
+    # 逐条产出 (操作, 行)，最后产出 ('=', 校验信息)
+    with _open_text(patch_path, 'r') as file:
+        if file.readline().rstrip('\n') != MAGIC:
+            raise ValueError("不是词库补丁文件")
+        previous = ''
+        for raw in file:
+            raw = raw[:-1]
+            if raw.startswith('='):
+                yield '=', raw[1:].split()
+                return
+            shared, suffix = raw[1:].split('\t', 1)
+            previous = previous[:int(shared)] + suffix
+            yield raw[0], previous
+    raise ValueError("补丁文件不完整")
+
+
+def _apply_lines(base_lines, ops):
+    # 单遍归并：基线行和补丁操作都按行排序
+    op, line = next(ops)
+    for base in base_lines:
+        while op == '+' and line < base:
+            yield line
+            op, line = next(ops)
+        if op in '+-' and line == base:
+            if op == '+':
+                raise ValueError(f"补丁要新增的行已存在: {line}")
+            op, line = next(ops)
+            continue
+        if op == '-' and line < base:
+            raise ValueError(f"补丁要删除的行不存在: {line}")
+        yield base
+    while op != '=':
+        if op == '-':
+            raise ValueError(f"补丁要删除的行不存在: {line}")
+        yield line
+        op, line = next(ops)
+    # 把校验信息留给调用方
+    yield op, line
+
+
+def apply_patch(base_path, patch_path, out_path, memory_limit=MEMORY_LIMIT, encoding=None, temp_dir=None):
+    # 基线与补丁单遍归并成新词库（规范形式，UTF-8），基线和结果的校验和都对得上才替换输出文件
+    def task(presorted):
+        with tempfile.TemporaryDirectory(prefix='vocabdiff-', dir=temp_dir) as directory:
+            base = _Digest(canonical_lines(base_path, directory, presorted[base_path], memory_limit, encoding))
+
+            def write(temp_path):
+                result = hashlib.sha256()
+                count = 0
+                with open(temp_path, 'w', encoding='utf-8', newline='\n') as file:
+                    try:
+                        for line in _apply_lines(base, iter_patch(patch_path)):
+                            if isinstance(line, tuple):
+                                expected = line[1]
+                                break
+                            data = line + '\n'
+                            file.write(data)
+                            result.update(data.encode('utf-8'))
+                            count += 1
+                    except ValueError:
+                        # 基线不是规范形式时对不上补丁很正常，读完确认后改为排序重来
+                        if presorted[base_path]:
+                            for _ in base.lines:
+                                pass
+                        raise
+                if expected[:2] != base.value().split():
+                    raise ValueError("补丁与基线词库不符")
+                if expected[2:] != [result.hexdigest(), str(count)]:
+                    raise ValueError("应用补丁后的校验和不符")
+                return count
+
+            return _replace_atomically(out_path, write)
+
+    return _retry_unsorted(task, (base_path,))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='vocabdiff.patch', description="生成或应用词库补丁")
+    commands = parser.add_subparsers(dest='command', required=True)
+    make = commands.add_parser('make', help="对比两个词库，生成补丁")
+    make.add_argument('old')
+    make.add_argument('new')
+    make.add_argument('patch', help="补丁文件，以 .gz 结尾时压缩")
+    apply = commands.add_parser('apply', help="把补丁应用到基线词库")
+    apply.add_argument('base')
+    apply.add_argument('patch')
+    apply.add_argument('out', help="输出的新词库")
+    for command in (make, apply):
+        command.add_argument('--encoding', help="文件编码，默认自动检测")
+        command.add_argument('--memory', type=int, default=MEMORY_LIMIT >> 20, help="外部排序的内存上限 (MB)")
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'make':
+            removed, added = make_patch(args.old, args.new, args.patch, args.memory << 20, args.encoding)
+            print(f"删除 {removed} 行，新增 {added} 行", file=sys.stderr)
+        else:
+            count = apply_patch(args.base, args.patch, args.out, args.memory << 20, args.encoding)
+            print(f"已写出 {count} 行", file=sys.stderr)
+    except (OSError, ValueError, UnicodeError) as e:
+        print(f"vocabdiff.patch: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import os
+
+from .bidi import diff_axis, diff_digested, read_bi_index
+from .collisions import CollisionCounter
+from .compact import CompactVocab, collect
+from .formats import iter_records
+from .parallel import MIN_PARALLEL_SIZE, read_bi_index_parallel, read_vocab_parallel
+from .search import CompactIndex, SearchIndex, change_fields, collision_fields, entry_fields
+
+# 界面脚本共用的解析、对比和结果生成步骤，不涉及界面，可在后台线程执行；性能测试也直接调用这里
+
+# 各结果标签页每行用于查找的字段
+RESULT_FIELDS = {
+    'added': entry_fields,
+    'removed': entry_fields,
+    'changed': change_fields,
+    'code_changed': change_fields,
+    'collisions': collision_fields,
+    'old_vocab': entry_fields,
+    'new_vocab': entry_fields,
+}
+
+
+def parse_index(file_path, encoding=None, progress=None):
+    # 大文件分给多个进程解析
+    if os.path.getsize(file_path) >= MIN_PARALLEL_SIZE:
+        return read_bi_index_parallel(file_path, encoding, progress=progress)
+    # 同一遍解析里同时建立 词→编码 和 编码→词，词在前还是编码在前按样本自动判断
+    return read_bi_index(file_path, encoding, progress=progress)
+
+
+def compare_indexes(old_vocab, new_vocab, progress=None):
+    # 按词对比，并找出对应的词发生变化的编码；只深入分桶摘要不同的桶。
+    # 返回 (新增, 删除, 修改, 编码变化, 排好名的重码分析)
+    words = len(new_vocab.by_word)
+    added, removed, changed = diff_digested(old_vocab.by_word, old_vocab.word_digest(),
+                                            new_vocab.by_word, new_vocab.word_digest(), progress)
+    code_diffs = diff_digested(old_vocab.by_code, old_vocab.code_digest(),
+                               new_vocab.by_code, new_vocab.code_digest(),
+                               progress and (lambda count: progress(words + count)))
+    # 重码分析直接用两个方向的差异，不再扫描词库
+    collisions = CollisionCounter()
+    collisions.add_diffs(code_diffs, (added, removed, changed))
+    return added, removed, changed, code_diffs[2], collisions.ranked()
+
+
+def result_items(diffs, old_vocab, new_vocab):
+    # 各标签页的 {名称: (行, 查找索引)}；两个完整词库的标签页直接从紧凑结构按行解码、在缓冲区里查找，不复制整份词库
+    added, removed, changed, code_changed, collisions = diffs
+    results = {'added': added.items(), 'removed': removed.items(), 'changed': changed.items(),
+               'code_changed': code_changed.items(), 'collisions': collisions}
+    tabs = {}
+    for name, fields in RESULT_FIELDS.items():
+        if name in results:
+            items = list(results[name])
+            tabs[name] = (items, SearchIndex(items, fields))
+        else:
+            vocab = (old_vocab if name == 'old_vocab' else new_vocab).by_word
+            tabs[name] = (vocab.entries(), CompactIndex(vocab))
+    return tabs
+
+
+def parse_vocab(file_path, encoding=None, progress=None):
+    # 只建 词→编码 一个方向；大文件分给多个进程解析
+    if os.path.getsize(file_path) >= MIN_PARALLEL_SIZE:
+        return read_vocab_parallel(file_path, encoding, min_columns=2, multi=True, progress=progress)
+    # 一词多码先收集成字典，再一次性打包成紧凑结构，每个词对应一个编码元组
+    table = {}
+    for word, code, _ in iter_records(file_path, encoding, progress):
+        # 词频等第三列以后的内容不参与对比，列数多的行也要保留
+        if code:
+            collect(table, word, code)
+    return CompactVocab.pack(table, multi=True)
+
+
+def compare_vocab(old_vocab, new_vocab, progress=None):
+    # 编码按集合比较，顺序不同不算修改；返回 (新增, 删除, 修改)
+    return diff_axis(old_vocab, new_vocab, progress)
+
+
+def word_result_items(added, removed, changed):
+    # 只按词对比时各标签页的 {名称: (行, 查找索引)}
+    added_items = list(added.items())
+    removed_items = list(removed.items())
+    changed_items = list(changed.items())
+    return {'added': (added_items, SearchIndex(added_items)),
+            'removed': (removed_items, SearchIndex(removed_items)),
+            'changed': (changed_items, SearchIndex(changed_items, change_fields))}
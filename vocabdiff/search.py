@@ -0,0 +1,120 @@
+from array import array
+from bisect import bisect_right
+
+
+def entry_fields(item):
+    k, v = item
+    if isinstance(v, str):
+        return f"{k}\t{v}"
+    return '\t'.join([k, *v])
+
+
+def change_fields(item):
+    k, (old_val, new_val) = item
+    return f"{entry_fields((k, old_val))}\t{entry_fields(('', new_val))}"
+
+
+def timeline_fields(item):
+    # 版本历史的一行：词和各版本出现过的全部编码
+    k, events = item
+    return '\t'.join([k, *(code for _, _, codes in events for code in codes)])
+
+
+def collision_fields(item):
+    # 重码分析的一行：键和加入、移出的值
+    k, (_, _, _, joined, left) = item
+    return '\t'.join([k, *joined, *left])
+
+
+def hit_fields(item):
+    # 前缀、模糊查询的一行：键和新旧两边的值
+    k, _, old_val, new_val, _ = item
+    return '\t'.join([k, *old_val, *new_val])
+
+
+class SearchIndex:
+    # 每行的词和编码用制表符连接，所有行再拼成一个字符串；
+    # 子串查找交给 str.find 在 C 层完成，命中位置用行首偏移表二分映射回行号
+    def __init__(self, items, fields=entry_fields):
+        parts = []
+        starts = array('Q', [0])
+        pos = 0
+        for item in items:
+            text = fields(item)
+            parts.append(text)
+            pos += len(text) + 1
+            starts.append(pos)
+        parts.append('')
+        self.text = '\n'.join(parts)
+        self.starts = starts
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def row_text(self, row):
+        return self.text[self.starts[row]:self.starts[row + 1] - 1]
+
+    def search(self, term, within=None):
+        # 字段和行分别用制表符、换行符连接，查找词含有它们就会跨字段匹配
+        if not term or '\n' in term or '\t' in term:
+            return []
+        if within is not None:
+            # 在上一次的结果里继续筛选，用于边输入边查找
+            return [row for row in within if term in self.row_text(row)]
+
+        rows = []
+        find = self.text.find
+        starts = self.starts
+        pos = find(term)
+        while pos != -1:
+            row = bisect_right(starts, pos) - 1
+            rows.append(row)
+            pos = find(term, starts[row + 1])
+        return rows
+
+
+class CompactIndex:
+    # 与 SearchIndex 相同的查找接口，直接在紧凑词库的缓冲区里查找，不另外拼接整份词库的文本；
+    # 只在单个词或编码内部匹配，不跨越字段
+    def __init__(self, vocab):
+        self.vocab = vocab
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def row_text(self, row):
+        return entry_fields(self.vocab.entry(row))
+
+    def _matches(self, row, term):
+        word, values = self.vocab.entry(row)
+        return term in word or any(term in value for value in ((values,) if isinstance(values, str) else values))
+
+    def search(self, term, within=None):
+        if not term or '\n' in term or '\t' in term:
+            return []
+        if within is not None:
+            return [row for row in within if self._matches(row, term)]
+        return self.vocab.search(term)
+
+
+class SearchSession:
+    # 同时查找多个标签页；新词以上一个词开头时只在上次命中的行里筛选
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self.term = ''
+        self.hits = {}
+
+    def search(self, term):
+        refine = bool(self.term) and term.startswith(self.term)
+        self.hits = {
+            name: index.search(term, self.hits.get(name) if refine else None)
+            for name, index in self.indexes.items()
+        }
+        self.term = term
+        return self.hits
+
+    def replace(self, name, index):
+        # 某个标签页的内容变了，换上新索引并按当前查找词重新查找
+        self.indexes[name] = index
+        self.hits[name] = index.search(self.term)
+        return self.hits[name]
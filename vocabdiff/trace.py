@@ -0,0 +1,133 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，改用 GetProcessMemoryInfo
+    resource = None
+
+
+def peak_rss():
+    # 本进程的内存峰值（字节），多进程解析时子进程不计入；不支持的平台返回 None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+class Span:
+    # 一个阶段：名称、起止时间、处理的条数和结束时的内存峰值
+    __slots__ = ('name', 'start', 'end', 'count', 'peak_rss', 'thread')
+
+    def __init__(self, name, count=None):
+        self.name = name
+        self.count = count
+        self.start = self.end = None
+        self.peak_rss = None
+        self.thread = threading.get_ident()
+
+    @property
+    def seconds(self):
+        return self.end - self.start
+
+
+class Tracer:
+    # 记录一次运行里各阶段的耗时、条数、吞吐量和内存峰值，可导出为 Chrome 跟踪文件（chrome://tracing、Perfetto）。
+    # profile 为真时每个阶段同时在 cProfile 下运行，结果合并成一份；关闭时每个阶段只多两次计时调用
+    def __init__(self, profile=False):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.profile = profile
+        self.stats = None
+        self._lock = threading.Lock()
+        self._profiling = threading.local()
+
+    @contextmanager
+    def stage(self, name, count=None):
+        # 可以在多个线程里同时使用；条数不知道时可在 with 块里给 span.count 赋值
+        span = Span(name, count)
+        profiler = None
+        # cProfile 按线程生效，嵌套的阶段沿用外层的分析器。Python 3.12 起同一时刻只能有一个分析器，
+        # 其他线程的阶段正在分析时 enable 会抛出 ValueError，这时本阶段只计时
+        if self.profile and not getattr(self._profiling, 'active', False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                profiler = None
+            else:
+                self._profiling.active = True
+        span.start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            if profiler is not None:
+                profiler.disable()
+                self._profiling.active = False
+                with self._lock:
+                    if self.stats is None:
+                        self.stats = pstats.Stats(profiler)
+                    else:
+                        self.stats.add(profiler)
+            span.peak_rss = peak_rss()
+            self.spans.append(span)
+
+    def peak(self):
+        values = [span.peak_rss for span in self.spans if span.peak_rss is not None]
+        return max(values) if values else None
+
+    def summary(self):
+        # 状态栏显示的一行摘要
+        parts = []
+        for span in self.spans:
+            text = f"{span.name} {span.seconds:.2f}s"
+            if span.count:
+                rate = span.count / span.seconds if span.seconds > 0 else 0
+                text += f" {span.count} 条 ({rate:,.0f} 条/秒)"
+            parts.append(text)
+        peak = self.peak()
+        if peak is not None:
+            parts.append(f"内存峰值 {peak / 1048576:.0f} MB")
+        return " | ".join(parts)
+
+    def export_chrome(self, path):
+        # Chrome 跟踪事件格式：每个阶段是一个完整事件 (ph = X)，时间单位是微秒
+        pid = os.getpid()
+        events = [{
+            'name': span.name, 'ph': 'X', 'pid': pid, 'tid': span.thread,
+            'ts': (span.start - self.origin) * 1e6, 'dur': span.seconds * 1e6,
+            'args': {'count': span.count, 'peak_rss': span.peak_rss},
+        } for span in sorted(self.spans, key=lambda span: span.start)]
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'otherData': {'summary': self.summary()}}, file, ensure_ascii=False)
+
+    def export_profile(self, path):
+        # 写出 cProfile 数据，可用 pstats 或 snakeviz 查看；没有开启时返回 False
+        if self.stats is None:
+            return False
+        self.stats.dump_stats(path)
+        return True
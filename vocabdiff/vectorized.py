@@ -0,0 +1,243 @@
+import os
+
+try:
+    import numpy as np  # 可选依赖，没有安装时退回逐条对比
+except ImportError:
+    np = None
+
+from .compact import CompactVocab
+
+# 词条数少于这个值时逐条对比更快
+MIN_VECTOR_SIZE = 1 << 14
+# 默认不用：1M 词条上只比逐条对比快一倍左右（benchmarks/run.py 的 engine 两项），
+# 设置环境变量 VOCABDIFF_VECTORIZED=1 才启用
+enabled = os.environ.get('VOCABDIFF_VECTORIZED') == '1'
+_SEED = 0xcbf29ce484222325
+
+
+_ALL = np.uint64(0xffffffffffffffff) if np is not None else None
+
+
+def available():
+    return np is not None
+
+
+def usable(old_map, new_map):
+    return (enabled and np is not None and isinstance(old_map, CompactVocab) and isinstance(new_map, CompactVocab)
+            and old_map.multi == new_map.multi and len(old_map) + len(new_map) >= MIN_VECTOR_SIZE)
+
+
+class _Arrays:
+    # CompactVocab 底层缓冲区的 numpy 视图，不复制数据
+    def __init__(self, vocab):
+        blob, arrays = vocab.buffers()
+        self.words = _word_view(np.frombuffer(blob, dtype=np.uint8))
+        self.word_start = np.frombuffer(arrays['_word_start'], dtype=np.uint64).astype(np.int64)
+        self.word_len = np.frombuffer(arrays['_word_len'], dtype=np.uint32).astype(np.int64)
+        # 第 i 个词的编码序号是 word_codes[i]:word_codes[i + 1]
+        self.word_codes = np.frombuffer(arrays['_word_codes'], dtype=np.uint32).astype(np.int64)
+        self.code_start = np.frombuffer(arrays['_code_start'], dtype=np.uint64).astype(np.int64)
+        self.code_len = np.frombuffer(arrays['_code_len'], dtype=np.uint32).astype(np.int64)
+
+
+def _mix(h):
+    # splitmix64 的收尾混合，让相近的输入散开
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xbf58476d1ce4e5b9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94d049bb133111eb)
+    return h ^ (h >> np.uint64(31))
+
+
+def _word_view(blob):
+    # 重叠的 uint64 视图：下标 i 处是从第 i 个字节开始的 8 个字节，按小端读取；
+    # 末尾补 8 个零字节（复制一次缓冲区），读到最后一个字符串也不会越界
+    blob = np.concatenate([blob, np.zeros(8, dtype=np.uint8)])
+    return np.ndarray(shape=(len(blob) - 7,), dtype='<u8', buffer=blob, strides=(1,))
+
+
+def _column(words, starts, lengths, column):
+    # 读取每个字符串的第 column 个 8 字节，超出字符串末尾的字节清零；调用方保证每个字符串都还有剩余字节
+    remain = np.minimum(lengths - 8 * column, 8).astype(np.uint64)
+    return words[starts + 8 * column] & (_ALL >> (np.uint64(64) - remain * np.uint64(8)))
+
+
+def _columns(lengths):
+    # 逐列产出 (列号, 还没读完的字符串下标)；第一列全部都有剩余时直接用切片，之后每列只在上一列的下标里筛选
+    if not len(lengths):
+        return
+    rows = slice(None) if lengths.min() > 0 else np.flatnonzero(lengths)
+    column = 0
+    while len(lengths[rows]):
+        yield column, rows
+        column += 1
+        rows = np.flatnonzero(lengths > 8 * column) if column == 1 else rows[lengths[rows] > 8 * column]
+
+
+def _hash_spans(words, starts, lengths):
+    # 每轮把所有还没读完的字符串的下一个 8 字节混入哈希
+    h = lengths.astype(np.uint64) ^ np.uint64(_SEED)
+    for column, rows in _columns(lengths):
+        h[rows] = _mix(h[rows] ^ _column(words, starts[rows], lengths[rows], column))
+    return _mix(h)
+
+
+def _equal_spans(words_a, starts_a, len_a, words_b, starts_b, len_b):
+    # 逐对比较两组字符串的字节，返回是否完全相同
+    equal = len_a == len_b
+    candidates = np.flatnonzero(equal)
+    starts, other, lengths = starts_a[candidates], starts_b[candidates], len_a[candidates]
+    same = np.ones(len(candidates), dtype=bool)
+    for column, rows in _columns(lengths):
+        same[rows] &= (_column(words_a, starts[rows], lengths[rows], column)
+                       == _column(words_b, other[rows], lengths[rows], column))
+    equal[candidates] = same
+    return equal
+
+
+def _lookup(sorted_keys, keys):
+    # 在有序数组里查找每个键，返回 (是否存在, 位置)
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool), np.zeros(len(keys), dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return sorted_keys[pos] == keys, pos
+
+
+class _Values:
+    # 多值模式下每个词的编码集合：编码哈希之和（按 2^64 取模，用前缀和相减得到）和编码个数；
+    # 一个词的编码连续存放、以制表符分隔，整组的起点和字节数用来按存放顺序核对
+    def __init__(self, arrays, code_hash):
+        sums = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(code_hash, dtype=np.uint64)])
+        self.hash = sums[arrays.word_codes[1:]] - sums[arrays.word_codes[:-1]]
+        self.counts = np.diff(arrays.word_codes)
+        self.group_start = np.zeros(len(self.counts), dtype=np.int64)
+        self.group_len = np.zeros(len(self.counts), dtype=np.int64)
+        words = np.flatnonzero(self.counts)
+        first, last = arrays.word_codes[words], arrays.word_codes[words + 1] - 1
+        self.group_start[words] = arrays.code_start[first]
+        self.group_len[words] = arrays.code_start[last] + arrays.code_len[last] - self.group_start[words]
+
+
+def _verify_multi(old, new, old_values, new_values, old_idx, new_idx):
+    # 集合哈希相同的词对按存放顺序核对整组编码的字节；返回核对不上的词对（多半只是编码顺序不同）
+    return ~_equal_spans(old.words, old_values.group_start[old_idx], old_values.group_len[old_idx],
+                         new.words, new_values.group_start[new_idx], new_values.group_len[new_idx])
+
+
+def _duplicates(sorted_hashes):
+    return np.unique(sorted_hashes[1:][sorted_hashes[1:] == sorted_hashes[:-1]])
+
+
+def _exact_diff(old_map, new_map, old_idx, new_idx):
+    # 哈希有冲突的少量词条按字符串精确对比
+    old_rows = {old_map.entry(i)[0]: i for i in old_idx.tolist()}
+    added, removed, changed = [], [], []
+    seen = set()
+    for j in new_idx.tolist():
+        word, value = new_map.entry(j)
+        i = old_rows.get(word)
+        if i is None:
+            added.append(j)
+            continue
+        seen.add(word)
+        old_value = old_map.entry(i)[1]
+        if old_map.multi:
+            if sorted(old_value) != sorted(value):
+                changed.append((i, j))
+        elif old_value != value:
+            changed.append((i, j))
+    removed = [i for word, i in old_rows.items() if word not in seen]
+    return added, removed, changed
+
+
+def diff_arrays(old_map, new_map):
+    # 词和编码先散列成 uint64，用排序数组上的集合运算找出新增、删除和共有的词，
+    # 值是否变化也比较哈希；哈希相同时再核对字节，冲突的词条交给逐条对比，最后只把结果行还原成字符串
+    old, new = _Arrays(old_map), _Arrays(new_map)
+    multi = old_map.multi
+    old_keys = _hash_spans(old.words, old.word_start, old.word_len)
+    new_keys = _hash_spans(new.words, new.word_start, new.word_len)
+
+    # 两边都排好序再查找，顺序访问比随机查找快得多
+    old_order = np.argsort(old_keys)
+    old_sorted = old_keys[old_order]
+    new_order = np.argsort(new_keys)
+    new_sorted = new_keys[new_order]
+    suspect = np.union1d(_duplicates(old_sorted), _duplicates(new_sorted))
+
+    found_sorted, pos = _lookup(old_sorted, new_sorted)
+    found = np.empty(len(new_keys), dtype=bool)
+    found[new_order] = found_sorted
+    # 查找结果放回新词库的顺序，共有的词按这个顺序排列，之后逐对核对时按顺序读取缓冲区
+    old_pos = np.empty(len(new_keys), dtype=np.int64)
+    old_pos[new_order] = pos
+    pairs_new = np.flatnonzero(found)
+    pairs_old = old_order[old_pos[pairs_new]]
+    same_key = _equal_spans(old.words, old.word_start[pairs_old], old.word_len[pairs_old],
+                            new.words, new.word_start[pairs_new], new.word_len[pairs_new])
+    suspect = np.union1d(suspect, new_keys[pairs_new[~same_key]])
+
+    old_suspect = _lookup(suspect, old_keys)[0]
+    new_suspect = _lookup(suspect, new_keys)[0]
+    added = np.flatnonzero(~found & ~new_suspect)
+    # 哈希不重复的旧词要么出现在共有的词对里，要么被删除
+    removed = np.ones(len(old_keys), dtype=bool)
+    removed[pairs_old] = False
+    removed = np.flatnonzero(removed & ~old_suspect)
+    keep = ~new_suspect[pairs_new]
+    pairs_old, pairs_new = pairs_old[keep], pairs_new[keep]
+
+    old_code_hash = _hash_spans(old.words, old.code_start, old.code_len)
+    new_code_hash = _hash_spans(new.words, new.code_start, new.code_len)
+    if multi:
+        old_values, new_values = _Values(old, old_code_hash), _Values(new, new_code_hash)
+        differs = ((old_values.hash[pairs_old] != new_values.hash[pairs_new])
+                   | (old_values.counts[pairs_old] != new_values.counts[pairs_new]))
+        check = np.flatnonzero(~differs)
+        bad = _verify_multi(old, new, old_values, new_values, pairs_old[check], pairs_new[check])
+        # 集合哈希相同但编码核对不上的词对极少，交给逐条对比
+        old_suspect[pairs_old[check[bad]]] = True
+        new_suspect[pairs_new[check[bad]]] = True
+        changed_mask = differs
+        keep = np.ones(len(pairs_old), dtype=bool)
+        keep[check[bad]] = False
+    else:
+        old_heads, new_heads = old.word_codes[pairs_old], new.word_codes[pairs_new]
+        changed_mask = old_code_hash[old_heads] != new_code_hash[new_heads]
+        check = np.flatnonzero(~changed_mask)
+        equal = _equal_spans(old.words, old.code_start[old_heads[check]], old.code_len[old_heads[check]],
+                             new.words, new.code_start[new_heads[check]], new.code_len[new_heads[check]])
+        changed_mask[check[~equal]] = True
+        keep = np.ones(len(pairs_old), dtype=bool)
+    changed_old = pairs_old[changed_mask & keep]
+    changed_new = pairs_new[changed_mask & keep]
+
+    extra_added, extra_removed, extra_changed = _exact_diff(
+        old_map, new_map, np.flatnonzero(old_suspect), np.flatnonzero(new_suspect))
+    added = np.sort(np.concatenate([added, np.array(extra_added, dtype=np.int64)]))
+    removed = np.sort(np.concatenate([removed, np.array(extra_removed, dtype=np.int64)]))
+    if extra_changed:
+        extra = np.array(extra_changed, dtype=np.int64)
+        changed_old = np.concatenate([changed_old, extra[:, 0]])
+        changed_new = np.concatenate([changed_new, extra[:, 1]])
+    order = np.argsort(changed_new, kind='stable') if extra_changed else slice(None)
+
+    added_rows = dict(new_map.entry(j) for j in added.tolist())
+    removed_rows = dict(old_map.entry(i) for i in removed.tolist())
+    changed_rows = {}
+    for i, j in zip(changed_old[order].tolist(), changed_new[order].tolist()):
+        word, value = new_map.entry(j)
+        changed_rows[word] = (old_map.entry(i)[1], value)
+    return added_rows, removed_rows, changed_rows
+
+
+def entry_hashes(vocab):
+    # 每个词条的 (键哈希, 词条哈希)；多值模式下词条哈希与编码顺序无关
+    arrays = _Arrays(vocab)
+    keys = _hash_spans(arrays.words, arrays.word_start, arrays.word_len)
+    code_hash = _hash_spans(arrays.words, arrays.code_start, arrays.code_len)
+    if vocab.multi:
+        values = _Values(arrays, code_hash).hash
+    else:
+        values = code_hash[arrays.word_codes[:-1]]
+    return keys, _mix(keys ^ _mix(values + np.uint64(_SEED)))
@@ -0,0 +1,344 @@
+import hashlib
+import os
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from collections.abc import Sequence
+
+from .formats import detect_format, text_order
+from .loader import detect_encoding, parse_line
+
+# 行哈希的低位全为 0 时在该行后断开，平均每块 CHUNK_MASK + 1 行；插入或删除行只影响附近的块
+CHUNK_MASK = 63
+MAX_CHUNK_LINES = 1024
+# 受影响的键不超过这么多时，重新收集前先按子串跳过不含它们的块
+FILTER_KEYS = 64
+
+
+def iter_chunks(lines):
+    # 按内容切块，逐块产出行列表；块边界只取决于行本身，不随前面的行数变化
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if hash(line) & CHUNK_MASK == 0 or len(chunk) >= MAX_CHUNK_LINES:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def chunk_digest(text):
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class AxisView:
+    # 监视中的词库一个方向的只读视图，接口与 CompactVocab 的迭代和 codes 相同：
+    # base 是对比时的紧凑词库，changes 是之后变动过的键和新的值，空元组表示已删除
+    __slots__ = ('base', 'changes')
+
+    def __init__(self, base, changes):
+        self.base = base
+        self.changes = changes
+
+    def __iter__(self):
+        changes = self.changes
+        for key in self.base:
+            if changes.get(key, True):
+                yield key
+        for key, values in changes.items():
+            if values and key not in self.base:
+                yield key
+
+    def __contains__(self, key):
+        values = self.changes.get(key)
+        return key in self.base if values is None else bool(values)
+
+    def codes(self, key):
+        values = self.changes.get(key)
+        return tuple(self.base.codes(key)) if values is None else values
+
+
+class WatchedVocab:
+    # 可增量更新的词库：以对比时解析好的双向索引为底，不再解析一遍。文件按内容切块，每块只留一份文本
+    # （普通文本是原来的行，其他格式是 “词\t编码” 行），不另存解析结果；文件变化后流式重读，
+    # 只解析增删的块，受影响的词和编码的新值记在 words、codes 里，其余的仍查底下的索引
+    def __init__(self, file_path, index, encoding=None):
+        self.file_path = file_path
+        self.index = index
+        self.code_first = index.code_first
+        self.format = detect_format(file_path)
+        self.encoding = encoding
+        self.order = None
+        if self.format.splittable:
+            self.encoding = encoding or detect_encoding(file_path)
+            self.order = text_order(file_path, self.encoding)
+        self.words = {}
+        self.codes = {}
+        self._chunks = Counter()
+        self._texts = {}
+        # 当前文件里各块摘要的顺序，用来让受影响的词和编码的值保持文件中的顺序
+        self._sequence = []
+        self.stamp = None
+        self.refresh()
+
+    def _stat(self):
+        stat = os.stat(self.file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def changed(self):
+        try:
+            return self._stat() != self.stamp
+        except OSError:
+            # 编辑器保存时可能先删后写，下次轮询再看
+            return False
+
+    def word_codes(self, word):
+        return self.view('word').codes(word)
+
+    def code_words(self, code):
+        return self.view('code').codes(code)
+
+    def view(self, axis):
+        if axis == 'code':
+            return AxisView(self.index.by_code, self.codes)
+        return AxisView(self.index.by_word, self.words)
+
+    def _lines(self):
+        if self.format.splittable:
+            with open(self.file_path, encoding=self.encoding, newline='\n') as file:
+                yield from file
+        else:
+            # 其他格式直接取解析好的词和编码，每条一行，按同样的方式切块
+            for word, code, _ in self.format.read(self.file_path, self.encoding):
+                yield f"{word}\t{code}\n"
+
+    def _records(self, text):
+        # 一块文本里的 (词, 编码)，编码在前的文件两列对调
+        for line in text.split('\n'):
+            if self.format.splittable:
+                record = parse_line(line, self.order)
+                if record is None:
+                    continue
+                first, second, _ = record
+            elif line:
+                first, _, second = line.partition('\t')
+            else:
+                continue
+            if self.code_first and second:
+                first, second = second, first
+            yield first, second
+
+    def _collect(self, words, codes):
+        # 按文件顺序扫描各块，重新收集受影响的词和编码的值；受影响的键不多时先用子串判断跳过不含它们的块
+        word_values = {word: {} for word in words}
+        code_values = {code: {} for code in codes}
+        keys = list(words | codes) if len(words) + len(codes) <= FILTER_KEYS else None
+        for digest in self._sequence:
+            text = self._texts[digest]
+            if keys is not None and not any(key in text for key in keys):
+                continue
+            for word, code in self._records(text):
+                values = word_values.get(word)
+                if values is not None:
+                    values[code] = None
+                if code:
+                    values = code_values.get(code)
+                    if values is not None:
+                        values[word] = None
+        self.words.update((word, tuple(values)) for word, values in word_values.items())
+        self.codes.update((code, tuple(values)) for code, values in code_values.items())
+
+    def refresh(self):
+        # 流式重读文件，每块只解析一次；返回 (受影响的词, 受影响的编码)。
+        # 第一次读取时文件内容就是底下的索引，只记下各块
+        stamp = self._stat()
+        chunks = Counter()
+        sequence = []
+        texts = {}
+        for lines in iter_chunks(self._lines()):
+            text = ''.join(lines)
+            digest = chunk_digest(text)
+            chunks[digest] += 1
+            sequence.append(digest)
+            if digest not in self._texts:
+                texts[digest] = text
+        words, codes = set(), set()
+        if self.stamp is not None:
+            for digest in chunks.keys() | self._chunks.keys():
+                if chunks[digest] != self._chunks[digest]:
+                    for word, code in self._records(texts.get(digest) or self._texts[digest]):
+                        words.add(word)
+                        if code:
+                            codes.add(code)
+        self._texts.update(texts)
+        for digest in self._texts.keys() - chunks.keys():
+            del self._texts[digest]
+        self._chunks = chunks
+        self._sequence = sequence
+        if words or codes:
+            self._collect(words, codes)
+        self.stamp = stamp
+        return words, codes
+
+
+class PatchedRows(Sequence):
+    # 在 (键, 值) 行序列上原地打补丁，不复制原序列：改过的行记在 changed，删掉的原行号有序存放在 deleted，
+    # 新键追加在 extra。原序列有 find 方法（紧凑词库的行）时用它找行，否则第一次打补丁时建一次键到行号的表
+    def __init__(self, base):
+        self.base = base
+        self.changed = {}
+        self.deleted = []
+        self.extra = []
+        self._extra_rows = {}
+        self._positions = None
+
+    def __len__(self):
+        return len(self.base) - len(self.deleted) + len(self.extra)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        kept = len(self.base) - len(self.deleted)
+        if index >= kept:
+            return self.extra[index - kept]
+        row = self.base_row(index)
+        item = self.changed.get(row)
+        return self.base[row] if item is None else item
+
+    def base_row(self, index):
+        # 显示的第 index 行对应的原行号：满足 行号 - 之前删掉的行数 = index 的最小行号
+        row = index
+        shifted = index + bisect_right(self.deleted, row)
+        while shifted != row:
+            row = shifted
+            shifted = index + bisect_right(self.deleted, row)
+        return row
+
+    def _find(self, key):
+        find = getattr(self.base, 'find', None)
+        if find is not None:
+            return find(key)
+        if self._positions is None:
+            self._positions = {item[0]: row for row, item in enumerate(self.base)}
+        return self._positions.get(key, -1)
+
+    def patch(self, updates):
+        # updates 把键映射到新值，None 表示删除；返回第一处变动的行号，没有变动时为 None
+        first = None
+        for key, value in updates.items():
+            row = self._find(key)
+            if row != -1:
+                index = self._patch_base(row, key, value)
+            else:
+                index = self._patch_extra(key, value)
+            if index is not None:
+                first = index if first is None else min(first, index)
+        return first
+
+    def _patch_base(self, row, key, value):
+        at = bisect_left(self.deleted, row)
+        deleted = at < len(self.deleted) and self.deleted[at] == row
+        if value is None:
+            if deleted:
+                return None
+            self.deleted.insert(at, row)
+            self.changed.pop(row, None)
+        elif deleted:
+            del self.deleted[at]
+            self.changed[row] = (key, value)
+        else:
+            item = self.changed.get(row)
+            if (self.base[row] if item is None else item)[1] == value:
+                return None
+            self.changed[row] = (key, value)
+        return row - at
+
+    def _patch_extra(self, key, value):
+        kept = len(self.base) - len(self.deleted)
+        index = self._extra_rows.get(key)
+        if value is None:
+            if index is None:
+                return None
+            del self.extra[index]
+            self._extra_rows = {item[0]: row for row, item in enumerate(self.extra)}
+        elif index is None:
+            index = self._extra_rows[key] = len(self.extra)
+            self.extra.append((key, value))
+        elif self.extra[index][1] == value:
+            return None
+        else:
+            self.extra[index] = (key, value)
+        return kept + index
+
+
+class PatchedIndex:
+    # 打过补丁的行的查找：原序列部分仍交给原来的索引，去掉删改过的行再换算行号；
+    # 改过的行和新增的行只有少量，逐行匹配。行在原地更新，索引不用重建
+    def __init__(self, rows, base_index, fields):
+        self.rows = rows
+        self.base_index = base_index
+        self.fields = fields
+
+    def __len__(self):
+        return len(self.rows)
+
+    def row_text(self, row):
+        return self.fields(self.rows[row])
+
+    def search(self, term, within=None):
+        if not term or '\n' in term:
+            return []
+        if within is not None:
+            return [row for row in within if term in self.row_text(row)]
+        rows = self.rows
+        deleted, changed = rows.deleted, rows.changed
+        hits = []
+        for row in self.base_index.search(term):
+            at = bisect_left(deleted, row)
+            if row not in changed and not (at < len(deleted) and deleted[at] == row):
+                hits.append(row - at)
+        hits.extend(row - bisect_left(deleted, row) for row, item in changed.items() if term in self.fields(item))
+        kept = len(rows.base) - len(deleted)
+        hits.extend(kept + index for index, item in enumerate(rows.extra) if term in self.fields(item))
+        return sorted(hits)
+
+
+class RankedRows(Sequence):
+    # 按排名排好序的行，原地增删。updates 的键是 (方向, 键)，同一个字符串既是词又是编码时互不覆盖；
+    # 记住每个 (方向, 键) 当前的行，删除时按它的排名在并行的排名列表里二分找到
+    def __init__(self, rows, rank, axis):
+        self.rows = rows
+        self.rank = rank
+        self._ranks = list(map(rank, rows))
+        self._current = {(axis(item), item[0]): item for item in rows}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def patch(self, updates):
+        rows, ranks, rank = self.rows, self._ranks, self.rank
+        first = None
+        for (axis, key), record in updates.items():
+            old = self._current.pop((axis, key), None)
+            new = None if record is None else (key, record)
+            if old == new:
+                if old is not None:
+                    self._current[axis, key] = old
+                continue
+            if old is not None:
+                row = bisect_left(ranks, rank(old))
+                while rows[row] is not old:
+                    row += 1
+                del rows[row]
+                del ranks[row]
+                first = row if first is None else min(first, row)
+            if new is not None:
+                key_rank = rank(new)
+                row = bisect_right(ranks, key_rank)
+                rows.insert(row, new)
+                ranks.insert(row, key_rank)
+                self._current[axis, key] = new
+                first = row if first is None else min(first, row)
+        return first
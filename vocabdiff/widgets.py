@@ -0,0 +1,172 @@
+import tkinter as tk
+from tkinter import font as tkfont
+from tkinter import ttk
+
+
+class FormattedRows:
+    # 按需格式化的行序列，只有可见的行才会生成字符串
+    __slots__ = ('items', 'fmt')
+
+    def __init__(self, items, fmt):
+        self.items = items
+        self.fmt = fmt
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.fmt(self.items[index])
+
+
+class VirtualList(ttk.Frame):
+    # 只渲染窗口内可见的行，滚动开销与总行数无关
+    def __init__(self, parent, rows=(), **text_options):
+        super().__init__(parent)
+        self.rows = rows
+        self.top = 0
+        self.visible = 1
+        self.term = ''
+        self.matches = []
+        self.match = -1
+
+        self.text = tk.Text(self, wrap='none', cursor='arrow', **text_options)
+        self.text.pack(side='left', expand=True, fill='both')
+        self.text.tag_config('highlight', background='yellow')
+
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+
+        self.text.bind('<Configure>', self._on_configure)
+        self.text.bind('<MouseWheel>', self._on_mousewheel)
+        self.text.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.text.bind('<Button-5>', lambda e: self.scroll(3))
+        self.text.bind('<Up>', lambda e: self.scroll(-1))
+        self.text.bind('<Down>', lambda e: self.scroll(1))
+        self.text.bind('<Prior>', lambda e: self.scroll(-self.visible))
+        self.text.bind('<Next>', lambda e: self.scroll(self.visible))
+        self.text.bind('<Home>', lambda e: self.scroll_to(0))
+        self.text.bind('<End>', lambda e: self.scroll_to(len(self.rows)))
+        self.render()
+
+    def set_rows(self, rows):
+        self.rows = rows
+        self.top = 0
+        self.render()
+
+    def scroll_to(self, index):
+        self.top = max(0, min(index, len(self.rows) - self.visible))
+        self.render()
+        return 'break'
+
+    def scroll(self, delta):
+        return self.scroll_to(self.top + delta)
+
+    def see(self, index):
+        # 目标行不在窗口内时，把它滚动到窗口中部
+        if not self.top <= index < self.top + self.visible:
+            self.scroll_to(index - self.visible // 2)
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == 'scroll':
+            step = self.visible if args[2] == 'pages' else 1
+            self.scroll(int(args[1]) * step)
+
+    def highlight(self, term):
+        self.term = term
+        self.render()
+
+    def set_matches(self, matches):
+        self.matches = matches
+        self.match = -1
+        self.next_match()
+
+    def update_matches(self, matches):
+        # 行内容更新后换上新的匹配结果，不移动窗口
+        self.matches = matches
+        self.match = -1
+
+    def patch(self, first):
+        # 行序列从 first 开始有变动；变动都在窗口下方时只更新滚动条
+        if first < self.top + self.visible:
+            self.scroll_to(self.top)
+        else:
+            self._update_scrollbar()
+
+    def next_match(self):
+        if self.matches:
+            self.match = (self.match + 1) % len(self.matches)
+            self.see(self.matches[self.match])
+
+    def render(self):
+        total = len(self.rows)
+        end = min(self.top + self.visible, total)
+        lines = [self.rows[i] for i in range(self.top, end)]
+
+        self.text.config(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.insert('end', '\n'.join(lines))
+        if self.term:
+            for lineno, line in enumerate(lines, 1):
+                start = line.find(self.term)
+                while start != -1:
+                    stop = start + len(self.term)
+                    self.text.tag_add('highlight', f'{lineno}.{start}', f'{lineno}.{stop}')
+                    start = line.find(self.term, stop)
+        self.text.config(state='disabled')
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.top / total, min(self.top + self.visible, total) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_configure(self, event):
+        linespace = tkfont.Font(font=self.text.cget('font')).metrics('linespace')
+        visible = max(1, event.height // linespace)
+        if visible != self.visible:
+            self.visible = visible
+            self.scroll_to(self.top)
+
+    def _on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+
+class LazyTabs:
+    # 标签页第一次被选中时才创建内容
+    def __init__(self, notebook):
+        self.notebook = notebook
+        self.builders = {}
+        notebook.bind('<<NotebookTabChanged>>', self.build_selected, add='+')
+
+    def add(self, text, build):
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=text)
+        self.builders[str(frame)] = (frame, build)
+        return frame
+
+    def clear(self):
+        self.builders.clear()
+        for widget in self.notebook.winfo_children():
+            widget.destroy()
+
+    def build_selected(self, event=None):
+        entry = self.builders.pop(self.notebook.select(), None)
+        if entry is not None:
+            frame, build = entry
+            build(frame)
+
+
+def watch_job(widget, job, handle, interval=50):
+    # 在界面线程里定时取出后台任务的事件；任务结束后再取一次，确保最后的结果不丢
+    def poll():
+        alive = job.is_alive()
+        for event in job.drain():
+            handle(*event)
+        if alive:
+            widget.after(interval, poll)
+
+    poll()
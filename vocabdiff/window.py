@@ -0,0 +1,605 @@
+import os
+from tkinter import filedialog, messagebox
+
+from .bidi import BiIndex
+from .cache import VocabCache
+from .collisions import CollisionCounter, code_record, rank_key, record_axis, word_record, write_jsonl, write_tsv
+from .daemon import DaemonClient, RemoteIndex, RemoteItems, RemoteLookup
+from .formats import detect_format
+from .history import version_history
+from .loader import detect_encoding
+from .lookup import DiffLookup
+from .pipeline import RESULT_FIELDS, compare_indexes, parse_index, result_items
+from .search import SearchIndex, SearchSession, hit_fields, timeline_fields
+from .trace import Tracer
+from .watch import PatchedIndex, PatchedRows, RankedRows, WatchedVocab
+from .widgets import FormattedRows, LazyTabs, VirtualList, watch_job
+from .worker import Job, run_concurrently
+
+# 双向对比窗口的状态和事件处理，界面脚本只负责布局；后台任务不碰界面，可在工作线程执行
+
+# 已解析词库的磁盘缓存，缓存的是双向索引；解析规则变化时换用新的命名空间
+vocab_cache = VocabCache(namespace='bidi-v2', kind=BiIndex)
+# 监视新词库时检查文件是否变化的间隔（毫秒）
+WATCH_INTERVAL = 1000
+
+# 文本、搜狗细胞词库和 Rime 码表都能直接对比，格式按文件内容自动识别
+VOCAB_FILETYPES = [("词库文件", "*.txt *.scel *.yaml"), ("All Files", "*.*")]
+
+
+def format_entry(item):
+    return f"{item[0]}: {', '.join(item[1])}"
+
+
+def format_change(item):
+    k, (old_val, new_val) = item
+    return f"{k}: {', '.join(old_val)} -> {', '.join(new_val)}"
+
+
+COLLISION_KINDS = {'new': "新增重码", 'grown': "重码增加", 'lost': "失去全部编码", 'reshuffled': "重码替换",
+                   'shrunk': "重码减少", 'resolved': "重码消除"}
+
+
+def format_collision(item):
+    k, (kind, before, after, joined, left) = item
+    if kind == 'lost':
+        return f"[{COLLISION_KINDS[kind]}] {k}: 原编码 {', '.join(left)}"
+    text = f"[{COLLISION_KINDS[kind]}] {k}: {before} -> {after} 个候选"
+    if joined:
+        text += f"，加入 {', '.join(joined)}"
+    if left:
+        text += f"，移出 {', '.join(left)}"
+    return text
+
+
+# 各标签页的名称、标题和显示格式；查找用的字段见 RESULT_FIELDS
+RESULT_TABS = [
+    ('added', "新增词汇", format_entry),
+    ('removed', "删除词汇", format_entry),
+    ('changed', "修改词汇", format_change),
+    ('code_changed', "编码变化", format_change),
+    ('collisions', "重码分析", format_collision),
+    ('old_vocab', "旧词库", format_entry),
+    ('new_vocab', "新词库", format_entry),
+]
+
+HISTORY_STATUS = {'added': "新增", 'changed': "修改", 'removed': "删除"}
+
+
+def format_timeline(item):
+    word, events = item
+    return f"{word}: " + "；".join(f"{name} {HISTORY_STATUS[status]} {', '.join(codes)}"
+                                  for name, status, codes in events)
+
+
+TAB_TITLES = {name: title for name, title, _ in RESULT_TABS}
+TAB_TITLES['history'] = "版本历史"
+TAB_TITLES['lookup'] = "键查询"
+
+LOOKUP_AXES = {"按编码": 'code', "按词": 'word'}
+LOOKUP_MODES = {"前缀": 'prefix', "模糊": 'fuzzy'}
+LOOKUP_STATUS = dict(HISTORY_STATUS, unchanged="未变")
+
+
+def format_hit(item):
+    key, status, old_val, new_val, distance = item
+    text = f"[{LOOKUP_STATUS[status]}] {key}: {', '.join(old_val)} -> {', '.join(new_val)}"
+    return text if distance is None else f"{text} (距离 {distance})"
+
+
+def read_vocab(file_path, tracer, progress=None):
+    # 在后台线程中运行，出错时由界面线程提示；命中缓存时直接映射已解析的结果。各步骤分别计时
+    name = os.path.basename(file_path)
+    with tracer.stage(f"读取缓存 {name}") as span:
+        cached = vocab_cache.load(file_path)
+        span.count = cached and len(cached)
+    if cached is not None:
+        return cached
+    stat = os.stat(file_path)
+    with tracer.stage(f"检测编码 {name}"):
+        encoding = detect_encoding(file_path) if detect_format(file_path).splittable else None
+    with tracer.stage(f"解析 {name}") as span:
+        vocab = parse_index(file_path, encoding, progress)
+        span.count = len(vocab)
+    with tracer.stage(f"写入缓存 {name}"):
+        try:
+            vocab_cache.store(file_path, vocab, stat)
+        except OSError:
+            pass
+    return vocab
+
+
+def prepare_results(diffs, old_vocab, new_vocab):
+    # 各标签页的行和查找索引由 result_items 生成，这里只配上显示格式
+    results = result_items(diffs, old_vocab, new_vocab)
+    tabs = []
+    indexes = {}
+    for name, title, fmt in RESULT_TABS:
+        items, indexes[name] = results[name]
+        tabs.append((name, f"{title} ({len(items)})", FormattedRows(items, fmt)))
+    return tabs, indexes
+
+
+def run_compare(job, old_vocab_file, new_vocab_file, tracer):
+    # 两个文件同时解析，已读字节数合计后报告；记下新词库读取前的状态，供监视时确认文件没有再变
+    new_stat = os.stat(new_vocab_file)
+    total = os.path.getsize(old_vocab_file) + new_stat.st_size
+    done = [0, 0]
+
+    def read_progress(slot):
+        def report(position):
+            done[slot] = position
+            job.progress('read', sum(done), total)
+        return report
+
+    old_vocab, new_vocab = run_concurrently(
+        (read_vocab, old_vocab_file, tracer, read_progress(0)),
+        (read_vocab, new_vocab_file, tracer, read_progress(1)),
+    )
+    job.check()
+    total = len(new_vocab.by_word) + len(new_vocab.by_code)
+    with tracer.stage("对比", total):
+        # 摘要根相同就是内容完全相同，不用逐条对比
+        identical = old_vocab.same_as(new_vocab)
+        diffs = compare_indexes(old_vocab, new_vocab, lambda count: job.progress('diff', count, total))
+    job.progress('index', 0)
+    with tracer.stage("生成结果") as span:
+        tabs, indexes = prepare_results(diffs, old_vocab, new_vocab)
+        span.count = sum(len(rows) for _, _, rows in tabs)
+    watch_source = (old_vocab, new_vocab, new_vocab_file, (new_stat.st_size, new_stat.st_mtime_ns))
+    # 键查询的索引在第一次查询时才建立
+    lookups = {'word': DiffLookup(old_vocab.by_word, new_vocab.by_word),
+               'code': DiffLookup(old_vocab.by_code, new_vocab.by_code)}
+    return tabs, indexes, identical, watch_source, lookups
+
+
+def _remote_diff(client, old_vocab_file, new_vocab_file, axis):
+    reply = client.request({'op': 'diff', 'old': old_vocab_file, 'new': new_vocab_file, 'axis': axis})
+    results = {'added': {}, 'removed': {}, 'changed': {}}
+    for status, key, old, new in reply['records']:
+        if status == 'added':
+            results[status][key] = tuple(new)
+        elif status == 'removed':
+            results[status][key] = tuple(old)
+        else:
+            results[status][key] = (tuple(old), tuple(new))
+    return reply['identical'], results
+
+
+def run_remote_compare(job, old_vocab_file, new_vocab_file, tracer):
+    # 瘦客户端：解析和对比由本机守护进程完成并常驻内存，这里只取回差异；
+    # 两个词库标签页按页向守护进程取行，查找也在守护进程里做。结果不能增量更新，不支持监视
+    client = DaemonClient()
+    job.progress('daemon', 0)
+    with tracer.stage("守护进程对比") as span:
+        identical, words = _remote_diff(client, old_vocab_file, new_vocab_file, 'word')
+        job.check()
+        _, codes = _remote_diff(client, old_vocab_file, new_vocab_file, 'code')
+        span.count = sum(map(len, words.values())) + len(codes['changed'])
+    job.check()
+    job.progress('index', 0)
+    with tracer.stage("生成结果") as span:
+        collisions = CollisionCounter()
+        collisions.add_diffs((codes['added'], codes['removed'], codes['changed']),
+                             (words['added'], words['removed'], words['changed']))
+        results = {name: values.items() for name, values in words.items()}
+        results['code_changed'] = codes['changed'].items()
+        results['collisions'] = collisions.ranked()
+        tabs = []
+        indexes = {}
+        for name, title, fmt in RESULT_TABS:
+            if name in results:
+                items = list(results[name])
+                indexes[name] = SearchIndex(items, RESULT_FIELDS[name])
+            else:
+                file_path = old_vocab_file if name == 'old_vocab' else new_vocab_file
+                items = RemoteItems(client, file_path)
+                indexes[name] = RemoteIndex(client, file_path)
+            tabs.append((name, f"{title} ({len(items)})", FormattedRows(items, fmt)))
+        span.count = sum(len(rows) for _, _, rows in tabs)
+    lookups = {axis: RemoteLookup(client, old_vocab_file, new_vocab_file, axis) for axis in ('word', 'code')}
+    return tabs, indexes, identical, None, lookups
+
+
+def rediff_rows(old_vocab, watched, words, codes):
+    # 只重新对比受影响的词和编码，返回各标签页要更新的行，值为 None 表示删除该行；
+    # 重码分析里词和编码可能是同一个字符串，按 (方向, 键) 区分
+    updates = {'added': {}, 'removed': {}, 'changed': {}, 'code_changed': {}, 'collisions': {}, 'new_vocab': {}}
+    for word in words:
+        old, new = old_vocab.by_word.codes(word), watched.word_codes(word)
+        updates['new_vocab'][word] = new or None
+        updates['added'][word] = new if new and not old else None
+        updates['removed'][word] = old if old and not new else None
+        updates['changed'][word] = (old, new) if old and new and sorted(old) != sorted(new) else None
+        updates['collisions']['word', word] = word_record(old, new)
+    for code in codes:
+        old, new = old_vocab.by_code.codes(code), watched.code_words(code)
+        updates['code_changed'][code] = (old, new) if old and new and sorted(old) != sorted(new) else None
+        updates['collisions']['code', code] = code_record(old, new) if sorted(old) != sorted(new) else None
+    return updates
+
+
+def start_watching(job, old_vocab, new_vocab, new_vocab_file, stamp):
+    # 以对比时解析好的新词库为底，只读一遍文件记下各块；对比期间新词库又被修改时返回 None，由界面重新对比
+    watched = WatchedVocab(new_vocab_file, new_vocab)
+    return (watched, old_vocab) if watched.stamp == stamp else None
+
+
+def run_refresh(job, watched, old_vocab):
+    # 只解析变动的块，只重新对比受影响的词和编码；返回各标签页要更新的行，由界面线程原地打补丁
+    words, codes = watched.refresh()
+    job.check()
+    return rediff_rows(old_vocab, watched, words, codes)
+
+
+def run_history(job, paths):
+    # 多个版本排序后一次归并，只保留版本间有变化的词
+    names = [os.path.basename(path) for path in paths]
+    items = []
+    job.progress('sort', 0, len(paths))
+    for word, events in version_history(paths, progress=lambda done: job.progress('sort', done, len(paths))):
+        job.check()
+        items.append((word, [(names[version], status, codes) for version, status, codes in events]))
+    job.progress('index', 0)
+    tabs = [('history', f"{TAB_TITLES['history']} ({len(items)})", FormattedRows(items, format_timeline))]
+    return tabs, {'history': SearchIndex(items, timeline_fields)}
+
+
+def run_lookup(job, lookup, mode, term, distance):
+    job.progress('lookup', 0)
+    items = lookup.fuzzy(term, distance) if mode == 'fuzzy' else lookup.prefix(term)
+    return items, SearchIndex(items, hit_fields)
+
+
+def load_file(label):
+    file_path = filedialog.askopenfilename(filetypes=VOCAB_FILETYPES)
+    if file_path:
+        label.config(text=file_path)
+
+
+class CompareWindow:
+    # 界面脚本把布局里的控件（含放结果标签页的 notebook）赋给同名属性，建好后调用 start；
+    # list_options 传给每个结果列表的文本框
+    def __init__(self, root, **list_options):
+        self.root = root
+        self.list_options = list_options
+        self.result_tabs = None
+        self.result_views = {}
+        self.result_rows = {}
+        self.result_frames = {}
+        self.search_session = None
+        self.search_job = None
+        self.compare_job = None
+        self.compare_tracer = None
+        # 监视新词库：最近一次对比的参数、增量索引和后台任务
+        self.watch_source = None
+        self.watch_state = None
+        self.refresh_job = None
+        # 键查询：最近一次对比的新旧词库和后台任务
+        self.lookups = None
+        self.lookup_job = None
+
+    def start(self):
+        self.result_tabs = LazyTabs(self.notebook)
+        self.root.after(WATCH_INTERVAL, self.poll_watch)
+
+    def search_word(self, event=None):
+        # 输入时增量查找，结果来自对比后建立的索引
+        self.search_job = None
+        search_term = self.search_entry.get()
+        if self.search_session is None or search_term == self.search_session.term:
+            return
+        hits = self.search_session.search(search_term)
+        for name, view in self.result_views.items():
+            view.highlight(search_term)
+            view.set_matches(hits[name])
+        self.show_search_status()
+
+    def show_search_status(self):
+        session = self.search_session
+        if session.term:
+            self.search_status.config(text=" ".join(f"{TAB_TITLES[name]} {len(session.hits[name])}"
+                                                    for name in session.hits))
+        else:
+            self.search_status.config(text="")
+
+    def schedule_search(self, event=None):
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(150, self.search_word)
+
+    def find_next(self, event=None):
+        # 查找词未变时跳到当前标签页的下一个匹配
+        if self.search_session is None or self.search_entry.get() != self.search_session.term:
+            self.search_word()
+            return
+        for view in self.result_views.values():
+            if str(view.master) == self.notebook.select():
+                view.next_match()
+
+    def add_result_tab(self, name, title, rows):
+        # 标签页第一次打开时才创建视图，且只渲染可见的行
+        def build(frame):
+            view = VirtualList(frame, rows, **self.list_options)
+            view.pack(expand=True, fill='both')
+            view.highlight(self.search_session.term)
+            view.set_matches(self.search_session.hits.get(name, []))
+            self.result_views[name] = view
+
+        self.result_rows[name] = rows
+        self.result_frames[name] = self.result_tabs.add(title, build)
+
+    def display_results(self, tabs, indexes):
+        # 清空之前的结果
+        self.result_tabs.clear()
+        self.result_views.clear()
+        self.result_rows.clear()
+        self.result_frames.clear()
+
+        self.search_session = SearchSession(indexes)
+        self.search_session.search(self.search_entry.get())
+        for name, title, rows in tabs:
+            self.add_result_tab(name, title, rows)
+        self.result_tabs.build_selected()
+
+    def show_progress(self, stage, done, total):
+        if total:
+            self.progress_bar.config(mode='determinate', maximum=total, value=done)
+        else:
+            self.progress_bar.config(mode='indeterminate', value=0)
+        if stage == 'read':
+            self.progress_label.config(text=f"读取 {done / 1048576:.1f} / {total / 1048576:.1f} MB")
+        elif stage == 'diff':
+            self.progress_label.config(text=f"对比 {done} / {total} 条")
+        elif stage == 'daemon':
+            self.progress_label.config(text="等待守护进程对比...")
+        elif stage == 'lookup':
+            self.progress_label.config(text="查询...")
+        elif stage == 'sort':
+            self.progress_label.config(text=f"排序 {done} / {total} 个版本")
+        else:
+            self.progress_label.config(text="生成结果...")
+
+    def _job_finished(self):
+        self.compare_button.config(state='normal')
+        self.history_button.config(state='normal')
+        self.cancel_button.config(state='disabled')
+        self.progress_bar.config(mode='determinate', value=0)
+
+    def _job_started(self):
+        self.compare_button.config(state='disabled')
+        self.history_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self.progress_label.config(text="检测编码...")
+
+    def handle_compare_event(self, kind, *args):
+        if kind == 'progress':
+            self.show_progress(*args)
+            return
+        self._job_finished()
+        if kind == 'done':
+            tabs, indexes, identical, self.watch_source, self.lookups = args[0]
+            if self.daemon_var.get():
+                status = "由守护进程对比"
+            else:
+                status = f"缓存命中 {vocab_cache.hits} 次，未命中 {vocab_cache.misses} 次"
+            self.progress_label.config(text=f"两个词库内容相同，{status}" if identical else status)
+            with self.compare_tracer.stage("显示"):
+                self.display_results(tabs, indexes)
+            self.stats_label.config(text=self.compare_tracer.summary())
+            self.toggle_watch()
+        elif kind == 'cancelled':
+            self.progress_label.config(text="已取消")
+        else:
+            self.progress_label.config(text="")
+            messagebox.showerror("错误", f"读取或对比失败: {args[0]}")
+
+    def handle_history_event(self, kind, *args):
+        if kind == 'progress':
+            self.show_progress(*args)
+            return
+        self._job_finished()
+        if kind == 'done':
+            self.progress_label.config(text="")
+            # 版本历史不是两个词库的对比，停止监视，也不能做键查询
+            self.watch_source = None
+            self.lookups = None
+            self.toggle_watch()
+            self.display_results(*args[0])
+        elif kind == 'cancelled':
+            self.progress_label.config(text="已取消")
+        else:
+            self.progress_label.config(text="")
+            messagebox.showerror("错误", f"读取或对比失败: {args[0]}")
+
+    def history_and_display(self):
+        # 选择多个版本（按文件名排序即从旧到新），一次归并出每个词的变化时间线
+        if self.compare_job is not None and self.compare_job.is_alive():
+            return
+        paths = sorted(filedialog.askopenfilenames(filetypes=VOCAB_FILETYPES))
+        if len(paths) < 2:
+            if paths:
+                messagebox.showwarning("文件不足", "请至少选择两个版本的词库文件。")
+            return
+        self.compare_job = Job(run_history, paths).start()
+        self._job_started()
+        watch_job(self.root, self.compare_job, self.handle_history_event)
+
+    def show_lookup(self, items, index):
+        # 查询结果放在单独的标签页，再次查询时原地替换
+        title = f"{TAB_TITLES['lookup']} ({len(items)})"
+        hits = self.search_session.replace('lookup', index)
+        if 'lookup' in self.result_rows:
+            self.result_rows['lookup'].items = items
+            self.notebook.tab(self.result_frames['lookup'], text=title)
+            view = self.result_views.get('lookup')
+            if view is not None:
+                view.set_rows(self.result_rows['lookup'])
+                view.set_matches(hits)
+        else:
+            self.add_result_tab('lookup', title, FormattedRows(items, format_hit))
+        self.notebook.select(self.result_frames['lookup'])
+
+    def handle_lookup_event(self, kind, *args):
+        if kind == 'progress':
+            self.show_progress(*args)
+            return
+        self.lookup_button.config(state='normal')
+        self.progress_bar.config(mode='determinate', value=0)
+        self.progress_label.config(text="")
+        if kind == 'done' and self.lookups is not None:
+            self.show_lookup(*args[0])
+        elif kind == 'error':
+            messagebox.showerror("错误", f"查询失败: {args[0]}")
+
+    def lookup_and_display(self, event=None):
+        # 按前缀或编辑距离在新旧两个词库里查词或编码，每个结果标出新增、删除、修改或未变
+        term = self.lookup_entry.get()
+        if self.lookups is None:
+            messagebox.showwarning("键查询", "请先对比两个词库。")
+            return
+        if not term or (self.lookup_job is not None and self.lookup_job.is_alive()):
+            return
+        try:
+            distance = max(0, int(self.lookup_distance.get()))
+        except ValueError:
+            distance = 1
+        lookup = self.lookups[LOOKUP_AXES[self.lookup_axis.get()]]
+        self.lookup_job = Job(run_lookup, lookup, LOOKUP_MODES[self.lookup_mode.get()], term, distance).start()
+        self.lookup_button.config(state='disabled')
+        watch_job(self.root, self.lookup_job, self.handle_lookup_event)
+
+    def compare_and_display(self):
+        old_vocab_file = self.old_vocab_label.cget("text")
+        new_vocab_file = self.new_vocab_label.cget("text")
+
+        if not old_vocab_file or not new_vocab_file:
+            messagebox.showwarning("文件未选择", "请先选择旧词库和新词库文件。")
+            return
+        if self.compare_job is not None and self.compare_job.is_alive():
+            return
+
+        # 解析和对比放到后台线程，界面保持响应；每次对比重新计时
+        self.compare_tracer = Tracer(profile=self.profile_var.get())
+        compare = run_remote_compare if self.daemon_var.get() else run_compare
+        self.compare_job = Job(compare, old_vocab_file, new_vocab_file, self.compare_tracer).start()
+        self._job_started()
+        watch_job(self.root, self.compare_job, self.handle_compare_event)
+
+    def cancel_compare(self):
+        if self.compare_job is not None:
+            self.compare_job.cancel()
+
+    def export_trace(self):
+        # 最近一次对比的各阶段导出为 Chrome 跟踪文件；开启了性能分析时另存一份 cProfile 数据
+        if self.compare_tracer is None:
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[("Chrome Trace", "*.json")])
+        if not file_path:
+            return
+        try:
+            self.compare_tracer.export_chrome(file_path)
+            profile_path = os.path.splitext(file_path)[0] + '.prof'
+            if self.compare_tracer.export_profile(profile_path):
+                self.stats_label.config(text=f"已导出 {file_path} 和 {profile_path}")
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败: {e}")
+
+    def export_collisions(self):
+        # 重码分析导出为 TSV 或 JSON Lines，按扩展名选择格式
+        rows = self.result_rows.get('collisions')
+        if rows is None:
+            messagebox.showwarning("导出重码分析", "请先对比两个词库。")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension='.tsv',
+                                                 filetypes=[("TSV", "*.tsv"), ("JSON Lines", "*.jsonl")])
+        if not file_path:
+            return
+        write = write_jsonl if file_path.endswith('.jsonl') else write_tsv
+        try:
+            with open(file_path, 'w', encoding='utf-8', newline='\n') as file:
+                write(rows.items, file)
+            self.stats_label.config(text=f"已导出 {len(rows)} 条重码分析到 {file_path}")
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败: {e}")
+
+    def toggle_watch(self):
+        # 勾选监视后，为最近一次对比的新词库建立可增量更新的索引
+        self.watch_state = None
+        if self.refresh_job is not None:
+            self.refresh_job.cancel()
+            self.refresh_job = None
+        if self.watch_var.get() and self.watch_source is not None:
+            self.refresh_job = Job(start_watching, *self.watch_source).start()
+            watch_job(self.root, self.refresh_job, self.handle_watch_event)
+
+    def handle_watch_event(self, kind, *args):
+        if kind == 'progress':
+            return
+        if kind == 'done':
+            if args[0] is None:
+                self.compare_and_display()
+            else:
+                self.watch_state = args[0]
+                self.progress_label.config(text="正在监视新词库")
+        elif kind == 'error':
+            self.progress_label.config(text=f"监视失败: {args[0]}")
+
+    def poll_watch(self):
+        # 定时检查新词库的修改时间，变化时在后台增量更新
+        self.root.after(WATCH_INTERVAL, self.poll_watch)
+        if self.watch_state is None or not self.watch_var.get():
+            return
+        if any(job is not None and job.is_alive() for job in (self.compare_job, self.refresh_job, self.lookup_job)):
+            return
+        watched, old_vocab = self.watch_state
+        if watched.changed():
+            self.refresh_job = Job(run_refresh, watched, old_vocab).start()
+            watch_job(self.root, self.refresh_job, self.handle_refresh_event)
+
+    def handle_refresh_event(self, kind, *args):
+        if kind == 'progress':
+            return
+        if kind == 'done':
+            self.apply_patches(args[0])
+            # 键查询改用监视中的新词库，索引在下一次查询时重建
+            watched, old_vocab = self.watch_state
+            self.lookups = {axis: DiffLookup(getattr(old_vocab, f'by_{axis}'), watched.view(axis))
+                            for axis in ('word', 'code')}
+        elif kind == 'error':
+            self.progress_label.config(text=f"更新失败: {args[0]}")
+
+    def patch_tab(self, name, updates):
+        # 行和查找索引原地更新，返回第一处变动的行号；第一次更新时换成可打补丁的行序列，原有的索引继续用于未改动的行
+        rows = self.result_rows[name]
+        indexes = self.search_session.indexes
+        if name == 'collisions':
+            if not isinstance(rows.items, RankedRows):
+                rows.items = RankedRows(rows.items, rank_key, record_axis)
+            first = rows.items.patch(updates)
+            if first is not None:
+                # 重码记录按排名插入，之后的行号整体移动，只重建这一页的索引，大小与重码数相当
+                indexes[name] = SearchIndex(rows.items.rows, RESULT_FIELDS[name])
+            return first
+        if not isinstance(rows.items, PatchedRows):
+            rows.items = PatchedRows(rows.items)
+            indexes[name] = PatchedIndex(rows.items, indexes[name], RESULT_FIELDS[name])
+        return rows.items.patch(updates)
+
+    def apply_patches(self, updates):
+        # 在界面线程里打补丁，只重绘变动落在窗口内的视图
+        patched = 0
+        for name, tab_updates in updates.items():
+            first = self.patch_tab(name, tab_updates)
+            if first is None:
+                continue
+            patched += 1
+            self.notebook.tab(self.result_frames[name], text=f"{TAB_TITLES[name]} ({len(self.result_rows[name])})")
+            hits = self.search_session.replace(name, self.search_session.indexes[name])
+            view = self.result_views.get(name)
+            if view is not None:
+                view.update_matches(hits)
+                view.patch(first)
+        if self.search_session.term:
+            self.show_search_status()
+        self.progress_label.config(text=f"新词库已更新，{patched} 个标签页有变化")
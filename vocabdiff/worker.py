@@ -0,0 +1,63 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 每处理这么多条记录报告一次进度
+PROGRESS_STEP = 1 << 16
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Job:
+    # 在后台线程里执行任务，进度和结果都放进队列，由界面线程取出
+    def __init__(self, task, *args):
+        self.task = task
+        self.args = args
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+    def progress(self, stage, done, total=None):
+        # 任务在报告进度时顺便检查是否已被取消
+        self.check()
+        self.events.put(('progress', stage, done, total))
+
+    def drain(self):
+        while True:
+            try:
+                yield self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        try:
+            result = self.task(self, *self.args)
+        except Cancelled:
+            self.events.put(('cancelled',))
+        except Exception as e:
+            self.events.put(('error', e))
+        else:
+            self.events.put(('done', result))
+
+
+def run_concurrently(*calls):
+    # 同时执行多个 (函数, 参数...) 调用，按顺序返回结果
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = [pool.submit(*call) for call in calls]
+        return [future.result() for future in futures]